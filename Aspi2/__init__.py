@@ -1,8 +1,10 @@
 
 MAGIC_NUM = b"\x20\x04Aspi\x02"
 
-VERSION = 2
+VERSION = 7
 
 from . import database
+from . import aio
+from . import metrics
 
-__all__ = ["database"]
+__all__ = ["database","aio","metrics"]
@@ -0,0 +1,202 @@
+
+"""
+asyncio front-end for accessors.
+
+An AsyncAccessor runs every call on a bounded pool of threads, each with its own Accessor, so the event loop never waits on file I/O.
+Concurrent gets of the same key share a single read, a write to a key makes gets issued after it read again.
+"""
+
+import asyncio
+import threading
+import itertools
+import functools
+import concurrent.futures
+
+from . import database
+
+class AsyncAccessor:
+
+    def __init__(self,db,max_workers=4,use_mmap=None,batch_size=256):
+
+        """
+        ' max_workers ' bounds the threads doing I/O, ' batch_size ' is the amount of results an async iterator fetches per call.
+        """
+
+        self.db = db
+
+        self.use_mmap = use_mmap
+        self.batch_size = batch_size
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers,thread_name_prefix=f"{db.name}-aio")
+
+        self._local = threading.local()
+        self._accessors = []
+        self._accessors_lock = threading.Lock()
+
+        self._pending_gets = {} # key -> future of the read in flight
+
+        self.closed = False
+
+    def _accessor(self):
+
+        accessor = getattr(self._local,"accessor",None)
+
+        if accessor is None:
+
+            accessor = self._local.accessor = database.Accessor(self.db,self.use_mmap)
+
+            with self._accessors_lock:
+
+                self._accessors.append(accessor)
+
+        return accessor
+
+    def _call(self,method,*args,**kwargs):
+
+        return getattr(self._accessor(),method)(*args,**kwargs)
+
+    async def _run(self,function,*args,**kwargs):
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor,functools.partial(function,*args,**kwargs))
+
+    def _written(self,keys):
+
+        for key in keys:
+
+            self._pending_gets.pop(key,None)
+
+    async def get(self,key,fields=None,view=False):
+
+        if fields is not None or view: # Partial reads aren't shared
+
+            return await self._run(self._call,"get",key,fields,view)
+
+        future = self._pending_gets.get(key)
+
+        if future is None:
+
+            future = asyncio.ensure_future(self._run(self._call,"get",key))
+            self._pending_gets[key] = future
+
+            future.add_done_callback(lambda f: self._pending_gets.pop(key) if self._pending_gets.get(key) is f else None)
+
+        data = await asyncio.shield(future) # A cancelled caller doesn't cancel the read for the others
+
+        return dict(data) if data is not None else None # Every caller gets its own copy
+
+    async def has(self,key):
+
+        return await self._run(self._call,"has",key)
+
+    async def set(self,key,data):
+
+        self._written([key])
+
+        await self._run(self._call,"set",key,data)
+
+    async def delete(self,key):
+
+        self._written([key])
+
+        await self._run(self._call,"delete",key)
+
+    async def get_many(self,keys):
+
+        return await self._run(self._call,"get_many",list(keys))
+
+    async def set_many(self,items):
+
+        items = dict(items)
+
+        self._written(items)
+
+        await self._run(self._call,"set_many",items)
+
+    async def delete_many(self,keys):
+
+        keys = list(keys)
+
+        self._written(keys)
+
+        return await self._run(self._call,"delete_many",keys)
+
+    async def find(self,entryvalue,operator,queryvalue,findmode="all"):
+
+        return await self._run(self._call,"find",entryvalue,operator,queryvalue,findmode)
+
+    async def transaction(self,function,*args):
+
+        """
+        Runs ' function(accessor, *args) ' in a transaction (see Accessor.transaction) on one of the threads and returns its result.
+        A transaction can't stay open across awaits, the thread that opened it holds the database until it ends.
+        """
+
+        def run():
+
+            accessor = self._accessor()
+
+            with accessor.transaction():
+
+                return function(accessor,*args)
+
+        self._pending_gets.clear()
+
+        return await self._run(run)
+
+    async def _iterate(self,method,*args):
+
+        iterator = await self._run(lambda: iter(self._call(method,*args)))
+
+        while True:
+
+            batch = await self._run(lambda: list(itertools.islice(iterator,self.batch_size)))
+
+            if not batch:
+
+                return
+
+            for item in batch:
+
+                yield item
+
+    def keys(self):
+
+        return self._iterate("keys")
+
+    def values(self,fields=None,view=False):
+
+        return self._iterate("values",fields,view)
+
+    def items(self,fields=None,view=False):
+
+        return self._iterate("items",fields,view)
+
+    def find_generator(self,entryvalue,operator,queryvalue):
+
+        return self._iterate("find_generator",entryvalue,operator,queryvalue)
+
+    def __len__(self):
+
+        return len(self.db)
+
+    async def close(self):
+
+        """
+        Waits for all calls in progress and closes the accessors of the threads. The database itself stays open.
+        """
+
+        self.closed = True
+
+        await asyncio.get_running_loop().run_in_executor(None,self._executor.shutdown)
+
+        for accessor in self._accessors:
+
+            accessor.close()
+
+    async def __aenter__(self):
+
+        return self
+
+    async def __aexit__(self,exc_type,exc_value,traceback):
+
+        await self.close()
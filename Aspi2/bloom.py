@@ -0,0 +1,203 @@
+
+"""
+Bloom filter over the keys of a database, kept in ' <location>.aspbloom '.
+
+A key the filter doesn't contain is definitely not in the database, so misses are answered without reading the slot table or a chain.
+Keys can't be removed from a Bloom filter: deleted keys stay in it until it is rebuilt, which only costs a disk lookup for them.
+"""
+
+import os
+import math
+import hashlib
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+BLOOM_MAGIC = b"\x20\x04AspiBlm\x01"
+
+def sidecar_path(location):
+
+    return location+".aspbloom"
+
+def _blake2b(kb):
+
+    return int.from_bytes(hashlib.blake2b(kb,digest_size=16).digest(),'little')
+
+def _xxh3(kb):
+
+    return xxhash.xxh3_128_intdigest(kb)
+
+# 128 bit hashes, identifiers are stored in the filter file
+
+HASHES = {
+
+    0:_blake2b,
+    1:_xxh3
+
+}
+
+def default_hash():
+
+    return 1 if xxhash is not None else 0
+
+class BloomFilter:
+
+    def __init__(self,capacity,error_rate=0.01,hash_identifier=None):
+
+        """
+        Sized so that ' capacity ' keys give a false positive rate of ' error_rate '.
+        """
+
+        self.hash_identifier = default_hash() if hash_identifier is None else hash_identifier
+        self._hash = HASHES[self.hash_identifier]
+
+        self.capacity = max(capacity,1)
+        self.error_rate = error_rate
+
+        self.size = max(int(-self.capacity*math.log(error_rate)/math.log(2)**2),64) # Bits
+        self.hashes = max(round(self.size/self.capacity*math.log(2)),1)
+
+        self.bits = bytearray((self.size+7)//8)
+
+        self.count = 0 # Keys added that weren't in the filter yet, deleted keys included
+
+    def _start(self,key):
+
+        """
+        Returns the first bit of ' key ' and the step to the next ones (double hashing), both below the size so the loops stay on small ints.
+        """
+
+        h = self._hash(key.encode('ascii'))
+
+        return (h & 0xFFFFFFFFFFFFFFFF) % self.size, ((h >> 64) % (self.size-1))+1
+
+    def add(self,key):
+
+        position, step = self._start(key)
+
+        bits = self.bits
+        size = self.size
+
+        new = False
+
+        for _ in range(self.hashes):
+
+            mask = 1 << (position & 7)
+
+            if not bits[position >> 3] & mask:
+
+                bits[position >> 3] |= mask
+                new = True
+
+            position += step
+
+            if position >= size:
+                position -= size
+
+        if new:
+
+            self.count += 1
+
+    def __contains__(self,key):
+
+        position, step = self._start(key)
+
+        bits = self.bits
+        size = self.size
+
+        for _ in range(self.hashes):
+
+            if not bits[position >> 3] & (1 << (position & 7)):
+
+                return False
+
+            position += step
+
+            if position >= size:
+                position -= size
+
+        return True
+
+    @property
+    def full(self):
+
+        """
+        True once more keys were added than the filter was sized for, its false positive rate is above ' error_rate ' from then on.
+        """
+
+        return self.count > self.capacity
+
+def save(path,bloom_filter,stamp):
+
+    """
+    Writes ' bloom_filter ' to ' path '. ' stamp ' identifies the state of the database the filter belongs to.
+    """
+
+    o = bytearray(BLOOM_MAGIC)
+
+    for counter in stamp:
+
+        o += counter.to_bytes(12,'little')
+
+    o += bloom_filter.capacity.to_bytes(12,'little')
+    o += bloom_filter.count.to_bytes(12,'little')
+    o += bloom_filter.size.to_bytes(12,'little')
+    o += bloom_filter.hashes.to_bytes(1,'little')
+    o += round(bloom_filter.error_rate*1e9).to_bytes(4,'little')
+    o += bloom_filter.hash_identifier.to_bytes(1,'little')
+    o += bloom_filter.bits
+
+    with open(path+".tmp","wb") as f:
+
+        f.write(o)
+
+    os.replace(path+".tmp",path)
+
+def load(path):
+
+    """
+    Reads the filter at ' path ', returns (stamp, filter), the filter is None if it uses a hash that isn't available here.
+    """
+
+    with open(path,"rb") as f:
+
+        b = f.read()
+
+    if b[:len(BLOOM_MAGIC)] != BLOOM_MAGIC:
+
+        raise CorruptBloomFilterError(f"Didn't find Bloom filter magic number at beginning of ' {path} '")
+
+    cursor = len(BLOOM_MAGIC)
+
+    stamp = (int.from_bytes(b[cursor:cursor+12],'little'),int.from_bytes(b[cursor+12:cursor+24],'little'))
+    cursor += 24
+
+    bloom_filter = BloomFilter.__new__(BloomFilter)
+
+    bloom_filter.capacity = int.from_bytes(b[cursor:cursor+12],'little')
+    bloom_filter.count = int.from_bytes(b[cursor+12:cursor+24],'little')
+    bloom_filter.size = int.from_bytes(b[cursor+24:cursor+36],'little')
+    bloom_filter.hashes = b[cursor+36]
+    bloom_filter.error_rate = int.from_bytes(b[cursor+37:cursor+41],'little')/1e9
+    bloom_filter.hash_identifier = b[cursor+41]
+    cursor += 42
+
+    if bloom_filter.hash_identifier not in HASHES or (bloom_filter.hash_identifier == 1 and xxhash is None):
+
+        return stamp, None
+
+    bloom_filter._hash = HASHES[bloom_filter.hash_identifier]
+
+    bloom_filter.bits = bytearray(b[cursor:])
+
+    if len(bloom_filter.bits) != (bloom_filter.size+7)//8:
+
+        raise CorruptBloomFilterError(f"Bloom filter at ' {path} ' is truncated")
+
+    return stamp, bloom_filter
+
+class CorruptBloomFilterError(Exception):
+
+    pass
@@ -1,30 +1,94 @@
 
-import random
+import threading
+from collections import OrderedDict
+
+MISSING = object() # Cached value for keys that are known not to exist
 
 class Cache:
 
-    def __init__(self,maxsize=1024):
+    """
+    Least recently used cache, bounded by entry count and (optionally) by the summed byte size of its values.
+    Safe to share between threads.
+    """
+
+    def __init__(self,maxsize=1024,maxbytes=None):
 
         self.maxsize = maxsize
-        self._i = {}
+        self.maxbytes = maxbytes
+
+        self._i = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.size_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+
+        return len(self._i)
 
     def has(self,key):
 
         return True if key in self._i else False
 
-    def set(self,key,val):
+    def set(self,key,val,size=None):
+
+        size = len(val) if size is None else size
+
+        with self._lock:
+
+            if key in self._i:
+
+                self.size_bytes -= self._i.pop(key)[1]
 
-        self._i[key] = val
+            self._i[key] = (val,size)
+            self.size_bytes += size
 
-        if len(self._i) > self.maxsize:
+            while len(self._i) > self.maxsize or (self.maxbytes is not None and self.size_bytes > self.maxbytes):
 
-            self._i.pop(random.choice(list(self._i)))
+                _, (_, evicted_size) = self._i.popitem(last=False)
+                self.size_bytes -= evicted_size
+                self.evictions += 1
 
     def invalidate(self,key):
 
-        if key in self._i:
-            self._i.pop(key)
+        with self._lock:
+
+            if key in self._i:
+                self.size_bytes -= self._i.pop(key)[1]
+
+    def clear(self):
+
+        with self._lock:
+
+            self._i.clear()
+            self.size_bytes = 0
+
+    def get(self,key,default=None):
+
+        with self._lock:
+
+            if key not in self._i:
+
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._i.move_to_end(key)
+
+            return self._i[key][0]
+
+    def stats(self):
 
-    def get(self,key):
+        lookups = self.hits+self.misses
 
-        return self._i[key]
+        return {
+            "entries":len(self._i),
+            "bytes":self.size_bytes,
+            "hits":self.hits,
+            "misses":self.misses,
+            "evictions":self.evictions,
+            "hit_ratio":self.hits/lookups if lookups else 0
+        }
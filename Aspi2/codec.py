@@ -0,0 +1,249 @@
+
+"""
+Record codecs generated for a structure.
+
+A structure's compiled records have a fixed layout: the null map followed by every value at a fixed offset.
+Codec turns that layout, once, into a single struct.Struct covering the null map, all numbers and the length
+prefixes of strings and bytes (their contents are pad bytes to it), plus pack and unpack functions generated
+as Python source for exactly these fields. Packing is a pack_into a zeroed bytearray followed by slice assignments
+for the variable length contents, unpacking a single unpack_from followed by one slice per string.
+Datatypes the codec doesn't know are handled as raw bytes by their own compile and fetch.
+"""
+
+import struct
+
+from . import datatypes
+
+INT_FORMATS = {1:"b",2:"h",4:"i",8:"q"}
+
+LENGTH_FORMATS = {1:"B",2:"H",4:"I"}
+
+ENCODINGS = {
+
+    datatypes.ASCIIString:"ascii",
+    datatypes.UnicodeString:"utf-8"
+
+}
+
+class Codec:
+
+    def __init__(self,struc,null_error):
+
+        """
+        ' null_error ' is the exception raised for null values of fields that aren't nullable.
+        """
+
+        self.struc = struc
+        self.size = len(struc)
+
+        self._namespace = {"ValueCanNotBeNullError":null_error,"struct_error":struct.error}
+        self._generate()
+
+        exec(compile(self.source,f"<codec {', '.join(self.struc.keys)}>","exec"),self._namespace)
+
+        self.pack_into = self._namespace["pack_into"]
+        self.unpack = self._namespace["unpack"]
+
+    def _generate(self):
+
+        struc = self.struc
+
+        nulmap_format = {1:"B",2:"H",4:"I",8:"Q"}.get(struc.nulmap_size,f"{struc.nulmap_size}s")
+
+        fmt = ["<",nulmap_format]
+        names = ["nul"] # Unpacked from / packed into the struct, in order
+
+        pack = ["def pack_into(d,buf,o):","    nul = 0"]
+        pack_after = [] # Slice assignments after pack_into
+        unpack_values = []
+
+        non_nullable_mask = 0
+
+        for keyname,index in struc.keys.items():
+
+            datatype = struc.data[index]
+            offset = struc.get_value_offset(keyname)
+            size = len(datatype)
+
+            n = f"v{index}"
+            bit = 1 << index
+            kind = type(datatype)
+
+            if not struc.nullables[index]:
+
+                non_nullable_mask |= bit
+
+            self._namespace[f"t{index}"] = datatype
+            self._namespace[f"type{index}"] = datatype.real_type
+
+            pack.append(f"    {n} = d.get({keyname!r})")
+            pack.append(f"    if {n} is None:")
+
+            if struc.nullables[index]:
+
+                pack.append(f"        nul |= {bit}")
+
+            else:
+
+                pack.append(f"        raise ValueCanNotBeNullError('Given data is missing a value that is not allowed to be null.')")
+
+            null_value = "0"
+            type_check = [f"    elif type({n}) is not type{index}:",f"        raise ValueError(f\"Could not compile: expected type ' {{type{index}}} ' got  ' {{type({n})}} '\")"]
+
+            if kind in [datatypes.IntUnsigned,datatypes.IntSigned] and size in INT_FORMATS:
+
+                char = INT_FORMATS[size]
+
+                fmt.append(char.upper() if kind is datatypes.IntUnsigned else char)
+                names.append(n)
+
+                pack += type_check
+                unpack_values.append(n)
+
+            elif kind is datatypes.Boolean:
+
+                fmt.append("?")
+                names.append(n)
+
+                pack += type_check
+                unpack_values.append(n)
+                null_value = "False"
+
+            elif kind is datatypes.Decimal:
+
+                fmt.append("d")
+                names.append(n)
+
+                pack += type_check
+                unpack_values.append(n)
+                null_value = "0.0"
+
+            elif kind is datatypes.FixedBytes:
+
+                fmt.append(f"{size}s")
+                names.append(n)
+
+                pack += type_check
+                pack += [f"    elif len({n}) > {size}:",f"        raise ValueError(\"Can't compile: length exceeds maximum byte amount\")"]
+                unpack_values.append(n)
+                null_value = "b''"
+
+            elif kind in [datatypes.Bytes,datatypes.ASCIIString,datatypes.UnicodeString] and datatype._lenbytesize in LENGTH_FORMATS:
+
+                length_size = datatype._lenbytesize
+                start = offset+length_size
+
+                fmt.append(LENGTH_FORMATS[length_size])
+                fmt.append(f"{size-length_size}x")
+                names.append(f"l{index}")
+
+                pack += type_check
+
+                if kind is datatypes.Bytes:
+
+                    pack += [f"    elif len({n}) > {datatype.max_bchars}:",f"        raise ValueError(\"Can't compile: length exceeds maximum byte amount\")"]
+                    pack.append(f"    else:")
+                    pack.append(f"        e{index} = {n}")
+
+                    unpack_values.append(f"bytes(b[o+{start}:o+{start}+l{index}])")
+
+                else:
+
+                    pack += [f"    elif len({n}) > {datatype.max_chars}:",f"        raise ValueError(\"Can't compile: length exceeds maximum char amount\")"]
+                    pack.append(f"    else:")
+                    pack.append(f"        e{index} = {n}.encode({ENCODINGS[kind]!r})")
+
+                    unpack_values.append(f"str(b[o+{start}:o+{start}+l{index}],{ENCODINGS[kind]!r})")
+
+                pack.append(f"    l{index} = len(e{index}) if {n} is not None else 0")
+                pack_after += [f"    if l{index}:",f"        buf[o+{start}:o+{start}+l{index}] = e{index}"]
+
+                null_value = None
+
+            else: # Compiled and fetched by the datatype itself
+
+                fmt.append(f"{size}s")
+                names.append(n)
+
+                pack.append(f"    else:")
+                pack.append(f"        {n} = t{index}.compile({n})")
+
+                unpack_values.append(f"t{index}.fetch({n})")
+                null_value = f"b'\\x00'*{size}"
+
+            if null_value is not None:
+
+                pack.append(f"    if {n} is None:")
+                pack.append(f"        {n} = {null_value}")
+
+        self.struct = struct.Struct("".join(fmt))
+
+        assert self.struct.size == self.size, (self.struct.format,self.struct.size,self.size)
+
+        self._namespace["_pack_into"] = self.struct.pack_into
+        self._namespace["_unpack_from"] = self.struct.unpack_from
+
+        nul = "nul" if nulmap_format[-1] != "s" else f"nul.to_bytes({struc.nulmap_size},'little')"
+
+        pack.append("    try:")
+        pack.append(f"        _pack_into(buf,o,{nul},{','.join(names[1:])})")
+        pack.append("    except struct_error as e:")
+        pack.append("        raise OverflowError(str(e)) from None")
+        pack += pack_after
+
+        unpack = [f"def unpack(b,o=0):",f"    {','.join(names)}{',' if len(names) == 1 else ''} = _unpack_from(b,o)"]
+
+        if nulmap_format[-1] == "s":
+
+            unpack.append("    nul = int.from_bytes(nul,'little')")
+
+        if non_nullable_mask:
+
+            unpack.append(f"    if nul & {non_nullable_mask}:")
+            unpack.append(f"        raise ValueCanNotBeNullError('Value in fetched data is null but is not allowed to be null')")
+
+        values = []
+
+        for (keyname,index),value in zip(struc.keys.items(),unpack_values):
+
+            values.append(f"{keyname!r}:{value}" if not struc.nullables[index] else f"{keyname!r}:None if nul & {1 << index} else {value}")
+
+        unpack.append(f"    return {{{','.join(values)}}}")
+
+        self.source = "\n".join(pack)+"\n\n"+"\n".join(unpack)+"\n"
+
+    def pack(self,d):
+
+        buf = bytearray(self.size)
+
+        self.pack_into(d,buf,0)
+
+        return bytes(buf)
+
+    def pack_many(self,records):
+
+        """
+        Packs all records into one preallocated buffer, record i at i*size.
+        """
+
+        buf = bytearray(self.size*len(records))
+        pack_into = self.pack_into
+
+        for i,d in enumerate(records):
+
+            pack_into(d,buf,i*self.size)
+
+        return buf
+
+    def unpack_many(self,b,count=None,stride=None,offset=0):
+
+        """
+        Unpacks ' count ' records (default: as many as fit) from ' b ', starting at ' offset ' and ' stride ' bytes apart (default: the record size).
+        """
+
+        stride = self.size if stride is None else stride
+        count = (len(b)-offset+stride-self.size)//stride if count is None else count
+
+        unpack = self.unpack
+
+        return [unpack(b,offset+i*stride) for i in range(count)]
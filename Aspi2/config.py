@@ -5,11 +5,46 @@ DEFAULT_CONFIG = {
     "logger_directory":"{dbname}_logs",
     "logger_print_enabled":True,
     "logger_print_level":"INFO",
+    "logger_file_level":"INFO", # Highest level written to the log file, ' DEBUG ' logs every operation
+    "logger_async":True, # Write the log file from a background thread
 
-    "rescale_backups":True,
+    "rescale_backups":True, # Back up the database file before rescales that aren't progressive
+    "rescale_step_slots":8, # Slots moved per accessor operation during a progressive rescale
+    "rescale_batch_slots":4096, # Slots moved at once when a rescale runs to completion
+
+    "auto_rescale":False, # Rescale progressively in a background thread when one of the triggers below fires
+    "rescale_max_load_factor":1.0, # Entries per slot
+    "rescale_max_average_chain_length":2.0,
+    "rescale_max_chain_length":16, # Longest chain walked by a single write
+    "rescale_max_tombstone_ratio":0.5, # Deleted entries over all entries
+    "rescale_min_entries":1024, # Triggers never fire for smaller databases
+    "rescale_background_slots":256, # Slots moved per step of a background rescale
+    "open_max_load_factor":0.9, # The open addressing engine doubles its slots when the entries would exceed this share of them
     "backup_directory":"{dbname}_backups",
 
-    "max_cache_size":1024*1024
+    "max_cache_size":1024*1024,
+    "max_cache_bytes":64*1024*1024,
+    "cache_mode":"decoded", # ' decoded ' caches decoded records, ' raw ' caches the encoded bytes
+    "cache_misses":True,
+
+    "mmap_enabled":False,
+
+    "bloom_filter":False, # Answer get and has for missing keys from a Bloom filter kept in ' <location>.aspbloom '
+    "bloom_error_rate":0.01, # False positive rate of the Bloom filter at its capacity (twice the entries when it was built)
+
+    "process_locking":False, # Coordinate with other processes through ' <location>.asplock ', can't be combined with the write-ahead log
+
+    "wal_enabled":False, # Log writes to ' <location>.aspwal ' and only apply them to the database file on checkpoints
+    "wal_checkpoint_bytes":16*1024*1024, # Checkpoint once the log holds more than this
+    "durability":"flush", # ' none ', ' flush ' (hand every commit to the OS), ' fsync ' (sync every commit) or ' group ' (sync at most every ' group_commit_ms ')
+    "group_commit_ms":10,
+
+    "metrics_enabled":False, # Record operation latencies and I/O counts for Database.metrics, nothing is instrumented otherwise
+
+    "scan_engine":"auto", # ' auto ' uses the NumPy scan engine for find when numpy is installed, ' python ' never does
+    "scan_chunk_rows":65536,
+    "scan_workers":1, # Workers of full scans (keys, values, items and find without an index), 0 for one per CPU, 1 scans serially
+    "scan_pool":"thread" # ' thread ' (parallel reads) or ' process ' (parallel reads and decoding, find operators have to be picklable)
 }
 
 def load(c):
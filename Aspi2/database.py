@@ -1,8 +1,10 @@
 
 import os
-import hashlib
+import mmap
 import time
 import shutil
+import threading
+import contextlib
 
 from . import MAGIC_NUM,VERSION
 from . import logging_utils
@@ -11,8 +13,57 @@ from . import find_operators
 from . import config
 from . import structure
 from . import caching
+from . import hashing
+from . import vectorized
+from . import indexing
+from . import wal
+from . import locking
+from . import parallel
+from . import metrics
+from . import bloom
+from . import open_addressing
 
-def build(location,name,struc,slots=1024,max_key_length=64,index_size_bytes=12):
+def build(location,name,struc,slots=1024,max_key_length=64,index_size_bytes=12,hash_algorithm="sha1",power_of_two_slots=False,indexes=None,fingerprint_size=0,engine="chained"):
+
+    """
+    ' indexes ' optionally declares secondary indexes as a dict of field name -> ' hash ' (for == and in) or ' sorted ' (also for <, >, <= and >=).
+    ' fingerprint_size ' (0 to 8 bytes) stores that much of the key hash in every slot and entry header,
+    so walking a chain skips the keys of entries whose fingerprint doesn't match.
+    ' engine ' is ' chained ' (collisions are linked through the entries) or ' open_addressing ' (see Aspi2.open_addressing),
+    which always stores 8 byte fingerprints.
+    """
+
+    hash_identifier = hashing.get_identifier(hash_algorithm)
+
+    if not 0 <= fingerprint_size <= 8:
+
+        raise ValueError(f"Fingerprint size has to be between 0 and 8 bytes, not {fingerprint_size}")
+
+    if engine not in ENGINES:
+
+        raise ValueError(f"Unknown engine ' {engine} ', choose one of {', '.join(ENGINES)}")
+
+    if engine == "open_addressing":
+
+        if fingerprint_size not in [0,open_addressing.FINGERPRINT_SIZE]:
+
+            raise ValueError(f"The open addressing engine always stores {open_addressing.FINGERPRINT_SIZE} byte fingerprints")
+
+        fingerprint_size = open_addressing.FINGERPRINT_SIZE
+
+    index_objects = {}
+
+    for field,kind in (indexes or {}).items():
+
+        if field not in [keyname for keyname,_,_2,_3 in struc]:
+
+            raise ValueError(f"Can't index ' {field} ': not in structure")
+
+        index_objects[field] = indexing.new_index(kind)
+
+    if power_of_two_slots: # Lets the slot be computed with a mask instead of a modulo
+
+        slots = math_utils.next_power_of_two(slots)
 
     with open(location,"wb") as f:
 
@@ -32,13 +83,50 @@ def build(location,name,struc,slots=1024,max_key_length=64,index_size_bytes=12):
 
         f.write(slots.to_bytes(12,'little'))
 
-        f.seek(slots*(index_size_bytes+1),1)
+        f.write(b"\x00"*COUNTERS_SIZE) # entries, deleted entries, collided entries, writes
+
+        f.write(hash_identifier.to_bytes(1,'little'))
+
+        f.write(b"\x00"*12) # Head of the free list
+
+        f.write(fingerprint_size.to_bytes(1,'little'))
+        f.write(ENGINES[engine].to_bytes(1,'little'))
+
+        f.seek(slots*(1+index_size_bytes+fingerprint_size),1)
         f.write(b"\x00")
 
+    if index_objects:
+
+        indexing.save(indexing.sidecar_path(location),index_objects,structure.Structure(struc),(0,0))
+
+    elif os.path.isfile(indexing.sidecar_path(location)):
+
+        os.remove(indexing.sidecar_path(location))
+
+    if os.path.isfile(bloom.sidecar_path(location)): # Belongs to the database that was replaced
+
+        os.remove(bloom.sidecar_path(location))
+
 OCCUPANCE_NOT_OCCUPIED = b"\x00"
 OCCUPANCE_OCCUPIED = b"\x01"
 OCCUPANCE_NOT_OCCUPIED_COLLIDED = b"\x02"
 OCCUPANCE_OCCUPIED_COLLIDED = b"\x03"
+OCCUPANCE_FREE = b"\x04" # Out of any chain, the collider index points to the next free entry
+
+# Identifiers are stored in the database header, never change them
+
+ENGINES = {
+
+    "chained":0,
+    "open_addressing":1
+
+}
+
+COUNTERS_SIZE = 4*12
+
+SCAN_CHUNK_BYTES = 64*1024 # Read at once by full scans
+
+FIELD_READ_GAP = 512 # Values of a projection closer than this are read at once
 
 IO_WHENCE_START = 0
 IO_WHENCE_RELATIVE = 1
@@ -54,7 +142,78 @@ class Database:
 
             raise FileNotFoundError(f"Didn't find file at '{location}'")
 
-        with open(location,"rb") as db_f:
+        self.config = config.load(db_config)
+
+        replayed = wal.recover(location)
+
+        self.process_lock = None
+
+        if self.config["process_locking"]:
+
+            if self.config["wal_enabled"]:
+
+                raise ValueError("The write-ahead log keeps pages in the memory of one process, it can't be enabled with ' process_locking '")
+
+            if self.config["bloom_filter"]:
+
+                raise ValueError("The Bloom filter only knows the keys written by this process, it can't be enabled with ' process_locking '")
+
+            self.process_lock = locking.ProcessLock(location)
+            self._generation = self.process_lock.generation() # Read before the header, a write in between only causes a needless reload
+
+        self._load_header()
+
+        self.logger = logging_utils.Logger(self.name, self.config['logger_directory'].format(dbname=self.name), self.config["logger_enabled"], self.config["logger_print_enabled"], self.config["logger_print_level"], self.config["logger_file_level"], self.config["logger_async"])
+        self.log = self.logger.log
+
+        if replayed:
+
+            self.log(f"Replayed {replayed} commits from the write-ahead log.",logging_utils.WARNING)
+
+        self.wal = wal.WriteAheadLog(location,self.config["durability"],self.config["group_commit_ms"]) if self.config["wal_enabled"] else None
+        self.group_commit = wal.GroupCommit(location,self.config["group_commit_ms"]/1000) if self.config["durability"] == "group" and self.wal is None else None
+
+        self.accessors = []
+        self.closed = False
+
+        self.lock = locking.ReadWriteLock(self.process_lock,self._reload_if_changed,self._publish_write) # ' with lock: ' for writes and rescale steps, ' with lock.read(): ' for reads
+
+        self.rescaling = None
+        self.longest_chain = 0
+
+        self._rescale_thread = None
+        self._auto_rescale_after = 0
+
+        self.cache = caching.Cache(self.config["max_cache_size"],self.config["max_cache_bytes"])
+
+        self._scan_pools = {}
+
+        self._metrics = None # Records the database operations and those of closed accessors, see Database.metrics
+
+        if self.config["metrics_enabled"]:
+
+            self._metrics = metrics.Recorder()
+            self._metrics_lock = threading.Lock()
+
+            metrics.instrument_database(self,self._metrics,self._metrics_lock)
+            metrics.register(self)
+
+        if self.counters_location is None:
+
+            self.log(f"Database ' {self.name} ' has no stored entry counters (version {self.version}), counting entries once.")
+            self._recount()
+
+        self.indexes = {}
+        self.bloom = None
+
+        self._load_indexes()
+        self._load_bloom()
+
+        self.log(f"Database ' {self.name} ' initialised with version ' {self.version} ' (Client version is ' {VERSION} '),  structure of size {len(self.structure)} ( {len(self.structure)/1024/1024} mb ), at most {int(2**(self.indexsize*8)/self.entry_size)} entries possible.")
+
+    def _load_header(self):
+
+        with open(self.location,"rb") as db_f:
 
             if db_f.read(len(MAGIC_NUM)) != MAGIC_NUM:
 
@@ -65,6 +224,12 @@ class Database:
 
             self.version = int.from_bytes(db_f.read(3),'little')
 
+            self._inode = os.fstat(db_f.fileno()).st_ino
+
+            if self.version > VERSION:
+
+                raise UnsupportedVersion(f"Database was written by version {self.version}, this client only supports up to version {VERSION}")
+
             self.keysize = int.from_bytes(db_f.read(2),'little')
             self.keysize_bytesize = math_utils.bytes_needed_to_store_num(self.keysize)
             self.indexsize =  int.from_bytes(db_f.read(1),'little') # default: 12
@@ -74,767 +239,2525 @@ class Database:
             self._struc_raw = structure.decompile_struc(struc_bytes)
             self.structure = structure.load_structure(struc_bytes)
 
-            self._slotsize = 1 + self.indexsize # occupance info (1B) + index
+            self.slots = int.from_bytes(db_f.read(12),'little')
 
-            self.config = config.load(db_config)
+            self.counters_location = None
 
-            self.slots = int.from_bytes(db_f.read(12),'little')
+            if self.version >= 3:
 
-            self.indices_location = db_f.tell()
+                self.counters_location = db_f.tell()
+                self._set_counters(db_f.read(COUNTERS_SIZE))
 
-            db_f.seek(self.slots*self._slotsize,IO_WHENCE_RELATIVE)
+            self.hash_algorithm = hashing.ALGORITHMS["sha1"]
 
-            self.data_location = db_f.tell()
+            if self.version >= 4:
 
-        self.entry_size = 1+self.indexsize+self.keysize_bytesize+self.keysize+len(self.structure)
+                self.hash_algorithm = int.from_bytes(db_f.read(1),'little')
 
-        self.logger = logging_utils.Logger(self.name, self.config['logger_directory'].format(dbname=self.name), self.config["logger_enabled"], self.config["logger_print_enabled"], self.config["logger_print_level"])
-        self.log = self.logger.log
+            self.free_location = None
+            self.free_head = 0
 
-        self.accessors = []
+            if self.version >= 5:
 
-        self.log(f"Database ' {self.name} ' initialised with version ' {self.version} ' (Client version is ' {VERSION} '),  structure of size {len(self.structure)} ( {len(self.structure)/1024/1024} mb ), at most {int(2**(self.indexsize*8)/self.entry_size)} entries possible.")
+                self.free_location = db_f.tell()
+                self.free_head = int.from_bytes(db_f.read(12),'little')
 
-    def get_slot(self,key):
+            self.fingerprint_size = 0
 
-        return int.from_bytes(hashlib.sha1(key.encode('ascii')).digest(),'little') % self.slots
+            if self.version >= 6:
 
-    def get_slot_index(self,key):
+                self.fingerprint_size = int.from_bytes(db_f.read(1),'little')
 
-        return self.indices_location + self.get_slot(key) * self._slotsize
+            self.engine = ENGINES["chained"]
 
-    def backup(self,backup_identifier="manual"):
+            if self.version >= 7:
 
-        if not os.path.exists(self.config["backup_directory"].format(dbname=self.name)):
+                self.engine = int.from_bytes(db_f.read(1),'little')
 
-            os.makedirs(self.config["backup_directory"].format(dbname=self.name),exist_ok=True)
-            self.log(f"Made new directory ' {self.config['backup_directory'].format(dbname=self.name)} '")
+            self.open_addressing = self.engine == ENGINES["open_addressing"]
+            self._engine_name = {identifier:name for name,identifier in ENGINES.items()}[self.engine]
 
-        shutil.copyfile(self.location, os.path.join(self.config["backup_directory"].format(dbname=self.name),f"backup_{backup_identifier}_{int(time.time())}_{self.slots}.asp2"))
+            self._slotsize = 1 + self.indexsize + self.fingerprint_size # occupance info (1B) + index + fingerprint of the first entry
 
-    def close_all_accessors(self):
+            self._hash = hashing.get_function(self.hash_algorithm)
+            self._slot_mask = self.slots-1 if self.slots & (self.slots-1) == 0 else None
+            self._fingerprint_shift = max(hashing.BITS[self.hash_algorithm]-8*self.fingerprint_size,0)
+            self._slot_shift = self._fingerprint_shift if self.open_addressing else 0 # Open addressing takes the slot from the fingerprint
 
-        for a in self.accessors:
+            self.indices_location = db_f.tell()
 
-            a.close()
+            db_f.seek(self.slots*self._slotsize,IO_WHENCE_RELATIVE)
 
-    def rescale(self,new_slot_amount=None):
+            self.data_location = db_f.tell()
 
-        self.log("RESCALE")
+        self._key_length_offset = 1+self.indexsize+self.fingerprint_size
+        self._key_offset = self._key_length_offset+self.keysize_bytesize
+        self.entry_header_size = self._key_offset+self.keysize # occupance info (1B) + collider index + fingerprint + key length + key
+        self.entry_size = self.entry_header_size+len(self.structure)
 
-        self.close_all_accessors()
+    def _reload_if_changed(self):
 
-        rescale_start_time = time.time()
+        """
+        Called whenever this process takes the process lock. Reloads everything kept in memory if another process wrote since.
+        """
 
-        health_before = self.health
+        generation = self.process_lock.generation()
 
-        rescale_job_id = f"{int(rescale_start_time)}&{os.urandom(6).hex()}"
+        if generation == self._generation:
 
-        db_len = len(self)
-        target_slots = db_len*4 if not new_slot_amount else new_slot_amount
-        if target_slots == self.slots:
-            self.log("RESCALE: Rescale cancelled. Already at target slot amount.")
             return
 
-        self.log(f"RESCALE: New slot amount will be {target_slots} slots")
+        self._generation = generation
 
-        rescale_db_path = f"rescale_{rescale_job_id}.rasp2"
+        if self.logger.level >= logging_utils.DEBUG:
+            self.log("Database was changed by another process, reloading",logging_utils.DEBUG)
 
-        build(rescale_db_path, self.name, self._struc_raw, target_slots, self.keysize, self.indexsize)
+        if os.stat(self.location).st_ino != self._inode: # Rescaled or compacted into a new file
 
-        rescale_db = Database(rescale_db_path, {"logger_enabled":False})
-        rescale_db_accessor = Accessor(rescale_db)
-        db_accessor = Accessor(self)
+            self._load_header()
 
-        for k,v in db_accessor.items():
+            for a in self.accessors:
 
-            rescale_db_accessor.set(k,v)
+                a._reopen()
 
-        if self.config["rescale_backups"]:
+        elif self.counters_location is not None:
 
-            self.log("RESCALE: Backing up...")
-            self.backup("rescale")
-            self.log("RESCALE: Done backing up!")
+            with open(self.location,"rb") as db_f:
 
-        db_accessor.close()
-        rescale_db_accessor.close()
+                db_f.seek(self.counters_location)
+                self._set_counters(db_f.read(COUNTERS_SIZE))
 
-        self.log("RESCALE: Overwriting current db")
-        shutil.copyfile(rescale_db_path,self.location)
+                if self.free_location is not None:
 
-        self.log("RESCALE: Deleting rescale db")
-        os.remove(rescale_db_path)
+                    db_f.seek(self.free_location)
+                    self.free_head = int.from_bytes(db_f.read(12),'little')
 
-        self.slots = target_slots
+        else:
 
-        health_after = self.health
+            self._recount()
 
-        improvement = health_after-health_before
+        self.cache.clear()
+        self.longest_chain = 0
 
-        self.log(f"RESCALE: Health before: {health_before}, health after : {health_after}, improvement: {improvement}")
+        if self.indexes:
 
-        return improvement
+            if self.logger.level >= logging_utils.DEBUG:
+                self.log(f"Secondary indexes on {', '.join(self.indexes)} are out of date, rebuilding.",logging_utils.DEBUG)
+            self._fill_indexes(list(self.indexes))
 
-    @property
-    def health(self):
+    def _publish_write(self):
 
-        return Accessor(self).health
+        self._generation = self.process_lock.increment() # Our own write, nothing to reload for it
 
-    def __len__(self):
+    def _set_counters(self,b):
 
-        return len(Accessor(self))
+        self.entries = int.from_bytes(b[0:12],'little')
+        self.deleted_entries = int.from_bytes(b[12:24],'little')
+        self.collided_entries = int.from_bytes(b[24:36],'little')
+        self.writes = int.from_bytes(b[36:48],'little')
 
-class Accessor:
+    def counters_bytes(self):
 
-    def __init__(self,database):
+        return self.entries.to_bytes(12,'little') + self.deleted_entries.to_bytes(12,'little') + self.collided_entries.to_bytes(12,'little') + self.writes.to_bytes(12,'little')
 
-        self.db = database
-        self.db.accessors.append(self)
+    def _recount(self):
 
-        self.db.log("Accessor created.","DEBUG")
+        db_accessor = Accessor(self)
 
-        self._file =  open(self.db.location,"rb+")
+        self.entries, self.deleted_entries, self.collided_entries = db_accessor._count_entries()
+        self.writes = 0
 
-        self._val_cache = caching.Cache(self.db.config["max_cache_size"])
-        self._health_cache = None
-        self._len_cache = None
+        db_accessor.close()
 
-        self.closed = False
+    def _load_indexes(self):
 
-    def close(self):
+        if not os.path.isfile(indexing.sidecar_path(self.location)):
 
-        self.closed = True
-        self.db.accessors.remove(self)
-        self._file.close()
+            return
 
-    def all_keys(self):
+        stamp, self.indexes = indexing.load(indexing.sidecar_path(self.location),self.structure)
 
-        return list(self.keys())
+        if self.counters_location is None or stamp != (self.writes,self.entries):
 
-    def all_values(self):
+            self.log(f"Secondary indexes on {', '.join(self.indexes)} are out of date, rebuilding.",logging_utils.WARNING)
+            self.rebuild_indexes()
 
-        return list(self.values())
+    def save_indexes(self):
 
-    def all_items(self):
+        if self.indexes:
 
-        return list(self.items())
+            indexing.save(indexing.sidecar_path(self.location),self.indexes,self.structure,(self.writes,self.entries))
 
-    def _write_data_at(self,index,key,data,collider=None):
+    def rebuild_indexes(self,fields=None):
 
-        self._file.seek(self.db.data_location+index)
+        fields = list(self.indexes) if fields is None else fields
 
-        self._file.write(OCCUPANCE_OCCUPIED if not collider else OCCUPANCE_OCCUPIED_COLLIDED)
-        self._file.write(collider.to_bytes(self.db.indexsize,'little') if collider else b"\x00"*self.db.indexsize)
-        self._file.write(len(key).to_bytes(self.db.keysize_bytesize,'little'))
-        self._file.write(key.encode("ascii")+(self.db.keysize-len(key))*b"\x00")
-        self._file.write(data)
-        self._file.flush()
+        self._fill_indexes(fields)
 
-        self._val_cache.set(key,data)
+        self.save_indexes()
 
-    def delete(self,key):
+    def _fill_indexes(self,fields):
 
-        self.db.log(f"DELETE {key}","DEBUG")
+        for field in fields:
 
-        self._len_cache = None
-        self._health_cache = None
+            self.indexes[field] = indexing.new_index(self.indexes[field].kind)
 
-        slot_index = self.db.get_slot_index(key)
+        pairs = {field:[] for field in fields}
 
-        self._file.seek(slot_index)
-        occupance_info = self._file.read(1)
-        self._file.seek(slot_index)
+        db_accessor = Accessor(self)
 
-        if occupance_info == OCCUPANCE_NOT_OCCUPIED:
+        for entry in db_accessor._live_entries():
 
-            return None
+            key = db_accessor._entry_key(entry)
 
-        elif occupance_info == OCCUPANCE_OCCUPIED:
+            for field in fields:
 
-            self._file.seek(1,1)
+                pairs[field].append((self.structure.fetch_value(field,entry[self.entry_header_size:]),key))
 
-            o_dataindex = int.from_bytes(self._file.read(self.db.indexsize),'little')
+        db_accessor.close()
 
-            self._file.seek(self.db.data_location+o_dataindex)
+        for field in fields:
 
-            data_occupance_info =  self._file.read(1)
+            self.indexes[field].add_many(pairs[field])
 
-            if data_occupance_info == OCCUPANCE_NOT_OCCUPIED:
+    def _load_bloom(self):
 
-                self._file.seek(self.db.data_location+cur_dataindex)
+        if not self.config["bloom_filter"]:
 
-            elif data_occupance_info in [OCCUPANCE_OCCUPIED_COLLIDED,OCCUPANCE_OCCUPIED,OCCUPANCE_NOT_OCCUPIED_COLLIDED]:
+            return
 
-                cur_dataindex = o_dataindex
+        if os.path.isfile(bloom.sidecar_path(self.location)) and self.counters_location is not None:
 
-                while True:
+            stamp, bloom_filter = bloom.load(bloom.sidecar_path(self.location))
 
-                    self._file.seek(self.db.data_location+cur_dataindex)
+            if bloom_filter is not None and stamp == (self.writes,self.entries) and bloom_filter.error_rate == self.config["bloom_error_rate"]:
 
-                    data_occupance_info =  self._file.read(1)
+                self.bloom = bloom_filter
 
-                    collided_index = int.from_bytes(self._file.read(self.db.indexsize),'little')
+                return
 
-                    key_r_len = int.from_bytes(self._file.read(self.db.keysize_bytesize),'little')
-                    key_r = self._file.read(self.db.keysize)[:key_r_len].decode('ascii')
+            self.log("Bloom filter is out of date, rebuilding.",logging_utils.WARNING)
 
-                    if key_r == key:
+        self.rebuild_bloom()
 
-                        if data_occupance_info in [OCCUPANCE_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED]:
+    def save_bloom(self):
 
-                            self._file.seek(self.db.data_location+cur_dataindex)
-                            self._file.write({OCCUPANCE_OCCUPIED:OCCUPANCE_NOT_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED:OCCUPANCE_NOT_OCCUPIED_COLLIDED}[data_occupance_info])
-                            break
+        if self.bloom is not None:
 
-                        else:
+            bloom.save(bloom.sidecar_path(self.location),self.bloom,(self.writes,self.entries))
 
-                            raise ValueError("Couldn't find key that you were trying to delete")
+    def rebuild_bloom(self):
 
-                    else:
+        """
+        Rebuilds the Bloom filter from the live keys, which drops deleted keys and resizes it for twice the current entry count.
+        """
 
-                        if data_occupance_info == OCCUPANCE_OCCUPIED_COLLIDED:
+        with self.lock:
 
-                            cur_dataindex = collided_index
+            self._fill_bloom()
 
-                        elif data_occupance_info == OCCUPANCE_NOT_OCCUPIED:
+            self.save_bloom()
 
-                            raise ValueError("Couldn't find key that you were trying to delete")
+    def _fill_bloom(self):
 
-                        elif data_occupance_info == OCCUPANCE_OCCUPIED:
+        bloom_filter = bloom.BloomFilter(max(self.entries*2,self.slots),self.config["bloom_error_rate"])
 
-                            raise ValueError("Couldn't find key that you were trying to delete")
+        db_accessor = Accessor(self)
 
-                        elif data_occupance_info == OCCUPANCE_NOT_OCCUPIED_COLLIDED:
+        for entry in db_accessor._live_entries():
 
-                            if collided_index == o_dataindex: # To evade infinite looping
+            bloom_filter.add(db_accessor._entry_key(entry))
 
-                                raise ValueError("Couldn't find key that you were trying to delete")
+        db_accessor.close()
 
-                            cur_dataindex = collided_index
+        self.bloom = bloom_filter
 
-        self._val_cache.invalidate(key)
+    def create_index(self,field,kind="hash"):
 
-    def set(self,key,data):
+        self.log(f"CREATE INDEX {kind} ON {field}")
 
-        self.db.log(f"SET {key}","DEBUG")
+        self.structure.get_value_offset(field) # Raises if field isn't in the structure
 
-        self._len_cache = None
-        self._health_cache = None
+        self.indexes[field] = indexing.new_index(kind)
+        self.rebuild_indexes([field])
 
-        comp_data = self.db.structure.compile(data)
+    def drop_index(self,field):
 
-        slot_index = self.db.get_slot_index(key)
+        self.log(f"DROP INDEX ON {field}")
 
-        self._file.seek(slot_index)
-        occupance_info = self._file.read(1)
-        self._file.seek(slot_index)
+        self.indexes.pop(field)
 
-        if occupance_info == OCCUPANCE_NOT_OCCUPIED:
+        if self.indexes:
 
-            self._file.write(b"\x01")
+            self.save_indexes()
 
-            dataindex = int(os.path.getsize(self.db.location))-self.db.data_location
-            self._file.write(dataindex.to_bytes(self.db.indexsize,"little"))
+        else:
 
-            self._write_data_at(dataindex,key,comp_data)
+            os.remove(indexing.sidecar_path(self.location))
 
-        elif occupance_info == OCCUPANCE_OCCUPIED:
+    def close(self):
 
-            self._file.seek(1,1)
+        with self.lock:
 
-            o_dataindex = int.from_bytes(self._file.read(self.db.indexsize),'little')
+            self.closed = True
 
-            self._file.seek(self.db.data_location+o_dataindex)
+        self.finish_rescale()
 
-            data_occupance_info =  self._file.read(1)
+        if self._rescale_thread is not None:
 
-            if data_occupance_info == OCCUPANCE_NOT_OCCUPIED:
+            self._rescale_thread.join()
 
-                self._write_data_at(o_dataindex,key,comp_data)
+        self.close_all_accessors()
 
-            elif data_occupance_info in [OCCUPANCE_OCCUPIED_COLLIDED,OCCUPANCE_OCCUPIED,OCCUPANCE_NOT_OCCUPIED_COLLIDED]:
+        for pool in self._scan_pools.values():
 
-                cur_dataindex = o_dataindex
+            pool.shutdown()
 
-                potential_index = None
-                potential_index_original_collider = None
+        if self.wal is not None:
 
-                while True:
+            self.wal.close()
 
-                    self._file.seek(self.db.data_location+cur_dataindex)
+        if self.group_commit is not None:
 
-                    data_occupance_info =  self._file.read(1)
+            self.group_commit.close()
 
-                    collided_index = int.from_bytes(self._file.read(self.db.indexsize),'little')
+        self.save_indexes()
+        self.save_bloom()
+        self.logger.close()
 
-                    key_r_len = int.from_bytes(self._file.read(self.db.keysize_bytesize),'little')
-                    key_r = self._file.read(self.db.keysize)[:key_r_len].decode('utf-8')
+        if self._metrics is not None:
 
-                    if key_r == key:
+            metrics.unregister(self)
 
-                        self._write_data_at(cur_dataindex,key,comp_data)
-                        break
+        if self.process_lock is not None:
 
-                    else:
+            self.process_lock.close()
 
-                        if data_occupance_info == OCCUPANCE_OCCUPIED_COLLIDED:
+    def metrics(self):
 
-                            cur_dataindex = collided_index
+        """
+        Returns a snapshot of the metrics recorded since the database was opened (needs ' metrics_enabled '): calls, errors and
+        latency percentiles in nanoseconds per operation, the lengths of the chains walked by get, set, has and delete,
+        cache statistics and the reads, writes, bytes and syscalls on the database file. See metrics.prometheus_text for the Prometheus format.
+        """
 
-                        elif data_occupance_info == OCCUPANCE_NOT_OCCUPIED:
+        if self._metrics is None:
 
-                            self._write_data_at(cur_dataindex,key,comp_data)
-                            break
+            raise ValueError("Metrics are disabled, enable them with ' metrics_enabled '")
 
-                        elif data_occupance_info == OCCUPANCE_OCCUPIED:
+        return metrics.snapshot(self,self._collect_metrics())
 
-                            new_dataindex = int(os.path.getsize(self.db.location))-self.db.data_location if not potential_index else potential_index
+    def _collect_metrics(self):
 
-                            self._file.seek(self.db.data_location+cur_dataindex)
-                            self._file.write(OCCUPANCE_OCCUPIED_COLLIDED)
-                            self._file.write(new_dataindex.to_bytes(self.db.indexsize,"little"))
+        recorder = metrics.Recorder()
 
-                            self._write_data_at(new_dataindex,key,comp_data,None if not potential_index else potential_index_original_collider)
-                            break
+        with self._metrics_lock:
 
-                        elif data_occupance_info == OCCUPANCE_NOT_OCCUPIED_COLLIDED:
+            recorder.merge(self._metrics)
 
-                            potential_index = cur_dataindex
-                            potential_index_original_collider = collided_index
+        for a in list(self.accessors):
 
-                            if collided_index == o_dataindex: # To evade infinite looping
+            if a._metrics is not None:
 
-                                self._write_data_at(cur_dataindex,key,comp_data,collided_index)
-                                break
+                recorder.merge(a._metrics)
 
-                            cur_dataindex = collided_index
+        return recorder
 
-    def get(self,key):
+    def get_slot(self,key):
 
-        self.db.log(f"GET {key}","DEBUG")
+        if self._slot_mask is not None:
 
-        if self._val_cache.has(key):
+            return self._hash(key.encode('ascii')) >> self._slot_shift & self._slot_mask
 
-            return self.db.structure.fetch(self._val_cache.get(key))
+        return (self._hash(key.encode('ascii')) >> self._slot_shift) % self.slots
 
-        slot_index = self.db.get_slot_index(key)
+    def get_slot_index(self,key):
 
-        self._file.seek(slot_index)
-        occupance_info = self._file.read(1)
-        self._file.seek(slot_index)
+        return self.indices_location + self.get_slot(key) * self._slotsize
 
-        if occupance_info == OCCUPANCE_NOT_OCCUPIED:
+    def get_slot_index_and_fingerprint(self,key):
 
-            return None
+        """
+        Returns (slot index, fingerprint) of ' key ' from one hash, the fingerprint is None without fingerprints.
+        """
 
-        elif occupance_info == OCCUPANCE_OCCUPIED:
+        h = self._hash(key.encode('ascii'))
+        slot = h >> self._slot_shift & self._slot_mask if self._slot_mask is not None else (h >> self._slot_shift) % self.slots
 
-            self._file.seek(1,1)
+        if not self.fingerprint_size:
 
-            o_dataindex = int.from_bytes(self._file.read(self.db.indexsize),'little')
+            return self.indices_location + slot * self._slotsize, None
 
-            self._file.seek(self.db.data_location+o_dataindex)
+        return self.indices_location + slot * self._slotsize, self._fingerprint(h)
 
-            data_occupance_info =  self._file.read(1)
+    def fingerprint(self,key):
 
-            if data_occupance_info == OCCUPANCE_NOT_OCCUPIED:
+        return self._fingerprint(self._hash(key.encode('ascii')))
 
-                return None
+    def _fingerprint(self,h):
 
-            elif data_occupance_info in [OCCUPANCE_OCCUPIED_COLLIDED,OCCUPANCE_OCCUPIED,OCCUPANCE_NOT_OCCUPIED_COLLIDED]:
+        return ((h >> self._fingerprint_shift) & ((1 << 8*self.fingerprint_size)-1)).to_bytes(self.fingerprint_size,'little')
 
-                cur_dataindex = o_dataindex
+    def checkpoint(self):
 
-                while True:
+        """
+        Applies the write-ahead log to the database file.
+        """
 
-                    self._file.seek(self.db.data_location+cur_dataindex)
+        with self.lock:
 
-                    data_occupance_info =  self._file.read(1)
+            if self.wal is not None:
 
-                    collided_index = int.from_bytes(self._file.read(self.db.indexsize),'little')
+                self.wal.checkpoint()
 
-                    key_r_len = int.from_bytes(self._file.read(self.db.keysize_bytesize),'little')
-                    key_r = self._file.read(self.db.keysize)[:key_r_len].decode('ascii')
+    def backup(self,backup_identifier="manual"):
 
-                    if key_r == key:
+        if not os.path.exists(self.config["backup_directory"].format(dbname=self.name)):
 
-                        if data_occupance_info in [OCCUPANCE_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED]:
+            os.makedirs(self.config["backup_directory"].format(dbname=self.name),exist_ok=True)
+            self.log(f"Made new directory ' {self.config['backup_directory'].format(dbname=self.name)} '")
 
-                            return self.db.structure.fetch(self._file.read(len(self.db.structure)))
+        self.checkpoint()
 
-                        else:
+        with self.lock.read():
 
-                            return None
+            shutil.copyfile(self.location, os.path.join(self.config["backup_directory"].format(dbname=self.name),f"backup_{backup_identifier}_{int(time.time())}_{self.slots}.asp2"))
 
-                    else:
+    def _scan_pool(self,kind,workers):
 
-                        if data_occupance_info == OCCUPANCE_OCCUPIED_COLLIDED:
+        """
+        Returns the pool of ' kind ' with ' workers ' workers used for parallel scans, started on first use and kept until the database is closed.
+        """
 
-                            cur_dataindex = collided_index
+        pool = self._scan_pools.get((kind,workers))
 
-                        elif data_occupance_info == OCCUPANCE_NOT_OCCUPIED:
+        if pool is None:
 
-                            return None
+            pool = self._scan_pools[(kind,workers)] = parallel.new_pool(kind,workers)
 
-                        elif data_occupance_info == OCCUPANCE_OCCUPIED:
+        return pool
 
-                            return None
+    def close_all_accessors(self):
 
-                        elif data_occupance_info == OCCUPANCE_NOT_OCCUPIED_COLLIDED:
+        for a in list(self.accessors):
 
-                            if collided_index == o_dataindex: # To evade infinite looping
+            a.close()
 
-                                return None
+    def rescale(self,new_slot_amount=None,progressive=False):
 
-                            cur_dataindex = collided_index
+        """
+        Moves all entries to a new slot table of ' new_slot_amount ' slots (default: 4 times the entry count).
+        Entries are copied into a new file without being decoded, which then replaces the database file (see Database._relink).
+        With ' progressive ' set this returns right away instead and every write operation moves a few more slots, reads and writes keep working meanwhile.
+        Rescales always run to completion with ' process_locking ', other processes couldn't follow a rescale in progress,
+        and with open addressing, which rebuilds its slot table from the entry headers in the same single pass.
+        """
 
-    def has(self,key):
+        with self.lock:
 
-        self.db.log(f"HAS {key}","DEBUG")
+            return self._rescale(new_slot_amount,progressive)
 
-        slot_index = self.db.get_slot_index(key)
+    def _rescale(self,new_slot_amount,progressive):
 
-        self._file.seek(slot_index)
-        occupance_info = self._file.read(1)
-        self._file.seek(slot_index)
+        self.log("RESCALE")
 
-        if occupance_info == OCCUPANCE_NOT_OCCUPIED:
+        self._check_no_transaction()
 
-            return False
+        if self.rescaling is not None:
 
-        elif occupance_info == OCCUPANCE_OCCUPIED:
+            self.log("RESCALE: Finishing the rescale in progress first")
+            self.finish_rescale()
 
-            self._file.seek(1,1)
+        health_before = self.health
 
-            o_dataindex = int.from_bytes(self._file.read(self.db.indexsize),'little')
+        db_len = len(self)
+        target_slots = max(db_len*4,1) if not new_slot_amount else new_slot_amount
+        if self._slot_mask is not None and not new_slot_amount:
+            target_slots = math_utils.next_power_of_two(target_slots)
+        if target_slots == self.slots and not self.deleted_entries:
+            self.log("RESCALE: Rescale cancelled. Already at target slot amount.")
+            return
+        if self.open_addressing and target_slots <= db_len:
+            raise ValueError(f"An open addressing table needs more than {target_slots} slots for {db_len} entries")
 
-            self._file.seek(self.db.data_location+o_dataindex)
+        self.log(f"RESCALE: New slot amount will be {target_slots} slots")
 
-            data_occupance_info =  self._file.read(1)
+        progressive = progressive and self.process_lock is None and not self.open_addressing
 
-            if data_occupance_info == OCCUPANCE_NOT_OCCUPIED:
+        if self.config["rescale_backups"] and not progressive: # A progressive rescale keeps the database file complete until the switch, and mustn't stall writes copying it
 
-                return False
+            self.log("RESCALE: Backing up...")
+            self.backup("rescale")
+            self.log("RESCALE: Done backing up!")
 
-            elif data_occupance_info in [OCCUPANCE_OCCUPIED_COLLIDED,OCCUPANCE_OCCUPIED,OCCUPANCE_NOT_OCCUPIED_COLLIDED]:
+        if progressive:
 
-                cur_dataindex = o_dataindex
+            self.log("RESCALE: Moving entries progressively")
+            self.rescaling = Rescale(self,target_slots)
 
-                while True:
+            return None
 
-                    self._file.seek(self.db.data_location+cur_dataindex)
+        self._relink(target_slots)
 
-                    data_occupance_info =  self._file.read(1)
+        improvement = self.health-health_before
 
-                    collided_index = int.from_bytes(self._file.read(self.db.indexsize),'little')
+        self.log(f"RESCALE: Health before: {health_before}, health after : {self.health}, improvement: {improvement}")
 
-                    key_r_len = int.from_bytes(self._file.read(self.db.keysize_bytesize),'little')
-                    key_r = self._file.read(self.db.keysize)[:key_r_len].decode('ascii')
+        return improvement
 
-                    if key_r == key:
+    def rescale_step(self,slot_amount=None):
 
-                        if data_occupance_info in [OCCUPANCE_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED]:
+        """
+        Moves the next ' slot_amount ' slots (default: config ' rescale_step_slots ') of the rescale in progress.
+        Returns True once no rescale is in progress anymore.
+        """
 
-                            return True
+        with self.lock:
 
-                        else:
+            if self.rescaling is None:
 
-                            return False
+                return True
 
-                    else:
+            if not self.rescaling.step(self.config["rescale_step_slots"] if slot_amount is None else slot_amount):
 
-                        if data_occupance_info == OCCUPANCE_OCCUPIED_COLLIDED:
+                return False
 
-                            cur_dataindex = collided_index
+            self._switch_rescaled()
 
-                        elif data_occupance_info == OCCUPANCE_NOT_OCCUPIED:
+            return True
 
-                            return False
+    def finish_rescale(self):
 
-                        elif data_occupance_info == OCCUPANCE_OCCUPIED:
+        while not self.rescale_step(self.config["rescale_batch_slots"]):
 
-                            return False
+            pass
 
-                        elif data_occupance_info == OCCUPANCE_NOT_OCCUPIED_COLLIDED:
+    def compact(self,progressive=False):
 
-                            if collided_index == o_dataindex: # To evade infinite looping
+        """
+        Rewrites all live entries contiguously into a new file that replaces the database file, keeping the slot amount.
+        Drops deleted and free entries, and upgrades files of older versions. With ' progressive ' set this returns right away,
+        and the entries are moved like in a progressive rescale.
+        """
 
-                                return False
+        with self.lock:
 
-                            cur_dataindex = collided_index
+            self.log("COMPACT")
 
-    def find(self,entryvalue,operator,queryvalue,findmode="all"):
+            self._check_no_transaction()
 
-        self.db.log(f"FIND {findmode.upper().strip()} ENTRY(/-IES) WHERE {entryvalue} {operator} {queryvalue}","DEBUG")
+            if self.rescaling is not None:
 
-        findmode = findmode.lower().strip()
+                self.finish_rescale()
 
-        """
-        Operator is either one of the default operators: has / contains, in, equal to / equal, not equal to, endswith, startswith, less than, greater than, modulo
-        OR
-        a callable function taking 2 arguments: value1, value2 -> value1 being the value found in the database and value2 the provided value.
-        The function should return a boolean.
+            if progressive and self.process_lock is None and not self.open_addressing:
 
-        Default operators like less than compare found value with provided value
-        eg. You're looking for all posts with less than 20 likes
-                db.find("likes","less than",20)
+                self.rescaling = Rescale(self,self.slots)
 
-        Some symbol versions of the operators are also included like: <, >, <=, == or = , ...
+                return
 
-        This also means that the ' in ' operator doesn't check wether the provided value is in the value in the database but it checks wether the database value is in the provided value.
-        eg. You're looking for all entries whose title is in a list of books
-                db.find("title","in",["The Lord of The Rings","The Hobbit","Guide to Programming: Vol. 1"])
+            self._relink(self.slots)
 
-        Keep in mind that the find function doesn't check for datatypes so checking if a string value is less than something (or reversed) will raise an error
+    def _check_no_transaction(self):
 
-        There are 2 findmodes:
-        ' all ' : returns a list of all valid keys
-        ' first ' : returns first valid key (not neccecarily in order of insertion) or None
+        if any(a._transaction is not None for a in self.accessors):
 
-        Returns a list of keys
-        """
+            raise TransactionError("Can't move entries to a new file while a transaction is open")
 
-        op = find_operators.default[operator.strip().lower()] if not callable(operator) and type(operator) == str else operator
+    def rescale_trigger(self):
 
-        start_pos = self.db.data_location+1
+        """
+        Returns why the database should be rescaled according to the configured triggers, or None.
+        Only looks at the entry counters and the longest chain walked by a write, so it's cheap enough to run after every write.
+        """
 
-        v_offset = self.db.structure.get_value_offset(entryvalue)
+        total = self.entries+self.deleted_entries
 
-        self._file.seek(start_pos)
+        if total < self.config["rescale_min_entries"]:
 
-        ks = []
+            return None
 
-        while self._file.tell() <= int(os.path.getsize(self.db.location))-1:
+        if self.entries > self.config["rescale_max_load_factor"]*self.slots:
 
-            begin = self._file.tell()
+            return f"load factor {self.entries/self.slots:.2f}"
 
-            oi = self._file.read(1)
+        if not self.open_addressing and total > self.config["rescale_max_average_chain_length"]*(total-self.collided_entries): # Every chain has exactly one entry that isn't collided
 
-            if oi in [OCCUPANCE_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED]:
+            return f"average chain length {total/(total-self.collided_entries):.2f}"
 
-                self._file.seek(begin+1+self.db.indexsize+self.db.keysize_bytesize+self.db.keysize+v_offset)
+        if self.longest_chain > self.config["rescale_max_chain_length"]:
 
-                v = self.db.structure.fetch_value_here(entryvalue, self._file)
+            return f"chain of length {self.longest_chain}"
 
-                if op(v,queryvalue):
+        if self.deleted_entries > self.config["rescale_max_tombstone_ratio"]*total:
 
-                    self._file.seek(begin+1+self.db.indexsize)
-                    kl = int.from_bytes(self._file.read(self.db.keysize_bytesize),'little')
-                    k = self._file.read(kl).decode('ascii')
+            return f"tombstone ratio {self.deleted_entries/total:.2f}"
 
-                    if findmode == "all":
-                        ks.append(k)
-                    else:
-                        return k
+        return None
 
-            self._file.seek(begin)
-            self._file.seek(self.db.entry_size,1)
+    def _auto_rescale_check(self):
 
+        if self.rescaling is not None or self.writes < self._auto_rescale_after or (self._rescale_thread is not None and self._rescale_thread.is_alive()):
 
-        return ks if findmode == "all" else None
+            return
 
-    def find_generator(self,entryvalue,operator,queryvalue):
+        reason = self.rescale_trigger()
 
-        self.db.log(f"FIND ALL ENTRIES WHERE {entryvalue} {operator} {queryvalue}","DEBUG")
+        if reason is None:
 
-        """
+            return
 
-        Same as Accessor.find except findmode obviously doesn't apply
+        self.log(f"RESCALE: Starting automatic rescale, {reason}")
 
-        """
+        self._auto_rescale_after = self.writes+self.slots # Don't retry right away if the rescale turns out to be cancelled
 
-        op = find_operators.default[operator.strip().lower()] if not callable(operator) and type(operator) == str else operator
+        self._rescale_thread = threading.Thread(target=self._background_rescale,name=f"{self.name}-rescale")
+        self._rescale_thread.start()
 
-        start_pos = self.db.data_location+1
+    def _background_rescale(self):
 
-        v_offset = self.db.structure.get_value_offset(entryvalue)
+        try:
 
-        self._file.seek(start_pos)
+            with self.lock:
 
-        ks = []
+                if self.closed:
 
-        while self._file.tell() <= int(os.path.getsize(self.db.location))-1:
+                    return
 
-            begin = self._file.tell()
+                self.rescale(progressive=True)
 
-            oi = self._file.read(1)
+            while not self.rescale_step(self.config["rescale_background_slots"]):
 
-            if oi in [OCCUPANCE_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED]:
+                pass
 
-                self._file.seek(begin+1+self.db.indexsize+self.db.keysize_bytesize+self.db.keysize+v_offset)
+        except Exception as e:
 
-                v = self.db.structure.fetch_value_here(entryvalue, self._file)
+            self.log(f"RESCALE: Automatic rescale failed: {e!r}",logging_utils.ERROR)
 
-                if op(v,queryvalue):
+    def _relink(self,target_slots):
 
-                    self._file.seek(begin+1+self.db.indexsize)
-                    kl = int.from_bytes(self._file.read(self.db.keysize_bytesize),'little')
-                    k = self._file.read(kl).decode('ascii')
+        """
+        Rescales in one sequential pass over the data region without decoding anything.
+        Live entries are copied as they are, only their occupance info and collider index are rewritten:
+        every entry links to the entry copied before it into the same slot, so each chain is complete once its last entry is copied
+        and only the slot table has to be written afterwards. Deleted entries are dropped.
+        With open addressing the slot table is built from the fingerprints in the entry headers, the entries keep no links.
+        """
 
-                    yield k
+        self.checkpoint()
 
-            self._file.seek(begin)
-            self._file.seek(self.db.entry_size,1)
+        location = self.location+".rescale"
 
-    def keys(self):
+        build(location, self.name, self._struc_raw, target_slots, self.keysize, self.indexsize, hashing.NAMES[self.hash_algorithm], fingerprint_size=self.fingerprint_size, engine=self._engine_name)
 
-        self.db.log("KEYS","DEBUG")
+        target = Database(location, {"logger_enabled":False})
 
-        start_pos = self.db.data_location+1
+        heads = [0]*target.slots # Data indices start at 1, 0 marks an empty slot
+        head_fingerprints = [b""]*target.slots
 
-        self._file.seek(start_pos)
+        placements = [] # (fingerprint, data index) with open addressing
 
-        cur_pos = start_pos
+        db_accessor = Accessor(self,use_mmap=False)
 
-        while self._file.tell() <= int(os.path.getsize(self.db.location))-1:
+        chunk_size = self.config["scan_chunk_rows"]*self.entry_size
+        end_pos = db_accessor._file_size()
 
-            oi = self._file.read(1)
+        with open(location,"rb+") as f:
 
-            if oi in [OCCUPANCE_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED]:
+            f.seek(target.data_location+1)
 
-                self._file.seek(self.db.indexsize,1)
+            for chunk_pos in range(self.data_location+1,end_pos,chunk_size):
 
-                kl = int.from_bytes(self._file.read(self.db.keysize_bytesize),'little')
-                k = self._file.read(kl).decode('ascii')
+                chunk = db_accessor._read_at(chunk_pos,min(chunk_size,end_pos-chunk_pos))
+                o = bytearray()
 
-                yield k
+                for pos in range(0,len(chunk),self.entry_size):
 
-            cur_pos += self.db.entry_size
-            self._file.seek(cur_pos)
+                    if chunk[pos:pos+1] not in [OCCUPANCE_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED]:
 
-    def values(self):
+                        continue
 
-        self.db.log("VALUES","DEBUG")
+                    if self.open_addressing:
 
-        start_pos = self.db.data_location+1
+                        o += OCCUPANCE_OCCUPIED+b"\x00"*self.indexsize+chunk[pos+1+self.indexsize:pos+self.entry_size]
 
-        self._file.seek(start_pos)
+                        placements.append((bytes(chunk[pos+1+self.indexsize:pos+self._key_length_offset]),1+target.entries*self.entry_size))
+                        target.entries += 1
 
-        cur_pos = start_pos
+                        continue
 
-        while self._file.tell() <= int(os.path.getsize(self.db.location))-1:
+                    key_r_len = int.from_bytes(chunk[pos+self._key_length_offset:pos+self._key_offset],'little')
+                    slot = target.get_slot(chunk[pos+self._key_offset:pos+self._key_offset+key_r_len].decode('ascii'))
 
-            oi = self._file.read(1)
+                    previous = heads[slot]
 
-            if oi in [OCCUPANCE_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED]:
+                    if previous:
 
-                self._file.seek(self.db.indexsize,1)
+                        o += OCCUPANCE_OCCUPIED_COLLIDED+previous.to_bytes(self.indexsize,'little')
+                        target.collided_entries += 1
 
+                    else:
 
-                self._file.seek(self.db.keysize_bytesize+self.db.keysize,1)
+                        o += OCCUPANCE_OCCUPIED+b"\x00"*self.indexsize
 
-                v = self.db.structure.fetch(self._file.read(len(self.db.structure)))
+                    o += chunk[pos+1+self.indexsize:pos+self.entry_size]
 
-                yield v
+                    heads[slot] = 1+target.entries*self.entry_size
+                    head_fingerprints[slot] = bytes(chunk[pos+1+self.indexsize:pos+self._key_length_offset])
+                    target.entries += 1
 
-            cur_pos += self.db.entry_size
-            self._file.seek(cur_pos)
+                f.write(o)
 
-    def items(self):
+            f.seek(target.indices_location)
 
-        self.db.log("ITEMS","DEBUG")
+            if self.open_addressing:
 
-        start_pos = self.db.data_location+1
+                table, target.collided_entries = open_addressing.table_bytes(target,placements)
+                f.write(table)
 
-        self._file.seek(start_pos)
+            else:
 
-        cur_pos = start_pos
+                f.write(b"".join(OCCUPANCE_OCCUPIED+head.to_bytes(self.indexsize,'little')+head_fingerprints[slot] if head else b"\x00"*target._slotsize for slot,head in enumerate(heads)))
 
-        while self._file.tell() <= int(os.path.getsize(self.db.location))-1:
+            f.seek(target.counters_location)
+            f.write(target.counters_bytes())
 
-            oi = self._file.read(1)
+        db_accessor.close()
+        target.close()
 
-            if oi in [OCCUPANCE_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED]:
+        self._replace_with(location)
 
-                self._file.seek(self.db.indexsize,1)
+    def _switch_rescaled(self):
 
-                kl = int.from_bytes(self._file.read(self.db.keysize_bytesize),'little')
-                k = self._file.read(kl).decode('ascii')
+        rescaling = self.rescaling
 
-                self._file.seek(self.db.keysize-kl,1)
-                v = self.db.structure.fetch(self._file.read(len(self.db.structure)))
+        self.checkpoint() # Everything is in the new file, but the log has to be empty before the file it belongs to is replaced
 
-                yield (k,v)
+        rescaling.close()
 
-            cur_pos += self.db.entry_size
-            self._file.seek(cur_pos)
+        self.rescaling = None
 
-    def __len__(self):
+        self._replace_with(rescaling.location)
 
-        self.db.log("LENGTH","DEBUG")
+    def _replace_with(self,location):
 
-        if self._len_cache is not None:
-            return self._len_cache
+        if self.config["durability"] != "none":
 
-        start_pos = self.db.data_location+1
+            wal.fsync_path(location)
 
-        self._file.seek(start_pos)
+        self.log("RESCALE: Replacing current db")
+        os.replace(location,self.location)
 
-        cur_pos = start_pos
+        if self.wal is not None:
 
-        length = 0
+            self.wal.reopen()
 
-        while self._file.tell() <= int(os.path.getsize(self.db.location))-1:
+        self._load_header()
+        self.longest_chain = 0
 
-            oi = self._file.read(1)
+        for a in self.accessors:
 
-            if oi in [OCCUPANCE_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED]:
+            a._reopen()
 
-                length += 1
+        self.save_indexes()
 
-            cur_pos += self.db.entry_size
-            self._file.seek(cur_pos)
+        if self.bloom is not None:
 
-        self._len_cache = length
+            self.rebuild_bloom()
 
-        return length
+        self.log(f"RESCALE: Done, now at {self.slots} slots")
 
     @property
-    def length(self):
+    def health(self):
 
-        return len(self)
+        try:
+            return (1-self.collided_entries/(self.entries+self.deleted_entries))*100
+        except ZeroDivisionError:
+            return 100
 
-    @property
-    def health(self):
+    def __len__(self):
 
-        self.db.log("HEALTH","DEBUG")
+        return self.entries
 
-        if self._health_cache is not None:
-            return self._health_cache
+class Accessor:
 
-        start_pos = self.db.data_location+1
+    def __init__(self,database,use_mmap=None):
 
-        self._file.seek(start_pos)
+        self.db = database
+        self.db.accessors.append(self)
 
-        cur_pos = start_pos
+        if self.db.logger.level >= logging_utils.DEBUG:
+            self.db.log("Accessor created.",logging_utils.DEBUG)
 
-        collided = 0
-        not_collided = 0
+        self._file =  open(self.db.location,"rb+",buffering=0) # Unbuffered, so writes through other accessors are never hidden behind a stale read buffer
 
-        while self._file.tell() <= int(os.path.getsize(self.db.location))-1:
+        self.use_mmap = self.db.config["mmap_enabled"] if use_mmap is None else use_mmap
 
-            oi = self._file.read(1)
+        self._map = None
+        self._view = None
 
-            if oi in [OCCUPANCE_OCCUPIED_COLLIDED,OCCUPANCE_NOT_OCCUPIED_COLLIDED]:
+        if self.use_mmap:
 
-                collided += 1
+            self._remap()
 
-            else:
+        self._transaction = None
 
-                not_collided += 1
+        self._pread = os.pread # Counted with metrics enabled
+        self._metrics = None
 
-            cur_pos += self.db.entry_size
-            self._file.seek(cur_pos)
+        if self.db._metrics is not None:
 
-        try:
-            health = (1-collided/(not_collided+collided))*100
-        except ZeroDivisionError:
-            health =  100
+            self._metrics = metrics.Recorder()
+            metrics.instrument(self,self._metrics)
 
-        self._health_cache = health
 
-        return health
+        self.closed = False
 
-class WrongMagicNum(Exception):
+    def close(self):
+
+        self.closed = True
+        self.db.accessors.remove(self)
+
+        if self._metrics is not None:
+
+            with self.db._metrics_lock:
+
+                self.db._metrics.merge(self._metrics)
+
+        if self._map is not None:
+
+            self._release_map()
+
+        self._file.close()
+
+    def _reopen(self):
+
+        if self._map is not None:
+
+            self._release_map()
+
+        self._file.close()
+        self._file = open(self.db.location,"rb+",buffering=0)
+
+        if self.use_mmap:
+
+            self._remap()
+
+    def _release_map(self):
+
+        self._view.release()
+
+        try:
+            self._map.close()
+        except BufferError: # A caller still holds a slice, the map gets unmapped once that is collected
+            pass
+
+        self._map = None
+        self._view = None
+
+    def _remap(self):
+
+        if self._map is not None:
+
+            self._release_map()
+
+        self._map = mmap.mmap(self._file.fileno(),0,access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+
+    def _file_size(self):
+
+        if self._transaction is not None:
+
+            return self._transaction.pages.size()
+
+        if self.db.wal is not None:
+
+            return self.db.wal.pages.size()
+
+        return os.fstat(self._file.fileno()).st_size
+
+    def _read_at(self,position,size):
+
+        """
+        Reads ' size ' bytes at ' position '.
+        With mmap enabled this returns a zero-copy memoryview into the mapped file, otherwise bytes.
+        Callers only decode from the result and never hold on to it.
+        """
+
+        if self._transaction is not None:
+
+            data = self._transaction.pages.read(position,size)
+
+            if data is not None:
+
+                return data
+
+        return self._read_file(position,size)
+
+    def _read_file(self,position,size):
+
+        if self.db.wal is not None and self.db.wal.pages:
+
+            data = self.db.wal.pages.read(position,size)
+
+            if data is not None:
+
+                return data
+
+        if self._map is not None:
+
+            if position+size > len(self._map): # File grew since the last mapping
+
+                self._remap()
+
+            return self._view[position:position+size]
+
+        return self._pread(self._file.fileno(),size,position) # No shared file position, so threads may read through one accessor
+
+    def _write_at(self,position,data):
+
+        if self._transaction is not None:
+
+            self._transaction.pages.write(position,data)
+
+            return
+
+        self._write_file(position,data)
+
+    def _write_file(self,position,data):
+
+        if self.db.wal is not None:
+
+            self.db.wal.write(position,data)
+
+            return
+
+        self._file.seek(position)
+        self._file.write(data)
+
+    def _read_slot(self,key):
+
+        return self._read_slot_at(self.db.get_slot_index(key))
+
+    def _read_slot_at(self,slot_index):
+
+        slot = self._read_at(slot_index,self.db._slotsize)
+
+        return slot_index, bytes(slot[:1]), int.from_bytes(slot[1:1+self.db.indexsize],'little')
+
+    def _slot_bytes(self,dataindex,fingerprint):
+
+        return OCCUPANCE_OCCUPIED+dataindex.to_bytes(self.db.indexsize,'little')+(fingerprint or b"")
+
+    def _read_entry_header(self,dataindex,fingerprint=None):
+
+        """
+        Returns (occupance info, collider index, key) of the entry at ' dataindex '.
+        With ' fingerprint ' set, entries with another fingerprint are rejected after reading the occupance info, collider index
+        and fingerprint only, their key is returned as None.
+        """
+
+        if fingerprint is not None:
+
+            header = self._read_at(self.db.data_location+dataindex,self.db._key_length_offset)
+
+            if header[1+self.db.indexsize:] != fingerprint:
+
+                return bytes(header[:1]), int.from_bytes(header[1:1+self.db.indexsize],'little'), None
+
+        header = self._read_at(self.db.data_location+dataindex,self.db.entry_header_size)
+
+        key_r_len = int.from_bytes(header[self.db._key_length_offset:self.db._key_offset],'little')
+
+        return bytes(header[:1]), int.from_bytes(header[1:1+self.db.indexsize],'little'), str(header[self.db._key_offset:self.db._key_offset+key_r_len],'ascii')
+
+    def _chain(self,o_dataindex,fingerprint=None):
+
+        cur_dataindex = o_dataindex
+
+        while True:
+
+            data_occupance_info, collided_index, key_r = self._read_entry_header(cur_dataindex,fingerprint)
+
+            yield cur_dataindex, data_occupance_info, collided_index, key_r
+
+            if data_occupance_info not in [OCCUPANCE_OCCUPIED_COLLIDED,OCCUPANCE_NOT_OCCUPIED_COLLIDED]:
+
+                return
+
+            if collided_index == o_dataindex: # To evade infinite looping
+
+                return
+
+            cur_dataindex = collided_index
+
+    def _find_entry(self,key):
+
+        return self._lookup(key,self.db.entry_header_size)[0]
+
+    def _lookup(self,key,size):
+
+        """
+        Returns (data index, entry or None) of the live entry of ' key ', or (None, None) if there is none.
+        If the first entry of the slot has the fingerprint of ' key ' its first ' size ' bytes are read at once and returned as the entry,
+        so a hit there costs a single read.
+        """
+
+        if self.db.open_addressing:
+
+            return open_addressing.lookup(self,key,size)
+
+        slot_index, fingerprint = self.db.get_slot_index_and_fingerprint(key)
+        slot = self._read_at(slot_index,self.db._slotsize)
+
+        if slot[:1] == OCCUPANCE_NOT_OCCUPIED:
+
+            return None, None
+
+        o_dataindex = int.from_bytes(slot[1:1+self.db.indexsize],'little')
+
+        if fingerprint is not None and slot[1+self.db.indexsize:] == fingerprint:
+
+            entry = self._read_at(self.db.data_location+o_dataindex,size)
+
+            if entry[0] & 1 and self._entry_key(entry) == key: # Bit 0: occupied
+
+                self._record_chain(1)
+
+                return o_dataindex, entry
+
+        return self._find_in_chain(key,o_dataindex,fingerprint), None
+
+    def _find_in_chain(self,key,o_dataindex,fingerprint=None):
+
+        found = None
+
+        for length, (cur_dataindex, data_occupance_info, collided_index, key_r) in enumerate(self._chain(o_dataindex,fingerprint),1):
+
+            if key_r == key:
+
+                found = cur_dataindex if data_occupance_info in [OCCUPANCE_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED] else None
+
+                break
+
+        self._record_chain(length)
+
+        return found
+
+    def _record_chain(self,length):
+
+        """
+        Records the entries of a chain (or slots probed with open addressing) walked for a single key, with metrics enabled.
+        """
+
+        if self._metrics is not None and length:
+
+            self._metrics.chain_length.record(length)
+
+    def _entries(self):
+
+        """
+        Yields all entries, read in chunks of about SCAN_CHUNK_BYTES. The read lock is only held while reading a chunk.
+        """
+
+        entry_size = self.db.entry_size
+
+        for chunk in self._chunks():
+
+            for pos in range(0,len(chunk),entry_size):
+
+                yield chunk[pos:pos+entry_size]
+
+    def _chunks(self):
+
+        entry_size = self.db.entry_size
+        chunk_size = max(SCAN_CHUNK_BYTES//entry_size,1)*entry_size
+
+        cur_pos = self.db.data_location+1
+
+        while True:
+
+            with self.db.lock.read():
+
+                end_pos = self._file_size()
+
+                if cur_pos >= end_pos:
+
+                    return
+
+                chunk = self._read_at(cur_pos,min(chunk_size,end_pos-cur_pos))
+
+            yield chunk
+
+            cur_pos += len(chunk)
+
+    def _entry_key(self,entry):
+
+        kl = int.from_bytes(entry[self.db._key_length_offset:self.db._key_offset],'little')
+
+        return str(entry[self.db._key_offset:self.db._key_offset+kl],'ascii')
+
+    def all_keys(self):
+
+        return list(self.keys())
+
+    def all_values(self):
+
+        return list(self.values())
+
+    def all_items(self):
+
+        return list(self.items())
+
+    def _update_counters(self,entries=0,deleted=0,collided=0):
+
+        self.db.entries += entries
+        self.db.deleted_entries += deleted
+        self.db.collided_entries += collided
+        self.db.writes += 1
+
+        if self.db.counters_location is not None:
+
+            self._write_at(self.db.counters_location,self.db.counters_bytes())
+
+        if self.db.config["auto_rescale"]:
+
+            self.db._auto_rescale_check()
+
+    def _from_cache(self,cached):
+
+        if self.db.config["cache_mode"] == "decoded":
+
+            return dict(cached) # Copy on return, so callers can't change the cached record
+
+        return self.db.structure.fetch(cached)
+
+    def _cache_read(self,key,data):
+
+        if self._transaction is not None:
+            self._transaction.keys.add(key)
+
+        if self.db.config["cache_mode"] == "decoded":
+
+            record = self.db.structure.fetch(data)
+            self.db.cache.set(key,record,len(data))
+
+            return dict(record)
+
+        data = bytes(data)
+        self.db.cache.set(key,data)
+
+        return self.db.structure.fetch(data)
+
+    def _cache_write(self,key,data):
+
+        if self._transaction is not None:
+            self._transaction.keys.add(key)
+
+        if self.db.config["cache_mode"] == "decoded": # Decoded on the next read instead of on every write
+
+            self.db.cache.invalidate(key)
+
+        else:
+
+            self.db.cache.set(key,data)
+
+    def _cache_miss(self,key):
+
+        if self._transaction is not None:
+            self._transaction.keys.add(key)
+
+        if self.db.config["cache_misses"]:
+
+            self.db.cache.set(key,caching.MISSING,len(key))
+
+        else:
+
+            self.db.cache.invalidate(key)
+
+    def _entry_bytes(self,key,data,collider=None,fingerprint=None):
+
+        if fingerprint is None and self.db.fingerprint_size:
+
+            fingerprint = self.db.fingerprint(key)
+
+        return ((OCCUPANCE_OCCUPIED if not collider else OCCUPANCE_OCCUPIED_COLLIDED)
+            + (collider.to_bytes(self.db.indexsize,'little') if collider else b"\x00"*self.db.indexsize)
+            + (fingerprint or b"")
+            + len(key).to_bytes(self.db.keysize_bytesize,'little')
+            + key.encode("ascii")+(self.db.keysize-len(key))*b"\x00"
+            + data)
+
+    def _bloom_add(self,keys):
+
+        for key in keys:
+
+            self.db.bloom.add(key)
+
+        if self.db.bloom.full and self._transaction is None: # A rebuild can't see the writes of a transaction yet
+
+            if self.db.logger.level >= logging_utils.DEBUG:
+                self.db.log("Bloom filter is full, rebuilding.",logging_utils.DEBUG)
+            self.db._fill_bloom()
+
+    def _index_update(self,key,old_data,data):
+
+        if self._transaction is not None:
+            self._transaction.index_changes.append((key,old_data,data))
+
+        for field,index in self.db.indexes.items():
+
+            if old_data is not None:
+                index.remove(self.db.structure.fetch_value(field,old_data),key)
+
+            if data is not None:
+                index.add(self.db.structure.fetch_value(field,data),key)
+
+    def _read_data(self,dataindex):
+
+        return self._read_at(self.db.data_location+dataindex+self.db.entry_header_size,len(self.db.structure))
+
+    def _read_fields(self,dataindex,fields):
+
+        """
+        Reads only the null map and the values of ' fields ' of the entry at ' dataindex ',
+        returns its compiled data with all other values zeroed.
+        """
+
+        struc = self.db.structure
+        position = self.db.data_location+dataindex+self.db.entry_header_size
+
+        runs = []
+
+        for offset,size in sorted([(0,struc.nulmap_size)]+[struc.get_value_span(field) for field in fields]):
+
+            if runs and offset <= runs[-1][1]+FIELD_READ_GAP:
+
+                runs[-1][1] = max(runs[-1][1],offset+size)
+
+            else:
+
+                runs.append([offset,offset+size])
+
+        data = bytearray(len(struc))
+
+        for start,end in runs:
+
+            data[start:end] = self._read_at(position+start,end-start)
+
+        return data
+
+    def _decode(self,data,fields=None,view=False):
+
+        if view:
+
+            return structure.RecordView(self.db.structure,bytes(data))
+
+        if fields is not None:
+
+            return self.db.structure.fetch_fields(fields,data)
+
+        return self.db.structure.fetch(data)
+
+    def _check_fields(self,fields,view):
+
+        if fields is None:
+
+            return None
+
+        if view:
+
+            raise ValueError("A record view decodes fields when they are used, it can't be combined with ' fields '")
+
+        fields = list(fields)
+
+        for field in fields:
+
+            self.db.structure.get_value_offset(field) # Raises if field isn't in the structure
+
+        return fields
+
+    def _write_data_at(self,index,key,data,collider=None,fingerprint=None):
+
+        self._write_at(self.db.data_location+index,self._entry_bytes(key,data,collider,fingerprint))
+
+    def _pop_free(self):
+
+        """
+        Takes the first entry off the free list and returns its data index, or None if the free list is empty.
+        """
+
+        if not self.db.free_head:
+
+            return None
+
+        dataindex = self.db.free_head
+
+        _, self.db.free_head, _ = self._read_entry_header(dataindex)
+        self._write_at(self.db.free_location,self.db.free_head.to_bytes(12,'little'))
+
+        return dataindex
+
+    def _new_dataindex(self):
+
+        """
+        Returns (data index for a new entry, whether it was a free entry).
+        """
+
+        dataindex = self._pop_free()
+
+        if dataindex is not None:
+
+            return dataindex, True
+
+        return self._file_size()-self.db.data_location, False
+
+    def _unlink(self,slot_index,previous,dataindex,data_occupance_info,collided_index):
+
+        """
+        Takes the live entry at ' dataindex ' out of its chain and marks it as deleted.
+        ' previous ' is the (data index, occupance info) of the entry before it in the chain, or None if it's the first one.
+        Databases with a free list (version 5+) relink the chain around the entry and push it onto the free list,
+        older ones just flip the occupance info, leaving the entry in its chain.
+        Returns the change in collided entries.
+        """
+
+        if self.db.free_location is None:
+
+            self._write_at(self.db.data_location+dataindex,{OCCUPANCE_OCCUPIED:OCCUPANCE_NOT_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED:OCCUPANCE_NOT_OCCUPIED_COLLIDED}[data_occupance_info])
+
+            return 0
+
+        has_next = data_occupance_info == OCCUPANCE_OCCUPIED_COLLIDED
+
+        if previous is None:
+
+            if has_next: # The next entry becomes the first one, the slot takes over its fingerprint
+
+                fingerprint = bytes(self._read_at(self.db.data_location+collided_index+1+self.db.indexsize,self.db.fingerprint_size)) if self.db.fingerprint_size else None
+
+                self._write_at(slot_index,self._slot_bytes(collided_index,fingerprint))
+
+            else:
+
+                self._write_at(slot_index,b"\x00"*self.db._slotsize)
+
+        else:
+
+            previous_dataindex, previous_occupance_info = previous
+
+            occupance_info = bytes([previous_occupance_info[0] & 1 | (2 if has_next else 0)]) # Bit 0: occupied, bit 1: collided
+
+            self._write_at(self.db.data_location+previous_dataindex,occupance_info+(collided_index if has_next else 0).to_bytes(self.db.indexsize,'little'))
+
+        self._free(dataindex)
+
+        return -1 if previous is not None or has_next else 0
+
+    def _free(self,dataindex):
+
+        """
+        Pushes the entry at ' dataindex ' onto the free list.
+        """
+
+        self._write_at(self.db.data_location+dataindex,OCCUPANCE_FREE+self.db.free_head.to_bytes(self.db.indexsize,'little'))
+
+        self.db.free_head = dataindex
+        self._write_at(self.db.free_location,self.db.free_head.to_bytes(12,'little'))
+
+    def _commit(self):
+
+        """
+        Ends a write operation, making its writes durable as configured by ' durability '.
+        Inside a transaction this waits for the transaction to commit. During a progressive rescale every write also went to the database file,
+        the new file is only synced once before it replaces it (see Database._replace_with).
+        """
+
+        if self._transaction is not None:
+
+            return
+
+        if self.db.wal is not None:
+
+            self.db.wal.commit()
+
+            if self.db.wal.size > self.db.config["wal_checkpoint_bytes"]:
+
+                self.db.wal.checkpoint()
+
+        elif self.db.config["durability"] == "fsync":
+
+            os.fsync(self._file.fileno())
+
+        elif self.db.group_commit is not None:
+
+            self.db.group_commit.mark()
+
+    def _table(self,key):
+
+        """
+        Returns the accessor to read ' key ' from, which is only ever another one during a progressive rescale.
+        """
+
+        if self.db.rescaling is None or not self.db.rescaling.moved(key):
+
+            return self
+
+        return self.db.rescaling.accessor
+
+    def _tables(self,keys):
+
+        if self.db.rescaling is None:
+
+            return {self:keys}
+
+        tables = {}
+
+        for key in keys:
+
+            tables.setdefault(self._table(key),[]).append(key)
+
+        return tables
+
+    def _mirror(self,keys,write):
+
+        """
+        Repeats a write to the database file with ' write(table, keys) ' in the new file of a progressive rescale, for the keys it already moved.
+        """
+
+        for table,table_keys in self._tables(keys).items():
+
+            if table is not self:
+
+                write(table,table_keys)
+
+    def _load(self,key):
+
+        dataindex, entry = self._lookup(key,self.db.entry_size)
+
+        if dataindex is None:
+
+            return None
+
+        if entry is not None:
+
+            return entry[self.db.entry_header_size:]
+
+        return self._read_data(dataindex)
+
+    def _load_fields(self,key,fields):
+
+        dataindex = self._find_entry(key)
+
+        if dataindex is None:
+
+            return None
+
+        return self._read_fields(dataindex,fields)
+
+    def _store(self,key,data,old=False):
+
+        """
+        Writes the compiled ' data ' for ' key '. With ' old ' set, returns the data of the live entry it replaced (or None).
+        """
+
+        if self.db.open_addressing:
+
+            return open_addressing.store(self,key,data,old)
+
+        slot_index, fingerprint = self.db.get_slot_index_and_fingerprint(key)
+        slot_index, occupance_info, o_dataindex = self._read_slot_at(slot_index)
+
+        if occupance_info == OCCUPANCE_NOT_OCCUPIED:
+
+            dataindex, was_free = self._new_dataindex()
+
+            self._write_at(slot_index,self._slot_bytes(dataindex,fingerprint))
+            self._update_counters(entries=1,deleted=-was_free)
+            self._write_data_at(dataindex,key,data,fingerprint=fingerprint)
+
+            return None
+
+        potential_index = None
+        potential_index_original_collider = None
+
+        for length, (cur_dataindex, data_occupance_info, collided_index, key_r) in enumerate(self._chain(o_dataindex,fingerprint),1):
+
+            collider = collided_index if data_occupance_info in [OCCUPANCE_OCCUPIED_COLLIDED,OCCUPANCE_NOT_OCCUPIED_COLLIDED] else None
+
+            if key_r == key:
+
+                self._record_chain(length)
+
+                replaced = None
+
+                if data_occupance_info in [OCCUPANCE_NOT_OCCUPIED,OCCUPANCE_NOT_OCCUPIED_COLLIDED]:
+                    self._update_counters(entries=1,deleted=-1)
+                else:
+                    self._update_counters()
+
+                    if old:
+                        replaced = bytes(self._read_data(cur_dataindex))
+
+                self._write_data_at(cur_dataindex,key,data,collider,fingerprint)
+                return replaced
+
+            if potential_index is None and data_occupance_info in [OCCUPANCE_NOT_OCCUPIED,OCCUPANCE_NOT_OCCUPIED_COLLIDED]:
+
+                potential_index = cur_dataindex
+                potential_index_original_collider = collider
+
+        self._record_chain(length)
+
+        if potential_index is not None: # Reuse the first deleted entry of the chain, keeping its link to the rest of the chain
+
+            self._update_counters(entries=1,deleted=-1)
+            self._write_data_at(potential_index,key,data,potential_index_original_collider,fingerprint)
+            return None
+
+        new_dataindex, was_free = self._new_dataindex()
+
+        self.db.longest_chain = max(self.db.longest_chain,length+1)
+
+        self._write_at(self.db.data_location+cur_dataindex,OCCUPANCE_OCCUPIED_COLLIDED+new_dataindex.to_bytes(self.db.indexsize,"little"))
+        self._update_counters(entries=1,deleted=-was_free,collided=1)
+        self._write_data_at(new_dataindex,key,data,fingerprint=fingerprint)
+
+        return None
+
+    def _remove(self,key):
+
+        """
+        Marks the entry of ' key ' as deleted and returns its data, returns None if the slot of ' key ' is empty.
+        """
+
+        if self.db.open_addressing:
+
+            return open_addressing.remove(self,key)
+
+        slot_index, fingerprint = self.db.get_slot_index_and_fingerprint(key)
+        slot_index, occupance_info, o_dataindex = self._read_slot_at(slot_index)
+
+        if occupance_info == OCCUPANCE_NOT_OCCUPIED:
+
+            return None
+
+        previous = None
+
+        for length, (cur_dataindex, data_occupance_info, collided_index, key_r) in enumerate(self._chain(o_dataindex,fingerprint),1):
+
+            if key_r != key:
+
+                previous = (cur_dataindex,data_occupance_info)
+
+                continue
+
+            self._record_chain(length)
+
+            if data_occupance_info not in [OCCUPANCE_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED]:
+
+                break
+
+            removed = bytes(self._read_data(cur_dataindex))
+
+            collided = self._unlink(slot_index,previous,cur_dataindex,data_occupance_info,collided_index)
+            self._update_counters(entries=-1,deleted=1,collided=collided)
+
+            return removed
+
+        else:
+
+            self._record_chain(length)
+
+        raise ValueError("Couldn't find key that you were trying to delete")
+
+    def _load_many(self,keys):
+
+        """
+        Returns a dict of key -> data for the keys that exist.
+        Slots, chains and values are read in order of their position in the file.
+        """
+
+        if self.db.open_addressing:
+
+            return open_addressing.load_many(self,keys)
+
+        heads = []
+
+        for (slot_index,fingerprint),key in sorted((self.db.get_slot_index_and_fingerprint(key),key) for key in keys):
+
+            _, occupance_info, o_dataindex = self._read_slot_at(slot_index)
+
+            if occupance_info != OCCUPANCE_NOT_OCCUPIED:
+
+                heads.append((o_dataindex,key,fingerprint))
+
+        dataindices = []
+
+        for o_dataindex,key,fingerprint in sorted(heads):
+
+            dataindex = self._find_in_chain(key,o_dataindex,fingerprint)
+
+            if dataindex is not None:
+
+                dataindices.append((dataindex,key))
+
+        return {key:self._read_data(dataindex) for dataindex,key in sorted(dataindices)}
+
+    def _store_many(self,compiled,old=False):
+
+        """
+        Writes a dict of key -> compiled data. Existing entries are overwritten in order of their position,
+        new entries are appended with a single write.
+        With ' old ' set, returns a dict of key -> data of the live entries that were replaced.
+        """
+
+        if self.db.open_addressing:
+
+            return open_addressing.store_many(self,compiled,old)
+
+        groups = {}
+        fingerprints = {}
+
+        for key in compiled:
+
+            slot_index, fingerprints[key] = self.db.get_slot_index_and_fingerprint(key)
+            groups.setdefault(slot_index,[]).append(key)
+
+        slots = [self._read_slot_at(slot_index) for slot_index in sorted(groups)]
+        slots.sort(key=lambda slot: slot[2] if slot[1] != OCCUPANCE_NOT_OCCUPIED else 0)
+
+        writes = []
+        records = {}
+        appended = []
+        replaced = {}
+
+        end_index = self._file_size()-self.db.data_location
+
+        entries = 0
+        deleted = 0
+        collided = 0
+
+        for slot_index, occupance_info, o_dataindex in slots:
+
+            chain = list(self._chain(o_dataindex)) if occupance_info != OCCUPANCE_NOT_OCCUPIED else []
+
+            existing = {key_r:(cur_dataindex,data_occupance_info,collided_index) for cur_dataindex, data_occupance_info, collided_index, key_r in chain}
+            reusable = [(cur_dataindex,data_occupance_info,collided_index) for cur_dataindex, data_occupance_info, collided_index, key_r in chain if data_occupance_info in [OCCUPANCE_NOT_OCCUPIED,OCCUPANCE_NOT_OCCUPIED_COLLIDED] and key_r not in compiled]
+
+            tail = chain[-1][0] if chain else None
+            length = len(chain)
+
+            for key in sorted(groups[slot_index],key=lambda key: key not in existing): # Overwrites first, so links to new entries aren't overwritten
+
+                if key in existing or reusable:
+
+                    cur_dataindex, data_occupance_info, collided_index = existing[key] if key in existing else reusable.pop(0)
+
+                    collider = collided_index if data_occupance_info in [OCCUPANCE_OCCUPIED_COLLIDED,OCCUPANCE_NOT_OCCUPIED_COLLIDED] else None
+
+                    records[cur_dataindex] = bytearray(self._entry_bytes(key,compiled[key],collider,fingerprints[key]))
+
+                    if data_occupance_info in [OCCUPANCE_NOT_OCCUPIED,OCCUPANCE_NOT_OCCUPIED_COLLIDED]:
+
+                        entries += 1
+                        deleted -= 1
+
+                    elif old:
+
+                        replaced[key] = bytes(self._read_data(cur_dataindex))
+
+                    continue
+
+                new_dataindex = self._pop_free()
+
+                if new_dataindex is not None:
+
+                    records[new_dataindex] = bytearray(self._entry_bytes(key,compiled[key],fingerprint=fingerprints[key]))
+                    deleted -= 1
+
+                else:
+
+                    new_dataindex = end_index+len(appended)*self.db.entry_size
+                    appended.append(bytearray(self._entry_bytes(key,compiled[key],fingerprint=fingerprints[key])))
+
+                entries += 1
+
+                link = OCCUPANCE_OCCUPIED_COLLIDED+new_dataindex.to_bytes(self.db.indexsize,"little")
+
+                if tail is None:
+
+                    writes.append((slot_index,self._slot_bytes(new_dataindex,fingerprints[key])))
+
+                elif tail >= end_index:
+
+                    appended[(tail-end_index)//self.db.entry_size][:len(link)] = link
+                    collided += 1
+
+                elif tail in records:
+
+                    records[tail][:len(link)] = link
+                    collided += 1
+
+                else:
+
+                    writes.append((self.db.data_location+tail,link))
+                    collided += 1
+
+                tail = new_dataindex
+                length += 1
+
+            self.db.longest_chain = max(self.db.longest_chain,length)
+
+        writes.extend((self.db.data_location+dataindex,record) for dataindex,record in records.items())
+        writes.sort(key=lambda write: write[0])
+
+        self._update_counters(entries,deleted,collided)
+
+        for position,data in writes:
+
+            self._write_at(position,data)
+
+        if appended:
+
+            self._write_at(self.db.data_location+end_index,b"".join(appended))
+
+        return replaced
+
+    def _remove_many(self,keys):
+
+        """
+        Deletes the entries of ' keys ', returns a dict of key -> data of the deleted entries.
+        Slots and chains are visited in order of their position in the file.
+        """
+
+        if self.db.open_addressing:
+
+            return open_addressing.remove_many(self,keys)
+
+        removed = {}
+        collided = 0
+
+        for (slot_index,fingerprint),key in sorted((self.db.get_slot_index_and_fingerprint(key),key) for key in keys):
+
+            _, occupance_info, o_dataindex = self._read_slot_at(slot_index) # Read per key, an earlier key may have changed the slot
+
+            if occupance_info == OCCUPANCE_NOT_OCCUPIED:
+
+                continue
+
+            previous = None
+
+            for cur_dataindex, data_occupance_info, collided_index, key_r in self._chain(o_dataindex,fingerprint):
+
+                if key_r != key:
+
+                    previous = (cur_dataindex,data_occupance_info)
+
+                    continue
+
+                if data_occupance_info in [OCCUPANCE_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED]:
+
+                    removed[key] = bytes(self._read_data(cur_dataindex))
+                    collided += self._unlink(slot_index,previous,cur_dataindex,data_occupance_info,collided_index)
+
+                break
+
+        if not removed:
+
+            return removed
+
+        self._update_counters(entries=-len(removed),deleted=len(removed),collided=collided)
+
+        return removed
+
+    def _live_runs(self):
+
+        """
+        Yields (chunk, offset, keys) for every run of consecutive occupied entries, the first one at ' offset ' in ' chunk ',
+        so their data can be fetched at once (see Structure.fetch_many). During a progressive rescale from both files.
+        """
+
+        rescaling = self.db.rescaling
+        entry_size = self.db.entry_size
+
+        for chunk in self._chunks():
+
+            offset = 0
+            keys = []
+
+            for pos in range(0,len(chunk),entry_size):
+
+                entry = chunk[pos:pos+entry_size]
+                key = self._entry_key(entry) if entry[0] & 1 else None # Bit 0: occupied
+
+                if key is not None and (rescaling is None or not rescaling.moved(key)):
+
+                    if not keys:
+                        offset = pos
+
+                    keys.append(key)
+
+                elif keys:
+
+                    yield chunk, offset, keys
+
+                    keys = []
+
+            if keys:
+
+                yield chunk, offset, keys
+
+        if rescaling is not None:
+
+            yield from rescaling.accessor._live_runs()
+
+    def _live_entries(self):
+
+        """
+        Yields all occupied entries, during a progressive rescale from both files.
+        """
+
+        rescaling = self.db.rescaling
+
+        for entry in self._entries():
+
+            if entry[:1] not in [OCCUPANCE_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED]:
+
+                continue
+
+            if rescaling is None or not rescaling.moved(self._entry_key(entry)):
+
+                yield entry
+
+        if rescaling is not None:
+
+            yield from rescaling.accessor._live_entries()
+
+    @contextlib.contextmanager
+    def transaction(self):
+
+        """
+        Buffers all writes of this accessor in memory until the block ends, reads inside the block see them.
+        When the block ends the dirty pages are written in order of their position and committed once
+        (as a single log commit with the write-ahead log enabled, so the whole transaction survives a crash or doesn't),
+        when it raises nothing is written and the exception is reraised.
+        Other threads wait for the database while a transaction is open, other accessors shouldn't write to it from the same thread.
+        """
+
+        if self._transaction is not None: # Part of the enclosing transaction
+
+            yield self
+            return
+
+        with self.db.lock:
+
+            if self.db.rescaling is not None:
+
+                self.db.finish_rescale()
+
+            if self.db.logger.level >= logging_utils.DEBUG:
+                self.db.log("TRANSACTION",logging_utils.DEBUG)
+
+            self._transaction = Transaction(self)
+
+            try:
+
+                yield self
+
+            except BaseException:
+
+                transaction, self._transaction = self._transaction, None
+                transaction.abort()
+
+                if self.db.logger.level >= logging_utils.DEBUG:
+                    self.db.log("TRANSACTION ABORTED",logging_utils.DEBUG)
+
+                raise
+
+            transaction, self._transaction = self._transaction, None
+            transaction.commit()
+
+    def delete(self,key):
+
+        if self.db.logger.level >= logging_utils.DEBUG:
+            self.db.log("DELETE %s",logging_utils.DEBUG,key)
+
+        with self.db.lock:
+
+            if self.db.rescaling is not None:
+                self.db.rescale_step()
+
+            removed = self._remove(key)
+
+            if removed is None:
+
+                return None
+
+            self._mirror([key],lambda table,keys: table._remove(keys[0]))
+
+            self._commit()
+
+            if self.db.indexes:
+
+                self._index_update(key,removed,None)
+
+            self._cache_miss(key)
+
+            return None
+
+    def set(self,key,data):
+
+        if self.db.logger.level >= logging_utils.DEBUG:
+            self.db.log("SET %s",logging_utils.DEBUG,key)
+
+        with self.db.lock:
+
+            if self.db.rescaling is not None:
+                self.db.rescale_step()
+
+            comp_data = self.db.structure.compile(data)
+
+            replaced = self._store(key,comp_data,bool(self.db.indexes))
+
+            self._mirror([key],lambda table,keys: table._store(key,comp_data))
+
+            self._commit()
+
+            if self.db.indexes:
+
+                self._index_update(key,replaced,comp_data)
+
+            if self.db.bloom is not None:
+
+                self._bloom_add([key])
+
+            self._cache_write(key,comp_data)
+
+    def get(self,key,fields=None,view=False):
+
+        """
+        Returns the value of ' key ' as a dict, or None if it doesn't exist.
+        With ' fields ' only those fields are read and decoded, with ' view ' set the value is returned as a structure.RecordView
+        that decodes fields when they are used. Neither fills the cache.
+        """
+
+        if self.db.logger.level >= logging_utils.DEBUG:
+            self.db.log("GET %s",logging_utils.DEBUG,key)
+
+        fields = self._check_fields(fields,view)
+
+        if self.db.bloom is not None and key not in self.db.bloom: # Definitely not in the database, no need to lock
+
+            return None
+
+        with self.db.lock.read():
+
+            cached = self.db.cache.get(key)
+
+            if cached is caching.MISSING:
+
+                return None
+
+            if fields is not None or view:
+
+                return self._get_partial(key,cached,fields,view)
+
+            if cached is not None:
+
+                return self._from_cache(cached)
+
+            data = self._table(key)._load(key)
+
+            if data is None:
+
+                self._cache_miss(key)
+
+                return None
+
+            return self._cache_read(key,data)
+
+    def _get_partial(self,key,cached,fields,view):
+
+        decoded_cache = self.db.config["cache_mode"] == "decoded"
+
+        if cached is not None and fields is not None:
+
+            return {field:cached[field] for field in fields} if decoded_cache else self.db.structure.fetch_fields(fields,cached)
+
+        if cached is not None and not decoded_cache:
+
+            return self._decode(cached,view=True)
+
+        if fields is not None:
+
+            data = self._table(key)._load_fields(key,fields)
+
+        else:
+
+            data = self._table(key)._load(key)
+
+        if data is None:
+
+            self._cache_miss(key)
+
+            return None
+
+        return self._decode(data,fields,view)
+
+    def has(self,key):
+
+        if self.db.logger.level >= logging_utils.DEBUG:
+            self.db.log("HAS %s",logging_utils.DEBUG,key)
+
+        if self.db.bloom is not None and key not in self.db.bloom:
+
+            return False
+
+        with self.db.lock.read():
+
+            cached = self.db.cache.get(key)
+
+            if cached is not None:
+
+                return cached is not caching.MISSING
+
+            if self._table(key)._find_entry(key) is None:
+
+                self._cache_miss(key)
+
+                return False
+
+            return True
+
+    def get_many(self,keys):
+
+        """
+        Fetches multiple keys at once, returns a dict of key -> value (None for missing keys) in the order of ' keys '.
+        Slots, chains and values are read in order of their position in the file.
+        """
+
+        keys = list(keys)
+
+        if self.db.logger.level >= logging_utils.DEBUG:
+            self.db.log("GET MANY %s",logging_utils.DEBUG,len(keys))
+
+        with self.db.lock.read():
+
+            found = {}
+            pending = []
+
+            for key in keys:
+
+                cached = self.db.cache.get(key)
+
+                if cached is caching.MISSING:
+
+                    found[key] = None
+
+                elif cached is not None:
+
+                    found[key] = self._from_cache(cached)
+
+                elif self.db.bloom is not None and key not in self.db.bloom:
+
+                    found[key] = None
+
+                else:
+
+                    found[key] = None
+                    pending.append(key)
+
+            pending = list(dict.fromkeys(pending))
+
+            for table,table_keys in self._tables(pending).items():
+
+                for key,data in table._load_many(table_keys).items():
+
+                    found[key] = self._cache_read(key,data)
+
+            for key in pending:
+
+                if found[key] is None:
+
+                    self._cache_miss(key)
+
+            return {key:found[key] for key in keys}
+
+    def set_many(self,items):
+
+        """
+        Sets multiple keys at once, ' items ' is a mapping or an iterable of (key, value) pairs, later pairs win.
+        All values are compiled before anything is written, existing entries are overwritten in order of their position,
+        new entries are appended with a single write and the file is flushed once.
+        """
+
+        items = dict(items)
+
+        if self.db.logger.level >= logging_utils.DEBUG:
+            self.db.log("SET MANY %s",logging_utils.DEBUG,len(items))
+
+        with self.db.lock:
+
+            if self.db.rescaling is not None:
+                self.db.rescale_step()
+
+            compiled = dict(zip(items,self.db.structure.compile_many(list(items.values()))))
+
+            replaced = self._store_many(compiled,bool(self.db.indexes))
+
+            self._mirror(list(compiled),lambda table,keys: table._store_many({key:compiled[key] for key in keys}))
+
+            self._commit()
+
+            for key,data in compiled.items():
+
+                self._cache_write(key,data)
+
+                if self.db.indexes:
+                    self._index_update(key,replaced.get(key),data)
+
+            if self.db.bloom is not None:
+
+                self._bloom_add(compiled)
+
+    def delete_many(self,keys):
+
+        """
+        Deletes multiple keys at once, keys that aren't in the database are skipped.
+        Returns the amount of deleted entries.
+        """
+
+        keys = list(dict.fromkeys(keys))
+
+        if self.db.logger.level >= logging_utils.DEBUG:
+            self.db.log("DELETE MANY %s",logging_utils.DEBUG,len(keys))
+
+        with self.db.lock:
+
+            if self.db.rescaling is not None:
+                self.db.rescale_step()
+
+            if self.db.bloom is not None:
+
+                keys = [key for key in keys if key in self.db.bloom]
+
+            removed = self._remove_many(keys)
+
+            if removed:
+
+                self._mirror(list(removed),lambda table,keys: table._remove_many(keys))
+
+                self._commit()
+
+            for key,data in removed.items():
+
+                if self.db.indexes:
+                    self._index_update(key,data,None)
+
+                self._cache_miss(key)
+
+            return len(removed)
+
+    def _parallel_scan(self,mode,query,workers=None,pool=None,ordered=True):
+
+        """
+        Returns the results of a full scan by a pool of workers (see Aspi2.parallel) as a list,
+        or None if the scan has to run serially (a single worker, a transaction or a rescale in progress).
+        """
+
+        workers = self.db.config["scan_workers"] if workers is None else workers
+        workers = workers or os.cpu_count()
+
+        if workers <= 1 or self._transaction is not None:
+
+            return None
+
+        if self.db.wal is not None and self.db.wal.pages:
+
+            self.db.checkpoint() # Workers read the database file directly
+
+        with self.db.lock.read():
+
+            if self.db.rescaling is not None or (self.db.wal is not None and self.db.wal.pages):
+
+                return None
+
+            plan = parallel.ScanPlan(self.db,self._file_size())
+            pool = self.db._scan_pool(self.db.config["scan_pool"] if pool is None else pool,workers)
+
+            return [result for chunk in parallel.scan(pool,plan,workers,mode,query,ordered,self.db.config["scan_chunk_rows"]) for result in chunk]
+
+    def _find_keys(self,entryvalue,operator,queryvalue,workers=None,pool=None):
+
+        op = find_operators.default[operator.strip().lower()] if not callable(operator) and type(operator) == str else operator
+
+        if self.db.config["scan_engine"] == "auto" and self._transaction is None and self.db.wal is not None and self.db.wal.pages:
+
+            self.db.checkpoint() # The scan engine reads the database file directly
+
+        with self.db.lock.read():
+
+            keys = self._find_keys_fast(entryvalue,op,queryvalue)
+
+        if keys is not None:
+
+            yield from keys
+            return
+
+        keys = self._parallel_scan("find",(entryvalue,op,queryvalue),workers,pool)
+
+        if keys is not None:
+
+            yield from keys
+            return
+
+        for entry in self._live_entries():
+
+            v = self.db.structure.fetch_value(entryvalue,entry[self.db.entry_header_size:])
+
+            if op(v,queryvalue):
+
+                yield self._entry_key(entry)
+
+    def _find_keys_fast(self,entryvalue,op,queryvalue):
+
+        """
+        Returns the list of matching keys from an index or the vectorized scan, or None if neither can answer the query.
+        """
+
+        if entryvalue in self.db.indexes:
+
+            keys = self.db.indexes[entryvalue].find(op,queryvalue)
+
+            if keys is not None:
+
+                return list(keys)
+
+        if self.db.config["scan_engine"] != "auto" or self._transaction is not None or (self.db.wal is not None and self.db.wal.pages): # The scan engine can't see buffered writes
+
+            return None
+
+        keys = vectorized.find_keys(self.db,entryvalue,op,queryvalue,self.db.config["scan_chunk_rows"])
+
+        if keys is None:
+
+            return None
+
+        rescaling = self.db.rescaling
+
+        if rescaling is None:
+
+            return list(keys)
+
+        return [key for key in keys if not rescaling.moved(key)]+list(vectorized.find_keys(rescaling.target,entryvalue,op,queryvalue,self.db.config["scan_chunk_rows"]))
+
+    def find(self,entryvalue,operator,queryvalue,findmode="all",workers=None,pool=None):
+
+        if self.db.logger.level >= logging_utils.DEBUG:
+            self.db.log("FIND %s ENTRY(/-IES) WHERE %s %s %s",logging_utils.DEBUG,findmode.upper().strip(),entryvalue,operator,queryvalue)
+
+        findmode = findmode.lower().strip()
+
+        """
+        Operator is either one of the default operators: has / contains, in, equal to / equal, not equal to, endswith, startswith, less than, greater than, modulo
+        OR
+        a callable function taking 2 arguments: value1, value2 -> value1 being the value found in the database and value2 the provided value.
+        The function should return a boolean.
+
+        Default operators like less than compare found value with provided value
+        eg. You're looking for all posts with less than 20 likes
+                db.find("likes","less than",20)
+
+        Some symbol versions of the operators are also included like: <, >, <=, == or = , ...
+
+        This also means that the ' in ' operator doesn't check wether the provided value is in the value in the database but it checks wether the database value is in the provided value.
+        eg. You're looking for all entries whose title is in a list of books
+                db.find("title","in",["The Lord of The Rings","The Hobbit","Guide to Programming: Vol. 1"])
+
+        Keep in mind that the find function doesn't check for datatypes so checking if a string value is less than something (or reversed) will raise an error
+
+        There are 2 findmodes:
+        ' all ' : returns a list of all valid keys
+        ' first ' : returns first valid key (not neccecarily in order of insertion) or None
+
+        Returns a list of keys
+
+        Queries that no index or the vectorized scan engine can answer scan all entries, with ' workers ' (default: config ' scan_workers ')
+        above 1 in parallel in a pool of threads or processes (' pool ', default: config ' scan_pool '). Operators have to be picklable for a process pool.
+        """
+
+        if findmode == "all":
+
+            return list(self._find_keys(entryvalue,operator,queryvalue,workers,pool))
+
+        return next(self._find_keys(entryvalue,operator,queryvalue,workers,pool),None)
+
+    def find_generator(self,entryvalue,operator,queryvalue,workers=None,pool=None):
+
+        if self.db.logger.level >= logging_utils.DEBUG:
+            self.db.log("FIND ALL ENTRIES WHERE %s %s %s",logging_utils.DEBUG,entryvalue,operator,queryvalue)
+
+        """
+
+        Same as Accessor.find except findmode obviously doesn't apply
+
+        """
+
+        yield from self._find_keys(entryvalue,operator,queryvalue,workers,pool)
+
+    def keys(self,workers=None,pool=None,ordered=True):
+
+        """
+        Yields all keys. With ' workers ' (default: config ' scan_workers ') above 1 the entries are scanned in parallel
+        by a pool of threads or processes (' pool ', default: config ' scan_pool '), then yielded in file order or,
+        without ' ordered ', in the order the chunks of the scan finished. The same goes for values and items.
+        Values and items take ' fields ' and ' view ' like Accessor.get, to only decode some fields or none until they are used.
+        """
+
+        if self.db.logger.level >= logging_utils.DEBUG:
+            self.db.log("KEYS",logging_utils.DEBUG)
+
+        keys = self._parallel_scan("keys",None,workers,pool,ordered)
+
+        if keys is not None:
+
+            yield from keys
+            return
+
+        for entry in self._live_entries():
+
+            yield self._entry_key(entry)
+
+    def values(self,fields=None,view=False,workers=None,pool=None,ordered=True):
+
+        if self.db.logger.level >= logging_utils.DEBUG:
+            self.db.log("VALUES",logging_utils.DEBUG)
+
+        for _,value in self._items(fields,view,workers,pool,ordered):
+
+            yield value
+
+    def items(self,fields=None,view=False,workers=None,pool=None,ordered=True):
+
+        if self.db.logger.level >= logging_utils.DEBUG:
+            self.db.log("ITEMS",logging_utils.DEBUG)
+
+        yield from self._items(fields,view,workers,pool,ordered)
+
+    def _items(self,fields,view,workers,pool,ordered):
+
+        fields = self._check_fields(fields,view)
+
+        items = self._parallel_scan("raw" if view else "items",fields,workers,pool,ordered)
+
+        if items is not None:
+
+            if view:
+
+                items = ((key,self._decode(data,view=True)) for key,data in items)
+
+            yield from items
+            return
+
+        if fields is None and not view:
+
+            for chunk, offset, keys in self._live_runs():
+
+                yield from zip(keys,self.db.structure.fetch_many(chunk,len(keys),self.db.entry_size,offset+self.db.entry_header_size))
+
+            return
+
+        for entry in self._live_entries():
+
+            yield (self._entry_key(entry),self._decode(entry[self.db.entry_header_size:],fields,view))
+
+    def __len__(self):
+
+        if self.db.logger.level >= logging_utils.DEBUG:
+            self.db.log("LENGTH",logging_utils.DEBUG)
+
+        with self.db.lock.read():
+
+            return len(self.db)
+
+    @property
+    def length(self):
+
+        return len(self)
+
+    @property
+    def health(self):
+
+        if self.db.logger.level >= logging_utils.DEBUG:
+            self.db.log("HEALTH",logging_utils.DEBUG)
+
+        return self.db.health
+
+    def _count_entries(self):
+
+        entries = 0
+        deleted = 0
+        collided = 0
+
+        for entry in self._entries():
+
+            if entry[:1] in [OCCUPANCE_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED]:
+
+                entries += 1
+
+            else:
+
+                deleted += 1
+
+            if entry[:1] in [OCCUPANCE_OCCUPIED_COLLIDED,OCCUPANCE_NOT_OCCUPIED_COLLIDED]:
+
+                collided += 1
+
+        if self.db.open_addressing: # Entries don't know whether their slot is their home slot
+
+            collided = open_addressing.count_collided(self)
+
+        return entries, deleted, collided
+
+class Transaction:
+
+    """
+    Writes of an accessor buffered as dirty pages until the transaction ends, see Accessor.transaction.
+    """
+
+    def __init__(self,accessor):
+
+        self.accessor = accessor
+
+        db = self.accessor.db
+
+        self.pages = wal.PageBuffer(lambda position,size: bytes(self.accessor._read_file(position,size)),self.accessor._file_size())
+
+        self.state = (db.entries,db.deleted_entries,db.collided_entries,db.writes,db.free_head,db.longest_chain)
+
+        self.keys = set() # Keys whose cached value may come from the buffer
+        self.index_changes = [] # (key, old data, new data)
+
+    def commit(self):
+
+        size = self.pages.size()
+
+        position = None
+        run = bytearray()
+
+        for page_number in sorted(self.pages.pages): # Adjacent pages are written together
+
+            if position is not None and page_number*wal.PAGE_SIZE != position+len(run):
+
+                self.accessor._write_file(position,run[:size-position])
+                run = bytearray()
+                position = None
+
+            if position is None:
+
+                position = page_number*wal.PAGE_SIZE
+
+            run += self.pages.pages[page_number]
+
+        if position is not None:
+
+            self.accessor._write_file(position,run[:size-position])
+
+        self.accessor._commit()
+
+    def abort(self):
+
+        db = self.accessor.db
+
+        db.entries, db.deleted_entries, db.collided_entries, db.writes, db.free_head, db.longest_chain = self.state
+
+        for key in self.keys:
+
+            db.cache.invalidate(key)
+
+        for key,old_data,data in reversed(self.index_changes):
+
+            self.accessor._index_update(key,data,old_data)
+
+class Rescale:
+
+    """
+    A progressive rescale. Entries are moved slot by slot (of the old slot table) into a new file,
+    keys whose old slot is below ' cursor ' are read from the new file, all other keys from the database file.
+    Every write still goes to the database file and is repeated in the new file for moved keys, so the database file stays
+    complete (and durable as configured) until the new file replaces it, a crash just loses the new file.
+    """
+
+    def __init__(self,database,slots):
+
+        self.db = database
+        self.location = self.db.location+".rescale"
+
+        build(self.location, self.db.name, self.db._struc_raw, slots, self.db.keysize, self.db.indexsize, hashing.NAMES[self.db.hash_algorithm], fingerprint_size=self.db.fingerprint_size)
+
+        self.target = Database(self.location, {"logger_enabled":False})
+        self.accessor = Accessor(self.target,use_mmap=False)
+        self.source = Accessor(self.db,use_mmap=False)
+
+        self.cursor = 0
+
+    def moved(self,key):
+
+        return self.db.get_slot(key) < self.cursor
+
+    def step(self,slot_amount):
+
+        """
+        Moves the next ' slot_amount ' slots, returns True once all slots are moved.
+        """
+
+        if self.source.closed: # Closed by Database.close_all_accessors
+
+            self.source = Accessor(self.db,use_mmap=False)
+
+        end = min(self.cursor+slot_amount,self.db.slots)
+
+        moving = {}
+
+        for slot in range(self.cursor,end):
+
+            _, occupance_info, o_dataindex = self.source._read_slot_at(self.db.indices_location+slot*self.db._slotsize)
+
+            if occupance_info == OCCUPANCE_NOT_OCCUPIED:
+
+                continue
+
+            for cur_dataindex, data_occupance_info, collided_index, key_r in self.source._chain(o_dataindex):
+
+                if data_occupance_info in [OCCUPANCE_OCCUPIED,OCCUPANCE_OCCUPIED_COLLIDED]:
+
+                    moving[key_r] = bytes(self.source._read_data(cur_dataindex))
+
+        if moving:
+
+            self.accessor._store_many(moving)
+
+        self.cursor = end
+
+        return self.cursor >= self.db.slots
+
+    def close(self):
+
+        if not self.source.closed:
+
+            self.source.close()
+
+        self.target.close()
+
+class TransactionError(Exception):
+
+    pass
+
+class WrongMagicNum(Exception):
+
+    pass
+
+class UnsupportedVersion(Exception):
 
     pass
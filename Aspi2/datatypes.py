@@ -104,7 +104,11 @@ class FixedBytes(Datatype):
 
     def _compiler(self,nb):
 
-        return nb
+        if len(nb) > self.bytesize:
+
+            raise ValueError("Can't compile: length exceeds maximum byte amount")
+
+        return nb.ljust(self.bytesize,b"\x00")
 
     def _validator(self,b):
 
@@ -112,7 +116,7 @@ class FixedBytes(Datatype):
 
     def _fetcher(self,b):
 
-        return b
+        return bytes(b)
 
     def __len__(self):
 
@@ -135,8 +139,7 @@ class Bytes(Datatype):
 
             raise ValueError("Can't compile: length exceeds maximum byte amount")
 
-        bl = len(nb).to_bytes(self._lenbytesize,'little')
-        return bl+nb+b"".join([b"\x00" for _ in range(self.bytesize-(len(nb)+len(bl)))])
+        return (len(nb).to_bytes(self._lenbytesize,'little')+nb).ljust(self.bytesize,b"\x00")
 
     def _validator(self,b):
 
@@ -144,10 +147,7 @@ class Bytes(Datatype):
 
     def _fetcher(self,b):
 
-        lb = b[:self._lenbytesize]
-        ebp = b[self._lenbytesize:]
-        eb = ebp[:int.from_bytes(lb,'little')]
-        return eb
+        return bytes(b[self._lenbytesize:self._lenbytesize+int.from_bytes(b[:self._lenbytesize],'little')])
 
     def __len__(self):
 
@@ -171,8 +171,7 @@ class ASCIIString(Datatype):
             raise ValueError("Can't compile: length exceeds maximum char amount")
 
         eb = nb.encode('ascii')
-        bl = len(eb).to_bytes(self._lenbytesize,'little')
-        return bl+eb+b"".join([b"\x00" for _ in range(self.bytesize-(len(eb)+len(bl)))])
+        return (len(eb).to_bytes(self._lenbytesize,'little')+eb).ljust(self.bytesize,b"\x00")
 
     def _validator(self,b):
 
@@ -180,10 +179,8 @@ class ASCIIString(Datatype):
 
     def _fetcher(self,b):
 
-        lb = b[:self._lenbytesize]
-        ebp = b[self._lenbytesize:]
-        eb = ebp[:int.from_bytes(lb,'little')]
-        return eb.decode('ascii')
+        eb = b[self._lenbytesize:self._lenbytesize+int.from_bytes(b[:self._lenbytesize],'little')] # Only the used part, never the padding
+        return str(eb,'ascii')
 
     def __len__(self):
 
@@ -207,8 +204,7 @@ class UnicodeString(Datatype):
             raise ValueError("Can't compile: length exceeds maximum char amount")
 
         eb = nb.encode('utf-8')
-        bl = len(eb).to_bytes(self._lenbytesize,'little')
-        return bl+eb+b"".join([b"\x00" for _ in range(self.bytesize-(len(eb)+len(bl)))])
+        return (len(eb).to_bytes(self._lenbytesize,'little')+eb).ljust(self.bytesize,b"\x00")
 
     def _validator(self,b):
 
@@ -216,10 +212,8 @@ class UnicodeString(Datatype):
 
     def _fetcher(self,b):
 
-        lb = b[:self._lenbytesize]
-        ebp = b[self._lenbytesize:]
-        eb = ebp[:int.from_bytes(lb,'little')]
-        return eb.decode('utf-8')
+        eb = b[self._lenbytesize:self._lenbytesize+int.from_bytes(b[:self._lenbytesize],'little')] # Only the used part, never the padding
+        return str(eb,'utf-8')
 
     def __len__(self):
 
@@ -237,21 +231,21 @@ class Boolean(Datatype):
 
     def _validator(self,b):
 
-        return False if b not in [b"\x00",b"\x01"] else True
+        return False if bytes(b) not in [b"\x00",b"\x01"] else True
 
     def _fetcher(self,b):
 
-        return True if b == "\x01" else False
+        return b[0] == 1
 
     def __len__(self):
 
         return 1
 
-def Decimal(Datatype):
+class Decimal(Datatype):
 
     def __init__(self):
 
-        self.real_type = bytes
+        self.real_type = float
 
     def _compiler(self,fl):
 
@@ -263,7 +257,7 @@ def Decimal(Datatype):
 
     def _fetcher(self,b):
 
-        return struct.unpack("<d",fl)[0]
+        return struct.unpack("<d",b)[0]
 
     def __len__(self):
 
@@ -0,0 +1,76 @@
+
+import hashlib
+import zlib
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+def sha1(kb):
+
+    return int.from_bytes(hashlib.sha1(kb).digest(),'little')
+
+def blake2b(kb):
+
+    return int.from_bytes(hashlib.blake2b(kb,digest_size=8).digest(),'little')
+
+def crc32(kb):
+
+    return zlib.crc32(kb)
+
+def xxh64(kb):
+
+    return xxhash.xxh64_intdigest(kb)
+
+# Identifiers are stored in the database header, never change them
+
+ALGORITHMS = {
+
+    "sha1":0,
+    "blake2b":1,
+    "crc32":2,
+    "xxh64":3
+
+}
+
+FUNCTIONS = {
+
+    0:sha1,
+    1:blake2b,
+    2:crc32,
+    3:xxh64
+
+}
+
+NAMES = {identifier:name for name,identifier in ALGORITHMS.items()}
+
+BITS = {0:160,1:64,2:32,3:64} # Width of each hash, fingerprints are taken from the top bits
+
+def get_identifier(name):
+
+    if name not in ALGORITHMS:
+
+        raise UnknownHashAlgorithmError(f"Unknown hash algorithm ' {name} ', choose one of {', '.join(ALGORITHMS)}")
+
+    if name == "xxh64" and xxhash is None:
+
+        raise UnknownHashAlgorithmError("Hash algorithm ' xxh64 ' requires the xxhash package")
+
+    return ALGORITHMS[name]
+
+def get_function(identifier):
+
+    if identifier not in FUNCTIONS:
+
+        raise UnknownHashAlgorithmError(f"Unknown hash algorithm identifier {identifier}")
+
+    if identifier == ALGORITHMS["xxh64"] and xxhash is None:
+
+        raise UnknownHashAlgorithmError("Database uses hash algorithm ' xxh64 ', which requires the xxhash package")
+
+    return FUNCTIONS[identifier]
+
+class UnknownHashAlgorithmError(Exception):
+
+    pass
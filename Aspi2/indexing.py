@@ -0,0 +1,285 @@
+
+import os
+import bisect
+from operator import itemgetter
+
+from . import find_operators
+
+INDEX_MAGIC = b"\x20\x04AspiIdx\x01"
+
+def sidecar_path(location):
+
+    return location+".aspidx"
+
+class HashIndex:
+
+    """
+    Maps field values to the keys holding them, answers ' == ' and ' in '.
+    """
+
+    kind = "hash"
+
+    def __init__(self):
+
+        self._values = {}
+
+    def __len__(self):
+
+        return sum(len(keys) for keys in self._values.values())
+
+    def add(self,value,key):
+
+        self._values.setdefault(value,set()).add(key)
+
+    def add_many(self,pairs):
+
+        for value,key in pairs:
+
+            self.add(value,key)
+
+    def remove(self,value,key):
+
+        keys = self._values.get(value)
+
+        if keys is not None:
+
+            keys.discard(key)
+
+            if not keys:
+                del self._values[value]
+
+    def items(self):
+
+        for value,keys in self._values.items():
+
+            for key in keys:
+
+                yield value,key
+
+    def find(self,op,queryvalue):
+
+        """
+        Returns a list of keys, or None if the index can't answer the query.
+        """
+
+        try:
+
+            if op is find_operators.equal:
+
+                return list(self._values.get(queryvalue,()))
+
+            if op is find_operators.asp_in and type(queryvalue) in [list,tuple,set,frozenset]:
+
+                return list(dict.fromkeys(key for value in queryvalue for key in self._values.get(value,())))
+
+        except TypeError: # Unhashable query value
+
+            return None
+
+        return None
+
+class SortedIndex:
+
+    """
+    Keeps (value, key) pairs sorted, answers ' == ', ' in ', ' < ', ' > ', ' <= ' and ' >= ' with binary searches.
+    """
+
+    kind = "sorted"
+
+    def __init__(self):
+
+        self._pairs = []
+
+    def __len__(self):
+
+        return len(self._pairs)
+
+    def add(self,value,key):
+
+        bisect.insort(self._pairs,(value,key))
+
+    def add_many(self,pairs):
+
+        """
+        Adds (value, key) pairs with a single sort instead of an insort each, for loading and rebuilding.
+        """
+
+        self._pairs.extend(pairs)
+        self._pairs.sort()
+
+    def remove(self,value,key):
+
+        i = bisect.bisect_left(self._pairs,(value,key))
+
+        if i < len(self._pairs) and self._pairs[i] == (value,key):
+
+            del self._pairs[i]
+
+    def items(self):
+
+        return iter(self._pairs)
+
+    def _keys(self,start,end):
+
+        return [key for _,key in self._pairs[start:end]]
+
+    def find(self,op,queryvalue):
+
+        """
+        Returns a list of keys, or None if the index can't answer the query.
+        """
+
+        value = itemgetter(0)
+
+        try:
+
+            if op is find_operators.equal:
+
+                return self._keys(bisect.bisect_left(self._pairs,queryvalue,key=value),bisect.bisect_right(self._pairs,queryvalue,key=value))
+
+            if op is find_operators.lessthan:
+
+                return self._keys(0,bisect.bisect_left(self._pairs,queryvalue,key=value))
+
+            if op is find_operators.lessthanequal:
+
+                return self._keys(0,bisect.bisect_right(self._pairs,queryvalue,key=value))
+
+            if op is find_operators.greaterthan:
+
+                return self._keys(bisect.bisect_right(self._pairs,queryvalue,key=value),None)
+
+            if op is find_operators.greaterthanequal:
+
+                return self._keys(bisect.bisect_left(self._pairs,queryvalue,key=value),None)
+
+            if op is find_operators.asp_in and type(queryvalue) in [list,tuple,set,frozenset]:
+
+                keys = []
+
+                for v in dict.fromkeys(queryvalue):
+
+                    keys += self._keys(bisect.bisect_left(self._pairs,v,key=value),bisect.bisect_right(self._pairs,v,key=value))
+
+                return list(dict.fromkeys(keys))
+
+        except TypeError: # Query value can't be compared with the indexed values
+
+            return None
+
+        return None
+
+KINDS = {
+
+    "hash":HashIndex,
+    "sorted":SortedIndex
+
+}
+
+def new_index(kind):
+
+    if kind not in KINDS:
+
+        raise UnknownIndexKindError(f"Unknown index kind ' {kind} ', choose one of {', '.join(KINDS)}")
+
+    return KINDS[kind]()
+
+def save(path,indexes,struc,stamp):
+
+    """
+    Writes the indexes to the sidecar at ' path '. ' stamp ' identifies the state of the database the indexes belong to.
+    Values are stored in their compiled form, so the sidecar never holds anything but plain data.
+    """
+
+    o = bytearray(INDEX_MAGIC)
+
+    for counter in stamp:
+
+        o += counter.to_bytes(12,'little')
+
+    o += len(indexes).to_bytes(2,'little')
+
+    for field,index in indexes.items():
+
+        datatype = struc.data[struc.keys[field]]
+
+        o += len(field.encode('ascii')).to_bytes(2,'little')
+        o += field.encode('ascii')
+        o += len(index.kind).to_bytes(1,'little')
+        o += index.kind.encode('ascii')
+        o += len(index).to_bytes(12,'little')
+
+        for value,key in index.items():
+
+            o += datatype.compile(value)
+            o += len(key).to_bytes(2,'little')
+            o += key.encode('ascii')
+
+    with open(path+".tmp","wb") as f:
+
+        f.write(o)
+
+    os.replace(path+".tmp",path)
+
+def load(path,struc):
+
+    """
+    Reads the sidecar at ' path ', returns (stamp, indexes).
+    """
+
+    with open(path,"rb") as f:
+
+        b = f.read()
+
+    if b[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+
+        raise CorruptIndexError(f"Didn't find index magic number at beginning of ' {path} '")
+
+    cursor = len(INDEX_MAGIC)
+
+    stamp = (int.from_bytes(b[cursor:cursor+12],'little'),int.from_bytes(b[cursor+12:cursor+24],'little'))
+    cursor += 24
+
+    indexes = {}
+
+    index_amount = int.from_bytes(b[cursor:cursor+2],'little')
+    cursor += 2
+
+    for _ in range(index_amount):
+
+        fl = int.from_bytes(b[cursor:cursor+2],'little')
+        field = b[cursor+2:cursor+2+fl].decode('ascii')
+        cursor += 2+fl
+
+        kl = b[cursor]
+        index = new_index(b[cursor+1:cursor+1+kl].decode('ascii'))
+        cursor += 1+kl
+
+        amount = int.from_bytes(b[cursor:cursor+12],'little')
+        cursor += 12
+
+        datatype = struc.data[struc.keys[field]]
+        size = len(datatype)
+
+        pairs = []
+
+        for _ in range(amount):
+
+            value = datatype.fetch(b[cursor:cursor+size])
+            keyl = int.from_bytes(b[cursor+size:cursor+size+2],'little')
+            pairs.append((value,b[cursor+size+2:cursor+size+2+keyl].decode('ascii')))
+            cursor += size+2+keyl
+
+        index.add_many(pairs)
+
+        indexes[field] = index
+
+    return stamp, indexes
+
+class UnknownIndexKindError(Exception):
+
+    pass
+
+class CorruptIndexError(Exception):
+
+    pass
@@ -0,0 +1,285 @@
+
+"""
+Locking for a database shared between threads and processes.
+
+Within a process a ReadWriteLock lets any amount of threads read at once, while a writing thread has the database to itself.
+With a ProcessLock the process also holds a shared flock on ' <location>.asplock ' while any of its threads reads and an exclusive
+one while one of them writes, so processes with the same database open are coordinated the same way.
+The lock file holds a generation counter that writers increment, a process that finds it changed when taking the lock
+knows another process wrote in the meantime and reloads what it keeps in memory (header, cache, indexes).
+"""
+
+import os
+import threading
+import contextlib
+
+try:
+    import fcntl
+except ImportError: # Not available on Windows
+    fcntl = None
+
+def lock_path(location):
+
+    return location+".asplock"
+
+class ProcessLock:
+
+    def __init__(self,location):
+
+        if fcntl is None:
+
+            raise ProcessLockingUnavailable("Locking between processes needs fcntl, which isn't available on this platform")
+
+        self.path = lock_path(location)
+
+        self._fd = os.open(self.path,os.O_RDWR|os.O_CREAT)
+
+    def acquire(self,exclusive):
+
+        fcntl.flock(self._fd,fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+    def release(self):
+
+        fcntl.flock(self._fd,fcntl.LOCK_UN)
+
+    def generation(self):
+
+        return int.from_bytes(os.pread(self._fd,8,0),'little')
+
+    def increment(self):
+
+        """
+        Increments the generation counter, only while holding the lock exclusively. Returns the new generation.
+        """
+
+        generation = self.generation()+1
+
+        os.pwrite(self._fd,generation.to_bytes(8,'little'),0)
+
+        return generation
+
+    def close(self):
+
+        os.close(self._fd)
+
+class ReadWriteLock:
+
+    """
+    Many readers or a single writer. Both are reentrant and a writer may read, but a reader can't start writing (LockUpgradeError).
+    Waiting writers go before new readers, so writers don't starve.
+
+    ' with lock: ' takes the write lock, ' with lock.read(): ' the read lock.
+    With a ' process_lock ', ' on_acquire ' is called whenever this process takes it (before any other thread gets in)
+    and ' on_write_release ' before a writer hands it back.
+    """
+
+    def __init__(self,process_lock=None,on_acquire=None,on_write_release=None):
+
+        self.process_lock = process_lock
+
+        self._on_acquire = on_acquire
+        self._on_write_release = on_write_release
+
+        self._cond = threading.Condition(threading.Lock())
+
+        self._readers = {} # thread id -> depth
+        self._writer = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+        self._syncing = False # The first reader is taking the process lock
+
+    def acquire_read(self):
+
+        me = threading.get_ident()
+
+        with self._cond:
+
+            if self._writer == me:
+
+                self._writer_depth += 1
+                return
+
+            if me in self._readers:
+
+                self._readers[me] += 1
+                return
+
+            while self._writer is not None or self._waiting_writers or self._syncing:
+
+                self._cond.wait()
+
+            self._readers[me] = 1
+
+            if self.process_lock is None or len(self._readers) > 1:
+
+                return
+
+            self._syncing = True
+
+        try:
+
+            self._acquire_process(False)
+
+        except BaseException:
+
+            with self._cond:
+
+                del self._readers[me]
+                self._cond.notify_all()
+
+            raise
+
+        finally:
+
+            with self._cond:
+
+                self._syncing = False
+                self._cond.notify_all()
+
+    def release_read(self):
+
+        me = threading.get_ident()
+
+        with self._cond:
+
+            if self._writer == me:
+
+                self._writer_depth -= 1
+                return
+
+            self._readers[me] -= 1
+
+            if self._readers[me]:
+
+                return
+
+            del self._readers[me]
+
+            if not self._readers:
+
+                if self.process_lock is not None:
+
+                    self.process_lock.release()
+
+                self._cond.notify_all()
+
+    def acquire(self):
+
+        me = threading.get_ident()
+
+        with self._cond:
+
+            if self._writer == me:
+
+                self._writer_depth += 1
+                return True
+
+            if me in self._readers:
+
+                raise LockUpgradeError("Can't start writing while holding the read lock")
+
+            self._waiting_writers += 1
+
+            try:
+
+                while self._writer is not None or self._readers:
+
+                    self._cond.wait()
+
+            finally:
+
+                self._waiting_writers -= 1
+
+            self._writer = me
+            self._writer_depth = 1
+
+        if self.process_lock is not None:
+
+            try:
+
+                self._acquire_process(True)
+
+            except BaseException:
+
+                with self._cond:
+
+                    self._writer = None
+                    self._writer_depth = 0
+                    self._cond.notify_all()
+
+                raise
+
+        return True
+
+    def release(self):
+
+        with self._cond:
+
+            if self._writer_depth > 1:
+
+                self._writer_depth -= 1
+                return
+
+        try:
+
+            if self.process_lock is not None and self._on_write_release is not None:
+
+                self._on_write_release() # Still the writer, so this may take the lock again
+
+        finally:
+
+            with self._cond:
+
+                if self.process_lock is not None:
+
+                    self.process_lock.release()
+
+                self._writer = None
+                self._writer_depth = 0
+                self._cond.notify_all()
+
+    def _acquire_process(self,exclusive):
+
+        self.process_lock.acquire(exclusive)
+
+        try:
+
+            if self._on_acquire is not None:
+
+                self._on_acquire()
+
+        except BaseException:
+
+            self.process_lock.release()
+            raise
+
+    def __enter__(self):
+
+        self.acquire()
+
+        return self
+
+    def __exit__(self,exc_type,exc_value,traceback):
+
+        self.release()
+
+    @contextlib.contextmanager
+    def read(self):
+
+        self.acquire_read()
+
+        try:
+
+            yield self
+
+        finally:
+
+            self.release_read()
+
+class LockUpgradeError(Exception):
+
+    pass
+
+class ProcessLockingUnavailable(Exception):
+
+    pass
@@ -1,6 +1,17 @@
 import os
-import datetime
+import time
 import random
+import datetime
+import threading
+import collections
+
+ERROR, WARNING, INFO, DEBUG, INTERNAL = range(5)
+
+LEVEL_NUMBERS = {"ERROR":ERROR,"WARNING":WARNING,"INFO":INFO,"DEBUG":DEBUG,"INTERNAL":INTERNAL}
+
+_BATCH_SIZE = 4096 # Lines buffered before the background writer is woken up
+
+_WRITE_INTERVAL = 0.1 # Seconds the background writer waits for a full buffer
 
 _loggers = {}
 
@@ -12,9 +23,17 @@ class Logger:
 
     levels = ["ERROR","WARNING","INFO","DEBUG","INTERNAL"]
 
-    def __init__(self,name,dirpath,enabled=True,print_enabled=True,print_level="INFO",datetime_format="%a %b %d %Y %H:%M:%S"):
+    def __init__(self,name,dirpath,enabled=True,print_enabled=True,print_level="INFO",file_level="INFO",asynchronous=True,datetime_format="%a %b %d %Y %H:%M:%S"):
+
+        """
+        Lines at ' print_level ' or below are printed, lines at ' file_level ' or below go to the log file.
+        With ' asynchronous ' set a background thread writes the file, logging only buffers the line.
+        """
 
         self.enabled = enabled
+        self.closed = False
+
+        self.level = -1 # Highest level logged anywhere, compare against it before building an expensive message
 
         if enabled:
 
@@ -22,37 +41,124 @@ class Logger:
             self.log_file_path = os.path.join(dirpath,f"{name}-{datetime.datetime.now().strftime('%d%m%Y-%H%M%S')}-{random.randint(0,99999)}.log")
 
             self.datetime_format = datetime_format
+            self._timestamp = (None,None) # (second, formatted), one tuple as the writer thread and the printing threads share it
 
-            self.print_level = self.levels.index(print_level) if type(print_level) is str else print_level
             self.print_enabled = print_enabled
+            self.print_level = LEVEL_NUMBERS.get(print_level,print_level) if print_enabled else -1
+            self.file_level = LEVEL_NUMBERS.get(file_level,file_level)
+
+            self.level = max(self.print_level,self.file_level)
 
             os.makedirs(dirpath,exist_ok=True)
 
-            self.closed = False
             self._log_file = open(self.log_file_path,"a")
 
+            self._buffer = None
+            self._writer = None
+
+            if asynchronous:
+
+                self._buffer = collections.deque() # (time, level, content), appended by any thread
+                self._write_lock = threading.Lock()
+                self._wake = threading.Event()
+
+                self._writer = threading.Thread(target=self._write_loop,name=f"{name}-logger",daemon=True)
+                self._writer.start()
+
             _loggers[name] = self
 
-            self.log("Logger started.","INTERNAL")
+            self.log("Logger started.",INTERNAL)
 
-    def log(self,content,level="INFO"):
+    def log(self,content,level=INFO,*args):
 
-        if not self.enabled:
+        """
+        Logs ' content ' at ' level ' (a level name or one of the level constants).
+        With ' args ' the line is ' content % args ', which is only formatted if the level is logged.
+        """
+
+        level = LEVEL_NUMBERS.get(level,level)
+
+        if level > self.level:
             return
 
         if self.closed:
             raise LoggerClosedError("Can't log with a closed logger.")
 
-        _log_val = self.levels.index(level)
+        if args:
+
+            content = content % args
+
+        if level <= self.file_level:
+
+            if self._buffer is not None:
+
+                self._buffer.append((time.time(),level,content))
+
+                if level <= WARNING or len(self._buffer) >= _BATCH_SIZE:
+
+                    self._wake.set()
+
+            else:
+
+                self._log_file.write(self._format(time.time(),level,content))
+                self._log_file.flush()
+
+        if level <= self.print_level:
 
-        _c = f"{self.name} | {datetime.datetime.now().strftime(self.datetime_format)} | {level} | {content}"
+            print(self._format(time.time(),level,content),end="")
 
-        self._log_file.write(_c+"\n")
-        self._log_file.flush()
+    def _format(self,t,level,content):
 
-        if self.print_enabled and _log_val <= self.print_level:
+        second = int(t)
+        last_second, timestamp = self._timestamp
 
-            print(_c)
+        if second != last_second: # Lines mostly come many per second, format each second once
+
+            timestamp = time.strftime(self.datetime_format,time.localtime(second))
+            self._timestamp = (second,timestamp)
+
+        return f"{self.name} | {timestamp} | {self.levels[level]} | {content}\n"
+
+    def _write_buffered(self):
+
+        with self._write_lock:
+
+            lines = []
+
+            try:
+
+                while True:
+
+                    lines.append(self._format(*self._buffer.popleft()))
+
+            except IndexError:
+
+                pass
+
+            if lines:
+
+                self._log_file.write("".join(lines))
+                self._log_file.flush()
+
+    def _write_loop(self):
+
+        while not self.closed:
+
+            self._wake.wait(_WRITE_INTERVAL)
+            self._wake.clear()
+
+            self._write_buffered()
+
+    def flush(self):
+
+        """
+        Writes every line logged so far to the log file.
+        """
+
+        if not self.enabled or self.closed or self._buffer is None:
+            return
+
+        self._write_buffered()
 
     def close(self):
 
@@ -64,10 +170,18 @@ class Logger:
 
             return
 
-        self.log("Logger closing...","INTERNAL")
+        self.log("Logger closing...",INTERNAL)
 
         _loggers.pop(self.name)
         self.closed = True
+
+        if self._writer is not None:
+
+            self._wake.set()
+            self._writer.join()
+
+            self._write_buffered()
+
         self._log_file.close()
 
 class LoggerClosedError(Exception):
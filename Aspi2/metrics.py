@@ -0,0 +1,460 @@
+
+"""
+Operation metrics: call counts and latency histograms per operation, chain walk lengths, cache and I/O counters.
+
+With ' metrics_enabled ' every accessor records into its own Recorder, so recording takes no locks as long as each thread
+uses its own accessor, Database.metrics merges the recorders into one snapshot. Without it nothing is instrumented at all:
+instrument replaces the methods of a single accessor (or database) with timed ones, the classes themselves stay untouched.
+
+Histograms are log-linear like HDR histograms: 8 buckets per power of two, so every value is kept within 12.5%.
+"""
+
+import time
+import functools
+
+SUB_BUCKET_BITS = 3
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+BUCKETS = SUB_BUCKETS*64
+
+OPERATIONS = ["get","set","has","delete","get_many","set_many","delete_many","find","find_generator","keys","values","items"]
+
+ITERATING_OPERATIONS = ["find_generator","keys","values","items"] # Timed until the returned iterator is exhausted or closed
+
+DATABASE_OPERATIONS = ["rescale","rescale_step","finish_rescale","compact","backup","checkpoint"]
+
+PERCENTILES = {"p50":0.5,"p90":0.9,"p99":0.99,"p999":0.999}
+
+# Prometheus bucket bounds, each the highest value of a histogram bucket so Histogram.cumulative counts exactly the values at or below it
+# (a power of two is the lowest value of its bucket)
+
+LATENCY_BOUNDS = [2**k-1 for k in range(10,37)] # 1 us to 68 s
+
+CHAIN_LENGTH_BOUNDS = [1,2,3,4,6,8,12,15,31,63,127]
+
+_databases = {} # Databases with metrics enabled, by name
+
+def get_database(name):
+
+    return _databases[name]
+
+def _bucket(value):
+
+    shift = value.bit_length()-SUB_BUCKET_BITS-1
+
+    if shift < 0:
+
+        shift = 0
+
+    return shift*SUB_BUCKETS+(value >> shift)
+
+def bucket_bounds(index):
+
+    """
+    Returns the lowest and the highest value (inclusive) counted in bucket ' index '.
+    """
+
+    shift = max(index//SUB_BUCKETS-1,0)
+    low = (index-shift*SUB_BUCKETS) << shift
+
+    return low, low+(1 << shift)-1
+
+class Histogram:
+
+    def __init__(self):
+
+        self.counts = [0]*BUCKETS
+
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self,value):
+
+        """
+        Records a non negative int.
+        """
+
+        self.counts[_bucket(value)] += 1
+
+        self.count += 1
+        self.total += value
+
+        if self.min is None or value < self.min:
+            self.min = value
+
+        if value > self.max:
+            self.max = value
+
+    def merge(self,other):
+
+        for index,count in enumerate(other.counts):
+
+            if count:
+
+                self.counts[index] += count
+
+        self.count += other.count
+        self.total += other.total
+
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+
+        self.max = max(self.max,other.max)
+
+    def percentile(self,p):
+
+        """
+        Returns the value below which ' p ' (0 to 1) of the recorded values are, as the middle of its bucket.
+        """
+
+        if not self.count:
+
+            return None
+
+        target = max(p*self.count,1)
+        seen = 0
+
+        for index,count in enumerate(self.counts):
+
+            seen += count
+
+            if seen >= target:
+
+                low, high = bucket_bounds(index)
+
+                return min(max((low+high)//2,self.min),self.max)
+
+        return self.max
+
+    def cumulative(self,bound):
+
+        """
+        Returns the amount of values at or below ' bound ', exact when ' bound ' is the highest value of a bucket.
+        """
+
+        index = _bucket(bound)
+
+        return sum(self.counts[:index+1]) if bucket_bounds(index)[1] == bound else sum(self.counts[:index])
+
+    def snapshot(self):
+
+        o = {
+
+            "count":self.count,
+            "sum":self.total,
+            "min":self.min,
+            "max":self.max if self.count else None,
+            "mean":self.total/self.count if self.count else None
+
+        }
+
+        for name,p in PERCENTILES.items():
+
+            o[name] = self.percentile(p)
+
+        return o
+
+class Recorder:
+
+    def __init__(self):
+
+        self.latency = {} # Operation -> Histogram of nanoseconds
+        self.errors = {} # Operation -> calls that raised
+
+        self.chain_length = Histogram() # Entries of a chain (or slots probed with open addressing) walked per key, recorded by the accessor itself
+
+        self.reads = 0
+        self.writes = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.syscalls = 0
+
+    def histogram(self,operation):
+
+        histogram = self.latency.get(operation)
+
+        if histogram is None:
+
+            histogram = self.latency[operation] = Histogram()
+
+        return histogram
+
+    def merge(self,other):
+
+        for operation,histogram in other.latency.items():
+
+            self.histogram(operation).merge(histogram)
+
+        for operation,errors in other.errors.items():
+
+            self.errors[operation] = self.errors.get(operation,0)+errors
+
+        self.chain_length.merge(other.chain_length)
+
+        self.reads += other.reads
+        self.writes += other.writes
+        self.bytes_read += other.bytes_read
+        self.bytes_written += other.bytes_written
+        self.syscalls += other.syscalls
+
+def _timed(recorder,operation,method,lock=None):
+
+    histogram = recorder.histogram(operation)
+
+    @functools.wraps(method)
+    def timed(*args,**kwargs):
+
+        start = time.perf_counter_ns()
+
+        try:
+
+            return method(*args,**kwargs)
+
+        except BaseException:
+
+            recorder.errors[operation] = recorder.errors.get(operation,0)+1
+            raise
+
+        finally:
+
+            elapsed = time.perf_counter_ns()-start
+
+            if lock is not None:
+
+                with lock:
+
+                    histogram.record(elapsed)
+
+            else:
+
+                histogram.record(elapsed)
+
+    return timed
+
+def _timed_iterator(recorder,operation,method):
+
+    histogram = recorder.histogram(operation)
+
+    @functools.wraps(method)
+    def timed(*args,**kwargs):
+
+        start = time.perf_counter_ns()
+        iterator = iter(method(*args,**kwargs))
+        elapsed = time.perf_counter_ns()-start
+
+        try:
+
+            while True:
+
+                start = time.perf_counter_ns()
+
+                try:
+                    item = next(iterator)
+                finally:
+                    elapsed += time.perf_counter_ns()-start
+
+                yield item
+
+        except (StopIteration,GeneratorExit): # Exhausted, or closed by the caller
+
+            return
+
+        except BaseException:
+
+            recorder.errors[operation] = recorder.errors.get(operation,0)+1
+            raise
+
+        finally:
+
+            if hasattr(iterator,"close"):
+                iterator.close()
+
+            histogram.record(elapsed) # Only the time spent producing items, not the time the caller spent on them
+
+    return timed
+
+def instrument(accessor,recorder):
+
+    """
+    Makes ' accessor ' record into ' recorder ': operation latencies and its file reads and writes.
+    Chain walk lengths are recorded by the accessor itself where it walks them, into its ' _metrics '.
+    """
+
+    for operation in OPERATIONS:
+
+        method = getattr(accessor,operation)
+
+        if operation in ITERATING_OPERATIONS:
+
+            setattr(accessor,operation,_timed_iterator(recorder,operation,method))
+
+        else:
+
+            setattr(accessor,operation,_timed(recorder,operation,method))
+
+    read_file = accessor._read_file
+    pread = accessor._pread
+    write_file = accessor._write_file
+
+    def counted_read_file(position,size):
+
+        data = read_file(position,size)
+
+        recorder.reads += 1
+        recorder.bytes_read += len(data)
+
+        return data
+
+    def counted_pread(fd,size,position):
+
+        recorder.syscalls += 1
+
+        return pread(fd,size,position)
+
+    def counted_write_file(position,data):
+
+        recorder.writes += 1
+        recorder.bytes_written += len(data)
+
+        if accessor.db.wal is None: # A seek and a write, with the log the page only changes in memory
+
+            recorder.syscalls += 2
+
+        write_file(position,data)
+
+    accessor._read_file = counted_read_file
+    accessor._pread = counted_pread
+    accessor._write_file = counted_write_file
+
+def instrument_database(db,recorder,lock):
+
+    """
+    Makes ' db ' record the latencies of rescales, compactions, backups and checkpoints into ' recorder ', guarded by ' lock '.
+    """
+
+    for operation in DATABASE_OPERATIONS:
+
+        setattr(db,operation,_timed(recorder,operation,getattr(db,operation),lock=lock))
+
+def register(db):
+
+    _databases[db.name] = db
+
+def unregister(db):
+
+    if _databases.get(db.name) is db:
+
+        _databases.pop(db.name)
+
+def snapshot(db,recorder):
+
+    """
+    Returns the metrics of ' db ' as a dict, with the operations merged from ' recorder '.
+    """
+
+    operations = {}
+
+    for operation,histogram in sorted(recorder.latency.items()):
+
+        if histogram.count:
+
+            operations[operation] = {"count":histogram.count,"errors":recorder.errors.get(operation,0),"latency_ns":histogram.snapshot()}
+
+    return {
+
+        "database":db.name,
+        "time":time.time(),
+        "entries":len(db),
+        "slots":db.slots,
+        "operations":operations,
+        "chain_length":recorder.chain_length.snapshot(),
+        "cache":db.cache.stats(),
+        "io":{
+
+            "reads":recorder.reads,
+            "writes":recorder.writes,
+            "bytes_read":recorder.bytes_read,
+            "bytes_written":recorder.bytes_written,
+            "syscalls":recorder.syscalls
+
+        }
+
+    }
+
+def _label(value):
+
+    return str(value).replace("\\","\\\\").replace("\"","\\\"").replace("\n","\\n")
+
+def _histogram_lines(name,labels,histogram,bounds,scale=1):
+
+    lines = []
+
+    for bound in bounds:
+
+        lines.append(f"{name}_bucket{{{labels},le=\"{bound*scale:g}\"}} {histogram.cumulative(bound)}")
+
+    lines.append(f"{name}_bucket{{{labels},le=\"+Inf\"}} {histogram.count}")
+    lines.append(f"{name}_sum{{{labels}}} {histogram.total*scale:g}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+    return lines
+
+def prometheus_text(databases=None):
+
+    """
+    Returns the metrics of ' databases ' (default: every open database with metrics enabled) in the Prometheus text format,
+    every sample labelled with the database name.
+    """
+
+    databases = list(_databases.values()) if databases is None else databases
+
+    families = {} # Name -> (type, help, lines)
+
+    def add(name,kind,help_text,lines):
+
+        families.setdefault(name,(kind,help_text,[]))[2].extend(lines)
+
+    for db in databases:
+
+        recorder = db._collect_metrics()
+        metrics = snapshot(db,recorder)
+
+        database = f"database=\"{_label(db.name)}\""
+
+        add("aspi_entries","gauge","Entries in the database",[f"aspi_entries{{{database}}} {metrics['entries']}"])
+        add("aspi_slots","gauge","Slots of the slot table",[f"aspi_slots{{{database}}} {metrics['slots']}"])
+
+        for operation,histogram in sorted(recorder.latency.items()):
+
+            if not histogram.count:
+
+                continue
+
+            labels = f"{database},operation=\"{operation}\""
+
+            add("aspi_operations_total","counter","Calls per operation",[f"aspi_operations_total{{{labels}}} {histogram.count}"])
+            add("aspi_operation_errors_total","counter","Calls per operation that raised",[f"aspi_operation_errors_total{{{labels}}} {recorder.errors.get(operation,0)}"])
+            add("aspi_operation_duration_seconds","histogram","Latency per operation",_histogram_lines("aspi_operation_duration_seconds",labels,histogram,LATENCY_BOUNDS,1e-9))
+
+        add("aspi_chain_length","histogram","Entries walked per key operation that walked a chain",_histogram_lines("aspi_chain_length",database,recorder.chain_length,CHAIN_LENGTH_BOUNDS))
+
+        for name,value in [("hits",metrics["cache"]["hits"]),("misses",metrics["cache"]["misses"]),("evictions",metrics["cache"]["evictions"])]:
+
+            add(f"aspi_cache_{name}_total","counter",f"Cache {name}",[f"aspi_cache_{name}_total{{{database}}} {value}"])
+
+        add("aspi_cache_entries","gauge","Entries in the cache",[f"aspi_cache_entries{{{database}}} {metrics['cache']['entries']}"])
+
+        for name,value in metrics["io"].items():
+
+            add(f"aspi_io_{name}_total","counter",f"I/O {name.replace('_',' ')} on the database file",[f"aspi_io_{name}_total{{{database}}} {value}"])
+
+    lines = []
+
+    for name,(kind,help_text,samples) in families.items():
+
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines += samples
+
+    return "\n".join(lines)+"\n"
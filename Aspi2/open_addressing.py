@@ -0,0 +1,545 @@
+
+"""
+Open addressing engine, selected with build(..., engine="open_addressing").
+
+Every slot holds occupance info, the data index of one entry and the 8 byte fingerprint of its key, entries don't link to each other.
+Keys are placed by linear probing with Robin Hood displacement: a key that is further from its home slot takes the slot of one
+that is closer to its own, so probe lengths stay short and even at high load factors, and a lookup can stop as soon as it meets
+a slot closer to its home than the key would be. Probing reads PROBE_WINDOW slots at once, a lookup then reads exactly one entry.
+
+The home slot of a key is computed from its fingerprint, so the distance of every slot is known from the slot table alone:
+deleting shifts the following slots back instead of leaving tombstones in the table, and a rescale rebuilds the table from the
+fingerprints in the entry headers without decoding any key. Deleted entries go onto the free list like in the chained engine.
+
+The table can't hold more entries than slots, so it grows to twice its size once ' open_max_load_factor ' is reached
+(not inside a transaction, which fails with TableFullError once the table is full instead).
+"""
+
+FINGERPRINT_SIZE = 8
+
+PROBE_WINDOW = 16 # Slots read at once while probing
+
+def _home(db,fingerprint):
+
+    h = int.from_bytes(fingerprint,'little')
+
+    return h & db._slot_mask if db._slot_mask is not None else h % db.slots
+
+def _distance(db,position,fingerprint):
+
+    return (position-_home(db,fingerprint)) % db.slots
+
+def _probe(a,start,limit=None):
+
+    """
+    Yields (position, slot) for the slots from ' start ' on, wrapping around, at most ' limit ' (default: all slots).
+    """
+
+    db = a.db
+    slotsize = db._slotsize
+
+    position = start
+    remaining = db.slots if limit is None else limit
+
+    while remaining > 0:
+
+        amount = min(PROBE_WINDOW,db.slots-position,remaining)
+        window = bytes(a._read_at(db.indices_location+position*slotsize,amount*slotsize))
+
+        for offset in range(0,amount*slotsize,slotsize):
+
+            yield position, window[offset:offset+slotsize]
+
+            position += 1
+
+        remaining -= amount
+
+        if position == db.slots:
+
+            position = 0
+
+def _write_slots(a,changes):
+
+    """
+    Writes a list of (position, slot) for consecutive positions, one write per run that doesn't wrap around.
+    """
+
+    db = a.db
+
+    run_start = None
+    run = []
+
+    for position, slot in changes:
+
+        if run and position != run_start+len(run):
+
+            a._write_at(db.indices_location+run_start*db._slotsize,b"".join(run))
+            run = []
+
+        if not run:
+
+            run_start = position
+
+        run.append(slot)
+
+    if run:
+
+        a._write_at(db.indices_location+run_start*db._slotsize,b"".join(run))
+
+def _find(a,key,slot_index,fingerprint,size):
+
+    """
+    Returns (data index, first ' size ' bytes of the entry, position, distance) of ' key '.
+    If ' key ' isn't in the table the data index and entry are None, and position and distance are those of the slot it would go in
+    (both None if the table is full). The hot path of every engine operation, so the probing of _probe is inlined here.
+    """
+
+    db = a.db
+    indexsize = db.indexsize
+    slotsize = db._slotsize
+    slots = db.slots
+    slot_mask = db._slot_mask
+
+    position = (slot_index-db.indices_location)//slotsize
+    distance = 0
+
+    while distance < slots:
+
+        amount = min(PROBE_WINDOW,slots-position,slots-distance)
+        window = bytes(a._read_at(db.indices_location+position*slotsize,amount*slotsize))
+
+        for offset in range(0,amount*slotsize,slotsize):
+
+            if not window[offset]:
+
+                a._record_chain(distance) # Occupied slots probed, like the entries of a chain
+
+                return None, None, position, distance
+
+            slot_fingerprint = window[offset+1+indexsize:offset+slotsize]
+
+            if slot_fingerprint == fingerprint:
+
+                dataindex = int.from_bytes(window[offset+1:offset+1+indexsize],'little')
+                entry = a._read_at(db.data_location+dataindex,size)
+
+                if a._entry_key(entry) == key:
+
+                    a._record_chain(distance+1)
+
+                    return dataindex, entry, position, distance
+
+            else:
+
+                h = int.from_bytes(slot_fingerprint,'little')
+
+                if (position-(h & slot_mask if slot_mask is not None else h % slots)) % slots < distance: # Robin Hood: ' key ' would have taken this slot
+
+                    a._record_chain(distance+1)
+
+                    return None, None, position, distance
+
+            position += 1
+            distance += 1
+
+        if position == slots:
+
+            position = 0
+
+    a._record_chain(slots)
+
+    return None, None, None, None
+
+def _place(a,position,distance,slot):
+
+    """
+    Puts ' slot ' at ' position ', ' distance ' slots from its home, moving the slots in its way forward.
+    Returns (the change in collided entries, the longest distance from home it caused), raises TableFullError if no slot is empty.
+    """
+
+    db = a.db
+    indexsize = db.indexsize
+
+    changes = []
+    collided = 1 if distance else 0
+    longest = distance
+
+    for current_position, current in _probe(a,position):
+
+        if not current[0]:
+
+            changes.append((current_position,slot))
+
+            break
+
+        current_distance = _distance(db,current_position,current[1+indexsize:])
+
+        if current_distance < distance: # Take the slot, carry on with the entry that was closer to its home
+
+            changes.append((current_position,slot))
+            slot, distance = current, current_distance
+
+            if not distance:
+
+                collided += 1
+
+        distance += 1
+        longest = max(longest,distance)
+
+    else:
+
+        raise TableFullError(f"The open addressing table of ' {db.name} ' has no empty slot left")
+
+    _write_slots(a,changes)
+
+    return collided, longest
+
+def _empty(a,position,distance):
+
+    """
+    Empties the slot at ' position ', ' distance ' slots from its home, and shifts the following displaced slots back by one.
+    Returns the change in collided entries.
+    """
+
+    db = a.db
+    indexsize = db.indexsize
+
+    changes = []
+    collided = -1 if distance else 0
+
+    previous = position
+
+    for current_position, current in _probe(a,(position+1) % db.slots,db.slots-1):
+
+        if not current[0]:
+
+            break
+
+        current_distance = _distance(db,current_position,current[1+indexsize:])
+
+        if not current_distance:
+
+            break
+
+        changes.append((previous,current))
+        previous = current_position
+
+        if current_distance == 1:
+
+            collided -= 1
+
+    changes.append((previous,b"\x00"*db._slotsize))
+
+    _write_slots(a,changes)
+
+    return collided
+
+def _reserve(a,amount):
+
+    """
+    Grows the table if ' amount ' more entries would take it over ' open_max_load_factor ', unless a transaction is open.
+    Returns True if it grew, which moves every entry, so slot positions and data indices found before are invalid.
+    """
+
+    db = a.db
+
+    if db.entries+amount <= db.config["open_max_load_factor"]*db.slots:
+
+        return False
+
+    if any(accessor._transaction is not None for accessor in db.accessors):
+
+        return False
+
+    slots = max(db.slots*2,int((db.entries+amount)/db.config["open_max_load_factor"])+1)
+
+    db.log(f"RESCALE: Growing the open addressing table to {slots} slots")
+    db._relink(slots)
+
+    return True
+
+def _check_room(db,amount):
+
+    """
+    Raises TableFullError if ' amount ' more entries don't fit, which only happens in a transaction (see _reserve).
+    """
+
+    if db.entries+amount > db.slots:
+
+        raise TableFullError(f"The open addressing table of ' {db.name} ' is full, rescale it before writing more entries in a transaction")
+
+def _insert(a,key,data,fingerprint,position,distance,dataindex=None):
+
+    """
+    Writes a new entry for ' key ' (at ' dataindex ', default: a new one) and places it in the slot table,
+    starting at ' position ', ' distance ' slots from its home. Returns (the change in collided entries, was the entry taken off the free list).
+    """
+
+    db = a.db
+
+    if position is None:
+
+        raise TableFullError(f"The open addressing table of ' {db.name} ' is full, rescale it before writing more entries in a transaction")
+
+    was_free = False
+
+    if dataindex is None:
+
+        dataindex, was_free = a._new_dataindex()
+        a._write_data_at(dataindex,key,data,fingerprint=fingerprint)
+
+    collided, longest = _place(a,position,distance,a._slot_bytes(dataindex,fingerprint))
+
+    db.longest_chain = max(db.longest_chain,longest+1)
+
+    return collided, was_free
+
+def lookup(a,key,size):
+
+    slot_index, fingerprint = a.db.get_slot_index_and_fingerprint(key)
+
+    dataindex, entry, _, _2 = _find(a,key,slot_index,fingerprint,size)
+
+    return dataindex, entry
+
+def store(a,key,data,old=False):
+
+    db = a.db
+
+    slot_index, fingerprint = db.get_slot_index_and_fingerprint(key)
+
+    dataindex, _, position, distance = _find(a,key,slot_index,fingerprint,db.entry_header_size)
+
+    if dataindex is not None:
+
+        replaced = bytes(a._read_data(dataindex)) if old else None
+
+        a._update_counters()
+        a._write_data_at(dataindex,key,data,fingerprint=fingerprint)
+
+        return replaced
+
+    if _reserve(a,1): # Only new keys count towards the load factor
+
+        slot_index, fingerprint = db.get_slot_index_and_fingerprint(key)
+
+        _, _2, position, distance = _find(a,key,slot_index,fingerprint,db.entry_header_size)
+
+    _check_room(db,1)
+
+    collided, was_free = _insert(a,key,data,fingerprint,position,distance)
+
+    a._update_counters(entries=1,deleted=-was_free,collided=collided)
+
+    return None
+
+def remove(a,key):
+
+    """
+    Deletes the entry of ' key ' and returns its data. Like in the chained engine a missing key returns None if its home slot is empty
+    and raises ValueError otherwise.
+    """
+
+    slot_index, fingerprint = a.db.get_slot_index_and_fingerprint(key)
+
+    dataindex, _, position, distance = _find(a,key,slot_index,fingerprint,a.db.entry_header_size)
+
+    if dataindex is None:
+
+        if distance == 0: # Probing stopped right at the home slot, which only happens when it's empty (None: the table is full)
+
+            return None
+
+        raise ValueError("Couldn't find key that you were trying to delete")
+
+    removed = bytes(a._read_data(dataindex))
+
+    collided = _empty(a,position,distance)
+    a._free(dataindex)
+
+    a._update_counters(entries=-1,deleted=1,collided=collided)
+
+    return removed
+
+def load_many(a,keys):
+
+    db = a.db
+
+    found = {}
+
+    for (slot_index,fingerprint),key in sorted((db.get_slot_index_and_fingerprint(key),key) for key in keys):
+
+        dataindex, entry, _, _2 = _find(a,key,slot_index,fingerprint,db.entry_size)
+
+        if dataindex is not None:
+
+            found[key] = entry[db.entry_header_size:]
+
+    return found
+
+def _classify(a,compiled):
+
+    """
+    Returns (existing, new): (data index, fingerprint, key) of the keys of ' compiled ' that have an entry
+    and (slot index, fingerprint, key) of those that don't, in order of their home slot.
+    """
+
+    existing = []
+    new = []
+
+    for (slot_index,fingerprint),key in sorted((a.db.get_slot_index_and_fingerprint(key),key) for key in compiled):
+
+        dataindex, _, _2, _3 = _find(a,key,slot_index,fingerprint,a.db.entry_header_size)
+
+        if dataindex is None:
+
+            new.append((slot_index,fingerprint,key))
+
+        else:
+
+            existing.append((dataindex,fingerprint,key))
+
+    return existing, new
+
+def store_many(a,compiled,old=False):
+
+    """
+    Overwrites the existing entries in place and writes the new ones in one go (taking free entries first), then places the new
+    entries in the slot table in order of their home slot.
+    """
+
+    db = a.db
+
+    existing, new = _classify(a,compiled)
+
+    if _reserve(a,len(new)):
+
+        existing, new = _classify(a,compiled)
+
+    _check_room(db,len(new)) # Before anything is written
+
+    replaced = {}
+
+    for dataindex, fingerprint, key in existing:
+
+        if old:
+
+            replaced[key] = bytes(a._read_data(dataindex))
+
+        a._write_data_at(dataindex,key,compiled[key],fingerprint=fingerprint)
+
+    end_index = a._file_size()-db.data_location
+
+    dataindices = []
+    appended = []
+    deleted = 0
+
+    for _, fingerprint, key in new:
+
+        dataindex = a._pop_free()
+
+        if dataindex is not None:
+
+            a._write_data_at(dataindex,key,compiled[key],fingerprint=fingerprint)
+            deleted -= 1
+
+        else:
+
+            dataindex = end_index+len(appended)*db.entry_size
+            appended.append(a._entry_bytes(key,compiled[key],fingerprint=fingerprint))
+
+        dataindices.append(dataindex)
+
+    if appended:
+
+        a._write_at(db.data_location+end_index,b"".join(appended))
+
+    collided = 0
+
+    for (slot_index, fingerprint, key), dataindex in zip(new,dataindices):
+
+        _, _2, position, distance = _find(a,key,slot_index,fingerprint,db.entry_header_size) # The table changed since the first probe
+
+        collided += _insert(a,key,compiled[key],fingerprint,position,distance,dataindex)[0]
+
+    a._update_counters(len(new),deleted,collided)
+
+    return replaced
+
+def remove_many(a,keys):
+
+    db = a.db
+
+    removed = {}
+    collided = 0
+
+    for (slot_index,fingerprint),key in sorted((db.get_slot_index_and_fingerprint(key),key) for key in set(keys)):
+
+        dataindex, _, position, distance = _find(a,key,slot_index,fingerprint,db.entry_header_size)
+
+        if dataindex is None:
+
+            continue
+
+        removed[key] = bytes(a._read_data(dataindex))
+
+        collided += _empty(a,position,distance)
+        a._free(dataindex)
+
+    if removed:
+
+        a._update_counters(entries=-len(removed),deleted=len(removed),collided=collided)
+
+    return removed
+
+def count_collided(a):
+
+    """
+    Returns the amount of slots that aren't the home slot of their entry.
+    """
+
+    db = a.db
+
+    return sum(1 for position, slot in _probe(a,0) if slot[0] and _distance(db,position,slot[1+db.indexsize:]))
+
+def table_bytes(db,placements):
+
+    """
+    Returns (slot table, collided entries) of a table of ' db ' holding ' placements ',
+    a list of (fingerprint, data index).
+    """
+
+    table = [None]*db.slots # (distance, data index, fingerprint)
+
+    for fingerprint, dataindex in placements:
+
+        item = (0,dataindex,fingerprint)
+        position = _home(db,fingerprint)
+
+        while True:
+
+            current = table[position]
+
+            if current is None:
+
+                table[position] = item
+
+                break
+
+            if current[0] < item[0]:
+
+                table[position], item = item, current
+
+            item = (item[0]+1,item[1],item[2])
+            position = position+1 if position+1 < db.slots else 0
+
+    empty = b"\x00"*db._slotsize
+    occupied = b"\x01"
+
+    slots = b"".join(occupied+item[1].to_bytes(db.indexsize,'little')+item[2] if item is not None else empty for item in table)
+
+    return slots, sum(1 for item in table if item is not None and item[0])
+
+class TableFullError(Exception):
+
+    pass
@@ -0,0 +1,168 @@
+
+"""
+Parallel full scans of the data region.
+
+Every entry has the same size, so the data region is split into chunks of whole entries that a pool of workers
+reads with os.pread and decodes independently, the results are merged afterwards (in file order, or as chunks finish).
+Threads read in parallel (pread releases the GIL) but decode one at a time, processes decode in parallel too,
+at the cost of sending every result back and of needing a picklable find operator.
+"""
+
+import os
+import concurrent.futures
+
+from . import structure
+
+POOLS = ["thread","process"]
+
+MIN_CHUNK_BYTES = 256*1024
+
+_structures = {} # Structures by their compiled form, so each process only loads one once
+
+class ScanPlan:
+
+    """
+    Everything a worker needs to know to scan a part of the data region, without a reference to the database itself.
+    """
+
+    def __init__(self,db,end_pos):
+
+        self.location = db.location
+        self.struc = structure.compile_structure(db._struc_raw)
+
+        self.start_pos = db.data_location+1
+        self.end_pos = end_pos
+
+        self.entry_size = db.entry_size
+        self.indexsize = db.indexsize
+        self.key_length_offset = db._key_length_offset
+        self.key_offset = db._key_offset
+        self.entry_header_size = db.entry_header_size
+
+    def chunks(self,workers,max_rows):
+
+        """
+        Splits the data region into chunks of whole entries, a few per worker so they stay busy when chunks take uneven time.
+        """
+
+        entries = (self.end_pos-self.start_pos)//self.entry_size
+
+        rows = -(-entries//(workers*4)) if entries else 1
+        rows = min(max(rows,MIN_CHUNK_BYTES//self.entry_size,1),max_rows)
+
+        return [(self.start_pos+row*self.entry_size,self.start_pos+min(row+rows,entries)*self.entry_size) for row in range(0,entries,rows)]
+
+def _structure(bstruc):
+
+    struc = _structures.get(bstruc)
+
+    if struc is None:
+
+        struc = _structures[bstruc] = structure.load_structure(bstruc)
+
+    return struc
+
+def scan_chunk(plan,start,end,mode,query=None):
+
+    """
+    Scans the occupied entries between ' start ' and ' end '. ' mode ' is one of ' keys ', ' items ' (only decoding the fields
+    in ' query ' if it's set), ' raw ' (items with the compiled data) or ' find ', which returns the keys of the entries matching ' query ' = (field, operator, value).
+    """
+
+    struc = _structure(plan.struc)
+
+    fd = os.open(plan.location,os.O_RDONLY)
+
+    try:
+        data = memoryview(os.pread(fd,end-start,start))
+    finally:
+        os.close(fd)
+
+    entry_size = plan.entry_size
+    key_length_position = plan.key_length_offset
+    key_offset = plan.key_offset
+    header_size = plan.entry_header_size
+
+    o = []
+
+    run = [] # Keys of consecutive occupied entries, whole records are fetched a run at a time
+    run_start = run_end = 0
+
+    for pos in range(0,len(data)-entry_size+1,entry_size):
+
+        if not data[pos] & 1: # Not occupied
+
+            continue
+
+        key_r_len = int.from_bytes(data[pos+key_length_position:pos+key_offset],'little')
+        key = str(data[pos+key_offset:pos+key_offset+key_r_len],'ascii')
+
+        if mode == "keys":
+
+            o.append(key)
+
+        elif mode == "items" and query is None:
+
+            if run and pos != run_end:
+
+                o += zip(run,struc.fetch_many(data,len(run),entry_size,run_start+header_size))
+                run = []
+
+            if not run:
+                run_start = pos
+
+            run.append(key)
+            run_end = pos+entry_size
+
+        elif mode == "items":
+
+            o.append((key,struc.fetch_fields(query,data[pos+header_size:pos+entry_size])))
+
+        elif mode == "raw":
+
+            o.append((key,bytes(data[pos+header_size:pos+entry_size])))
+
+        else:
+
+            field, op, queryvalue = query
+
+            if op(struc.fetch_value(field,data[pos+header_size:pos+entry_size]),queryvalue):
+
+                o.append(key)
+
+    if run:
+
+        o += zip(run,struc.fetch_many(data,len(run),entry_size,run_start+header_size))
+
+    return o
+
+def _scan_chunk_task(task):
+
+    return scan_chunk(*task)
+
+def new_pool(kind,workers):
+
+    if kind not in POOLS:
+
+        raise ValueError(f"Unknown scan pool ' {kind} ', choose one of {', '.join(POOLS)}")
+
+    if kind == "thread":
+
+        return concurrent.futures.ThreadPoolExecutor(workers,thread_name_prefix="scan")
+
+    return concurrent.futures.ProcessPoolExecutor(workers)
+
+def scan(pool,plan,workers,mode,query=None,ordered=True,max_rows=65536):
+
+    """
+    Scans the whole data region of ' plan ' with ' pool ', returns an iterator of the results of each chunk (lists).
+    With ' ordered ' set the chunks come in file order, otherwise as soon as they are done.
+    """
+
+    tasks = [(plan,start,end,mode,query) for start,end in plan.chunks(workers,max_rows)]
+
+    if ordered:
+
+        return pool.map(_scan_chunk_task,tasks)
+
+    return (future.result() for future in concurrent.futures.as_completed([pool.submit(_scan_chunk_task,task) for task in tasks]))
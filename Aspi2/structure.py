@@ -1,11 +1,11 @@
 
 from . import datatypes
+from . import codec
 
 import json
 import io
 import math
 from inspect import getargs
-import bitarray
 from collections import OrderedDict
 
 def validate_structure(struc:tuple):
@@ -97,9 +97,13 @@ class Structure:
 
         self._value_offset_cache = {}
 
+        self._size = sum([len(do) for do in self.data])+self.nulmap_size
+
+        self.codec = codec.Codec(self,ValueCanNotBeNullError) # Generated once, does all compiling and fetching of whole records
+
     def __len__(self):
 
-        return sum([len(do) for do in self.data])+self.nulmap_size
+        return self._size
 
     def fetch_value_here(self,valuename,fileobj):
 
@@ -113,6 +117,14 @@ class Structure:
 
         return vdatatype.fetch(valuedata)
 
+    def fetch_value(self,valuename,sdata):
+
+        vdatatype = self.data[self.keys[valuename]]
+
+        offset = self.get_value_offset(valuename)
+
+        return vdatatype.fetch(sdata[offset:offset+len(vdatatype)])
+
     def get_value_offset(self,valuename):
 
         if valuename in self._value_offset_cache:
@@ -136,59 +148,149 @@ class Structure:
 
         return self.nulmap_size+lb
 
-    def compile(self,sdata):
+    def get_value_span(self,valuename):
 
-        nulmap = bitarray.bitarray("0" * len(self.data),endian="little")
-        d_out = b""
+        """
+        Returns (offset, size) of the value in compiled data.
+        """
 
-        for keyn,index in self.keys.items():
+        return self.get_value_offset(valuename), len(self.data[self.keys[valuename]])
+
+    def is_null(self,valuename,sdata):
+
+        index = self.keys[valuename]
+
+        return bool(sdata[index >> 3] >> (index & 7) & 1) # The null map is a little endian bitarray
+
+    def fetch_field(self,valuename,sdata):
+
+        """
+        Decodes a single value of compiled data, None if it's null.
+        """
 
-            if keyn not in sdata or sdata[keyn] is None:
+        if self.is_null(valuename,sdata):
 
-                if not self.nullables[index]:
+            if not self.nullables[self.keys[valuename]]:
 
-                    raise ValueCanNotBeNullError("Given data is missing a value that is not allowed to be null.")
+                raise ValueCanNotBeNullError("Value in fetched data is null but is not allowed to be null")
 
-                nulmap[index] = True
-                d_out += b"\x00"*len(self.data[index])
+            return None
 
-            else:
+        return self.fetch_value(valuename,sdata)
 
-                d_out += self.data[index].compile(sdata[keyn])
+    def fetch_fields(self,valuenames,sdata):
 
-        return nulmap.tobytes()+d_out
+        """
+        Decodes only the values in ' valuenames ', returns a dict like Structure.fetch.
+        """
+
+        return {valuename:self.fetch_field(valuename,sdata) for valuename in valuenames}
+
+    def compile(self,sdata):
+
+        return self.codec.pack(sdata)
 
     def fetch(self,sdata):
 
-        nulmap = bitarray.bitarray(endian='little')
-        nulmap.frombytes(sdata[:self.nulmap_size])
+        return self.codec.unpack(sdata)
 
-        d = {}
-        d_in = sdata[self.nulmap_size:]
+    def compile_many(self,records):
 
-        cur_cursor = 0
-        prev_cursor = 0
+        """
+        Compiles a list of records into one buffer, returns the compiled data of each.
+        """
 
-        for keyn,index in self.keys.items():
+        buf = memoryview(self.codec.pack_many(records))
+
+        return [bytes(buf[i:i+self._size]) for i in range(0,len(buf),self._size)]
+
+    def fetch_many(self,sdata,count=None,stride=None,offset=0):
+
+        """
+        Fetches ' count ' records (default: as many as fit) from a buffer of compiled records that start at ' offset ' and are ' stride ' bytes apart (default: the record size).
+        """
+
+        return self.codec.unpack_many(sdata,count,stride,offset)
+
+class RecordView:
+
+    """
+    Read-only record over its compiled data that decodes values when they are accessed, as items or attributes, and keeps them.
+    Compares equal to the dict Structure.fetch would return.
+    """
+
+    __slots__ = ("_structure","_data","_values")
+
+    def __init__(self,struc,sdata):
+
+        self._structure = struc
+        self._data = memoryview(sdata)
+        self._values = {}
+
+    def __getitem__(self,valuename):
+
+        if valuename in self._values:
+
+            return self._values[valuename]
+
+        if valuename not in self._structure.keys:
+
+            raise KeyError(valuename)
+
+        value = self._values[valuename] = self._structure.fetch_field(valuename,self._data)
+
+        return value
+
+    def __getattr__(self,valuename):
+
+        try:
+            return self[valuename]
+        except KeyError:
+            raise AttributeError(valuename) from None
+
+    def get(self,valuename,default=None):
+
+        return self[valuename] if valuename in self._structure.keys else default
+
+    def keys(self):
+
+        return self._structure.keys.keys()
+
+    def values(self):
+
+        return [self[valuename] for valuename in self._structure.keys]
+
+    def items(self):
+
+        return [(valuename,self[valuename]) for valuename in self._structure.keys]
+
+    def __iter__(self):
+
+        return iter(self._structure.keys)
+
+    def __len__(self):
+
+        return len(self._structure.keys)
+
+    def __contains__(self,valuename):
+
+        return valuename in self._structure.keys
+
+    def to_dict(self):
 
-            if nulmap[index]:
+        return dict(self.items())
 
-                if not self.nullables[index]:
+    def __eq__(self,other):
 
-                    raise ValueCanNotBeNullError("Value in fetched data is null but is not allowed to be null")
+        if isinstance(other,RecordView):
 
-                d[keyn] = None
-                continue
+            other = other.to_dict()
 
-            datatype = self.data[index]
-            read_len = len(datatype)
+        return self.to_dict() == other
 
-            cur_cursor += read_len
-            valuedata = d_in[prev_cursor:cur_cursor]
-            prev_cursor = cur_cursor
-            d[keyn] = datatype.fetch(valuedata)
+    def __repr__(self):
 
-        return d
+        return f"RecordView({', '.join(f'{valuename}=...' if valuename not in self._values else f'{valuename}={self._values[valuename]!r}' for valuename in self._structure.keys)})"
 
 class UnknownDatatypeError(Exception):
 
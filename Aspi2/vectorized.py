@@ -0,0 +1,218 @@
+
+"""
+Vectorized scans of the data region with NumPy.
+
+Every entry has the same size, so the data region is mapped as an array of a structured dtype generated from the
+database structure. Built-in find operators are evaluated as masks over whole chunks of entries at once.
+Queries that can't be expressed as a mask (callables, ' contains ', ' endswith ', values of the wrong type, ...)
+return None from find_keys and are left to the regular per-entry scan.
+"""
+
+import os
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import datatypes
+from . import find_operators
+
+COMPARISONS = {
+
+    find_operators.equal: lambda column,value: column == value,
+    find_operators.notequal: lambda column,value: column != value,
+    find_operators.lessthan: lambda column,value: column < value,
+    find_operators.greaterthan: lambda column,value: column > value,
+    find_operators.lessthanequal: lambda column,value: column <= value,
+    find_operators.greaterthanequal: lambda column,value: column >= value
+
+}
+
+STRING_ENCODINGS = {
+
+    datatypes.ASCIIString:'ascii',
+    datatypes.UnicodeString:'utf-8'
+
+}
+
+def available():
+
+    return numpy is not None
+
+def _field_format(datatype):
+
+    if type(datatype) in [datatypes.IntUnsigned,datatypes.IntSigned] and datatype.bytesize in [1,2,4,8]:
+
+        return f"<{'u' if type(datatype) is datatypes.IntUnsigned else 'i'}{datatype.bytesize}"
+
+    return f"V{len(datatype)}"
+
+def record_dtype(db):
+
+    names = ["occupance","collider","key_length","key"]
+    formats = ["u1",f"V{db.indexsize}",f"V{db.keysize_bytesize}",f"V{db.keysize}"]
+    offsets = [0,1,db._key_length_offset,db._key_offset]
+
+    for keyname,index in db.structure.keys.items():
+
+        names.append(f"field_{keyname}")
+        formats.append(_field_format(db.structure.data[index]))
+        offsets.append(db.entry_header_size+db.structure.get_value_offset(keyname))
+
+    return numpy.dtype({"names":names,"formats":formats,"offsets":offsets,"itemsize":db.entry_size})
+
+def _numeric_mask(field,datatype,op,queryvalue):
+
+    info = numpy.iinfo(_field_format(datatype))
+
+    def fits(value):
+
+        return type(value) is int and info.min <= value <= info.max
+
+    if op in COMPARISONS and fits(queryvalue):
+
+        compare = COMPARISONS[op]
+
+        return lambda chunk,raw: compare(chunk[field],queryvalue)
+
+    if op is find_operators.asp_in and type(queryvalue) in [list,tuple,set,frozenset] and all(fits(value) for value in queryvalue):
+
+        values = numpy.array(list(queryvalue),dtype=info.dtype)
+
+        return lambda chunk,raw: numpy.isin(chunk[field],values)
+
+    return None
+
+def _raw_mask(start,datatype,op,queryvalue):
+
+    size = len(datatype)
+    end = start+size
+
+    def encode(value):
+
+        try:
+            b = datatype.compile(value)
+        except (ValueError,TypeError,AttributeError,OverflowError,UnicodeEncodeError):
+            return None
+
+        return b if len(b) == size else None
+
+    def column(raw):
+
+        # Equal length byte strings are equal exactly when they are equal without trailing nulls, so the ' S ' view is exact
+        return numpy.ascontiguousarray(raw[:,start:end]).view(f"S{size}").ravel()
+
+    if op in [find_operators.equal,find_operators.notequal]:
+
+        b = encode(queryvalue)
+
+        if b is None:
+            return None
+
+        if op is find_operators.equal:
+            return lambda chunk,raw: column(raw) == b
+
+        return lambda chunk,raw: column(raw) != b
+
+    if op is find_operators.asp_in and type(queryvalue) in [list,tuple,set,frozenset]:
+
+        encoded = [encode(value) for value in queryvalue]
+
+        if None in encoded:
+            return None
+
+        values = numpy.array(encoded,dtype=f"S{size}")
+
+        return lambda chunk,raw: numpy.isin(column(raw),values)
+
+    if op is find_operators.startswith and type(datatype) in STRING_ENCODINGS and type(queryvalue) is str:
+
+        try:
+            prefix = queryvalue.encode(STRING_ENCODINGS[type(datatype)])
+        except UnicodeEncodeError:
+            return None
+
+        lenbytes = datatype._lenbytesize
+
+        if len(prefix) > size-lenbytes:
+            return lambda chunk,raw: numpy.zeros(len(raw),dtype=bool)
+
+        expected = numpy.frombuffer(prefix,dtype=numpy.uint8)
+
+        def mask(chunk,raw):
+
+            lengths = numpy.zeros(len(raw),dtype=numpy.uint64)
+
+            for i in range(lenbytes):
+
+                lengths |= raw[:,start+i].astype(numpy.uint64) << numpy.uint64(8*i)
+
+            return (lengths >= len(prefix)) & (raw[:,start+lenbytes:start+lenbytes+len(prefix)] == expected).all(axis=1)
+
+        return mask
+
+    return None
+
+def compile_query(db,entryvalue,op,queryvalue):
+
+    """
+    Returns a function (chunk, raw) -> boolean mask for the query, or None if it can't be vectorized.
+    ' chunk ' is a slice of the structured record array, ' raw ' the same rows as a 2D uint8 array.
+    """
+
+    v_offset = db.structure.get_value_offset(entryvalue)
+
+    if numpy is None or not isinstance(op,type(find_operators.equal)):
+
+        return None
+
+    datatype = db.structure.data[db.structure.keys[entryvalue]]
+
+    if type(datatype) in [datatypes.IntUnsigned,datatypes.IntSigned] and _field_format(datatype)[0] == "<":
+
+        return _numeric_mask(f"field_{entryvalue}",datatype,op,queryvalue)
+
+    if type(datatype) in [datatypes.Bytes,datatypes.FixedBytes,datatypes.ASCIIString,datatypes.UnicodeString,datatypes.IntUnsigned,datatypes.IntSigned]:
+
+        return _raw_mask(db.entry_header_size+v_offset,datatype,op,queryvalue)
+
+    return None
+
+def find_keys(db,entryvalue,op,queryvalue,chunk_rows=65536):
+
+    """
+    Returns a generator of the keys of all occupied entries matching the query, in file order,
+    or None if the query can't be vectorized.
+    """
+
+    mask = compile_query(db,entryvalue,op,queryvalue)
+
+    if mask is None:
+
+        return None
+
+    return _matching_keys(db,mask,chunk_rows)
+
+def _matching_keys(db,mask,chunk_rows):
+
+    count = (os.path.getsize(db.location)-db.data_location-1)//db.entry_size
+
+    if count <= 0:
+
+        return
+
+    records = numpy.memmap(db.location,dtype=record_dtype(db),mode="r",offset=db.data_location+1,shape=(count,))
+
+    for start in range(0,count,chunk_rows):
+
+        chunk = records[start:start+chunk_rows]
+        raw = chunk.view(numpy.uint8).reshape(len(chunk),db.entry_size)
+
+        matches = numpy.isin(chunk["occupance"],[1,3]) & mask(chunk,raw) # OCCUPANCE_OCCUPIED, OCCUPANCE_OCCUPIED_COLLIDED
+
+        for row in numpy.flatnonzero(matches):
+
+            key_length = int.from_bytes(raw[row,db._key_length_offset:db._key_offset].tobytes(),'little')
+
+            yield raw[row,db._key_offset:db._key_offset+key_length].tobytes().decode('ascii')
@@ -0,0 +1,356 @@
+
+"""
+Write-ahead log for a database file.
+
+While the log is enabled, writes never go to the database file directly. They are kept as dirty pages in memory
+(so reads see them) and appended to the log when the operation commits. A checkpoint writes the dirty pages to the
+database file, syncs it and empties the log. Opening a database replays all complete commits of a leftover log.
+
+A commit in the log is: payload length (4B) | crc32 of the payload (4B) | payload,
+the payload being a sequence of: position (8B) | size (4B) | data.
+Commits are full images of the written bytes, so replaying a commit twice is harmless.
+"""
+
+import os
+import zlib
+import threading
+
+PAGE_SIZE = 4096
+
+DURABILITY_LEVELS = ["none","flush","fsync","group"]
+
+def log_path(location):
+
+    return location+".aspwal"
+
+def fsync_path(path):
+
+    fd = os.open(path,os.O_RDONLY)
+
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class PageBuffer:
+
+    """
+    Dirty pages of a file kept in memory, on top of the file read with ' read_base(position, size) ' of size ' base_size '.
+    """
+
+    def __init__(self,read_base,base_size):
+
+        self._read_base = read_base
+        self.base_size = base_size
+
+        self.pages = {}
+        self.end = 0
+
+    def __len__(self):
+
+        return len(self.pages)
+
+    def clear(self):
+
+        self.pages = {}
+        self.end = 0
+
+    def size(self):
+
+        return max(self.base_size,self.end)
+
+    def write(self,position,data):
+
+        end = position+len(data)
+        self.end = max(self.end,end)
+
+        offset = 0
+
+        while position < end:
+
+            page_number, page_position = divmod(position,PAGE_SIZE)
+
+            page = self.pages.get(page_number)
+
+            if page is None:
+
+                page = bytearray(self._read_base(page_number*PAGE_SIZE,PAGE_SIZE).ljust(PAGE_SIZE,b"\x00"))
+                self.pages[page_number] = page
+
+            n = min(PAGE_SIZE-page_position,end-position)
+
+            page[page_position:page_position+n] = data[offset:offset+n]
+
+            position += n
+            offset += n
+
+    def read(self,position,size):
+
+        """
+        Returns the bytes at ' position ' with the dirty pages applied, or None if none of them are dirty.
+        """
+
+        first, page_position = divmod(position,PAGE_SIZE)
+        last = (position+size-1)//PAGE_SIZE
+
+        if first == last:
+
+            page = self.pages.get(first)
+
+            if page is None:
+
+                return None
+
+            return bytes(page[page_position:page_position+max(min(size,self.size()-position),0)])
+
+        if not any(page_number in self.pages for page_number in range(first,last+1)):
+
+            return None
+
+        size = max(min(size,self.size()-position),0)
+
+        o = bytearray(self._read_base(position,size).ljust(size,b"\x00"))
+
+        for page_number in range(first,last+1):
+
+            page = self.pages.get(page_number)
+
+            if page is None:
+
+                continue
+
+            start = max(position,page_number*PAGE_SIZE)
+            stop = min(position+size,(page_number+1)*PAGE_SIZE)
+
+            o[start-position:stop-position] = page[start-page_number*PAGE_SIZE:stop-page_number*PAGE_SIZE]
+
+        return bytes(o)
+
+    def flush_to(self,fd):
+
+        """
+        Writes all dirty pages to ' fd ' in order of their position, the last one cut off at the end of the data.
+        """
+
+        size = self.size()
+
+        for page_number in sorted(self.pages):
+
+            position = page_number*PAGE_SIZE
+
+            os.pwrite(fd,self.pages[page_number][:size-position],position)
+
+class GroupCommit:
+
+    """
+    Syncs the file at ' path ' from a daemon thread, at most every ' interval ' seconds and only when commits were marked since the last sync.
+    """
+
+    def __init__(self,path,interval):
+
+        self.path = path
+        self.interval = interval
+
+        self._pending = False
+        self._stop = threading.Event()
+
+        self._thread = threading.Thread(target=self._run,name=f"group-commit {path}",daemon=True)
+        self._thread.start()
+
+    def mark(self):
+
+        self._pending = True
+
+    def sync(self):
+
+        if self._pending:
+
+            self._pending = False # Cleared before syncing, commits marked during the sync get the next one
+            fsync_path(self.path)
+
+    def _run(self):
+
+        while not self._stop.wait(self.interval):
+
+            self.sync()
+
+    def close(self):
+
+        self._stop.set()
+        self._thread.join()
+        self.sync()
+
+class WriteAheadLog:
+
+    def __init__(self,location,durability="flush",group_commit_ms=10):
+
+        if durability not in DURABILITY_LEVELS:
+
+            raise ValueError(f"Unknown durability level ' {durability} ', choose one of {', '.join(DURABILITY_LEVELS)}")
+
+        self.location = location
+        self.path = log_path(location)
+        self.durability = durability
+
+        self._db_fd = os.open(location,os.O_RDWR)
+        self._fd = os.open(self.path,os.O_RDWR|os.O_CREAT|os.O_APPEND)
+
+        self.pages = PageBuffer(self._read_db,os.fstat(self._db_fd).st_size)
+        self.pending = []
+
+        self.logged_bytes = os.fstat(self._fd).st_size
+
+        self.group_commit = GroupCommit(self.path,group_commit_ms/1000) if durability == "group" else None
+
+    def _read_db(self,position,size):
+
+        return os.pread(self._db_fd,size,position)
+
+    @property
+    def size(self):
+
+        """
+        Bytes held by the log, on disk or in memory, whichever is more.
+        """
+
+        return max(self.logged_bytes,len(self.pages)*PAGE_SIZE)
+
+    def write(self,position,data):
+
+        data = bytes(data)
+
+        self.pages.write(position,data)
+        self.pending.append((position,data))
+
+    def commit(self):
+
+        if not self.pending:
+
+            return
+
+        payload = b"".join(position.to_bytes(8,'little')+len(data).to_bytes(4,'little')+data for position,data in self.pending)
+
+        self.pending = []
+
+        record = len(payload).to_bytes(4,'little')+zlib.crc32(payload).to_bytes(4,'little')+payload
+
+        os.write(self._fd,record)
+        self.logged_bytes += len(record)
+
+        if self.durability == "fsync":
+
+            os.fsync(self._fd)
+
+        elif self.durability == "group":
+
+            self.group_commit.mark()
+
+    def checkpoint(self):
+
+        """
+        Writes all dirty pages to the database file and empties the log. The log is synced first,
+        so a crash at any point leaves either the old log to replay or an up to date database file.
+        """
+
+        self.commit()
+
+        if not self.pages:
+
+            return
+
+        if self.durability != "none":
+
+            os.fsync(self._fd)
+
+        self.pages.flush_to(self._db_fd)
+        self.pages.base_size = self.pages.size()
+
+        if self.durability != "none":
+
+            os.fsync(self._db_fd)
+
+        os.ftruncate(self._fd,0)
+
+        self.logged_bytes = 0
+        self.pages.clear()
+
+    def reopen(self):
+
+        """
+        Reopens the database file after it was replaced, the log has to be checkpointed before.
+        """
+
+        os.close(self._db_fd)
+        self._db_fd = os.open(self.location,os.O_RDWR)
+
+        self.pages.base_size = os.fstat(self._db_fd).st_size
+
+    def close(self):
+
+        self.checkpoint()
+
+        if self.group_commit is not None:
+
+            self.group_commit.close()
+
+        os.close(self._fd)
+        os.close(self._db_fd)
+
+        os.remove(self.path)
+
+def recover(location):
+
+    """
+    Applies all complete commits of the log of the database at ' location ' to the database file and removes the log.
+    A torn commit at the end of the log (crash while appending) is dropped. Returns the amount of replayed commits.
+    """
+
+    path = log_path(location)
+
+    if not os.path.isfile(path):
+
+        return 0
+
+    with open(path,"rb") as f:
+
+        b = f.read()
+
+    commits = 0
+    cursor = 0
+
+    fd = os.open(location,os.O_RDWR)
+
+    try:
+
+        while cursor+8 <= len(b):
+
+            length = int.from_bytes(b[cursor:cursor+4],'little')
+            payload = b[cursor+8:cursor+8+length]
+
+            if len(payload) != length or zlib.crc32(payload) != int.from_bytes(b[cursor+4:cursor+8],'little'):
+
+                break
+
+            p = 0
+
+            while p < length:
+
+                position = int.from_bytes(payload[p:p+8],'little')
+                size = int.from_bytes(payload[p+8:p+12],'little')
+
+                os.pwrite(fd,payload[p+12:p+12+size],position)
+
+                p += 12+size
+
+            commits += 1
+            cursor += 8+length
+
+        os.fsync(fd)
+
+    finally:
+
+        os.close(fd)
+
+    os.remove(path)
+
+    return commits
@@ -0,0 +1,13 @@
+
+"""
+Benchmarks of every hot path of Aspi2.
+
+    python -m benchmarks run --sizes 1000,100000 --distributions uniform,zipf --widths narrow,wide --output results.json
+    python -m benchmarks compare baseline.json results.json --threshold 0.1
+    python -m benchmarks run --build '{"engine":"open_addressing"}' --output open_addressing.json
+
+' run ' builds a database per table size and structure width, times every operation (see benchmarks.suite) for each
+key distribution and writes the results as JSON. ' compare ' flags every benchmark that got slower than the threshold
+against a baseline and exits with 1 if any did. ' --build ' passes options to build(), so comparing the results of two runs
+compares file layouts, like the chained and the open addressing engine.
+"""
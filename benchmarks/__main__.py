@@ -0,0 +1,99 @@
+
+import sys
+import json
+import argparse
+import tempfile
+
+from . import suite
+from . import compare
+from . import workloads
+
+def _list(value):
+
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def _sizes(value):
+
+    return [int(float(item)) for item in _list(value)] # Accepts 1e6
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",description="Benchmarks of Aspi2")
+    commands = parser.add_subparsers(dest="command",required=True)
+
+    run_parser = commands.add_parser("run",help="Run the benchmarks and write the results as JSON")
+    run_parser.add_argument("--sizes",type=_sizes,default=[1000,10000],help="Comma separated table sizes, like 1e3,1e5,1e7")
+    run_parser.add_argument("--widths",type=_list,default=["narrow","medium"],help=f"Comma separated structure widths: {', '.join(workloads.WIDTHS)}")
+    run_parser.add_argument("--distributions",type=_list,default=["uniform","zipf"],help=f"Comma separated key distributions: {', '.join(workloads.DISTRIBUTIONS)}")
+    run_parser.add_argument("--ops",type=int,default=10000,help="Operations per run of a benchmark (scans run once)")
+    run_parser.add_argument("--repeat",type=int,default=3,help="Runs per benchmark, the fastest one counts")
+    run_parser.add_argument("--only",type=_list,default=None,help=f"Comma separated benchmarks to run: {', '.join(benchmark.__name__ for benchmark in suite.BENCHMARKS)}")
+    run_parser.add_argument("--config",type=json.loads,default=None,help="Database config as JSON, like '{\"cache_mode\":\"raw\"}'")
+    run_parser.add_argument("--build",type=json.loads,default=None,help="Options for build() as JSON, like '{\"fingerprint_size\":8}'")
+    run_parser.add_argument("--directory",default=None,help="Where to put the databases (default: a temporary directory)")
+    run_parser.add_argument("--output","-o",default=None,help="JSON file to write the results to (default: stdout)")
+
+    compare_parser = commands.add_parser("compare",help="Compare results against a baseline, exits with 1 on regressions")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold",type=float,default=0.1,help="Relative slowdown that counts as a regression (default: 0.1)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+
+        for width in args.widths:
+
+            if width not in workloads.WIDTHS:
+
+                parser.error(f"Unknown width ' {width} '")
+
+        progress = lambda line: print(line,file=sys.stderr)
+
+        if args.directory is None:
+
+            with tempfile.TemporaryDirectory(prefix="aspi-bench-") as directory:
+
+                results = suite.run(directory,args.sizes,args.widths,args.distributions,args.ops,args.repeat,args.only,args.config,progress,args.build)
+
+        else:
+
+            results = suite.run(args.directory,args.sizes,args.widths,args.distributions,args.ops,args.repeat,args.only,args.config,progress,args.build)
+
+        if args.output is None:
+
+            json.dump(results,sys.stdout,indent=1)
+
+        else:
+
+            with open(args.output,"w") as f:
+
+                json.dump(results,f,indent=1)
+
+        return 0
+
+    with open(args.baseline) as f:
+
+        baseline = json.load(f)
+
+    with open(args.current) as f:
+
+        current = json.load(f)
+
+    rows = compare.compare(baseline,current,args.threshold)
+
+    print(compare.format_comparison(rows))
+
+    regressions = [row for row in rows if row[4] == "regression"]
+
+    if regressions:
+
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+
+    sys.exit(main())
@@ -0,0 +1,60 @@
+
+"""
+Compares benchmark results against a baseline.
+"""
+
+def _key(result):
+
+    return (result["name"],result["size"],result["width"],result["distribution"])
+
+def compare(baseline,current,threshold=0.1):
+
+    """
+    Returns a list of (result key, baseline ns/op, current ns/op, ratio, verdict) for every benchmark in ' current ',
+    the verdict being ' regression ' if it got slower by more than ' threshold ' (0.1 = 10%), ' improvement ' if it got
+    faster by more than that, ' ok ' otherwise or ' new ' if the baseline doesn't have it.
+    """
+
+    base = {_key(result):result for result in baseline["results"]}
+
+    o = []
+
+    for result in current["results"]:
+
+        key = _key(result)
+
+        if key not in base:
+
+            o.append((key,None,result["ns_per_op"],None,"new"))
+            continue
+
+        ratio = result["ns_per_op"]/base[key]["ns_per_op"] if base[key]["ns_per_op"] else float("inf")
+
+        if ratio > 1+threshold:
+
+            verdict = "regression"
+
+        elif ratio < 1-threshold:
+
+            verdict = "improvement"
+
+        else:
+
+            verdict = "ok"
+
+        o.append((key,base[key]["ns_per_op"],result["ns_per_op"],ratio,verdict))
+
+    return o
+
+def format_comparison(rows):
+
+    lines = [f"{'benchmark':24} {'size':>9} {'width':>7} {'dist':>8} {'base us':>11} {'now us':>11} {'ratio':>7}  verdict"]
+
+    for (name,size,width,distribution),base,now,ratio,verdict in rows:
+
+        base = f"{base/1000:11.2f}" if base is not None else f"{'-':>11}"
+        ratio = f"{ratio:7.2f}" if ratio is not None else f"{'-':>7}"
+
+        lines.append(f"{name:24} {size:>9} {width:>7} {distribution:>8} {base} {now/1000:11.2f} {ratio}  {verdict.upper() if verdict == 'regression' else verdict}")
+
+    return "\n".join(lines)
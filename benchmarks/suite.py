@@ -0,0 +1,358 @@
+
+"""
+The benchmarks. Each one is a function that runs operations against the database of a Context and returns how many it ran.
+Reads run first, then writes, then maintenance (backup, rescale, reopening), so every benchmark sees a full table.
+"""
+
+import os
+import time
+import shutil
+import platform
+import statistics
+
+from Aspi2 import VERSION
+from Aspi2 import database
+from Aspi2 import find_operators
+
+from . import workloads
+
+BATCH_SIZE = 100
+
+FIND_QUERIES = {
+
+    find_operators.equal:("age",500),
+    find_operators.notequal:("age",500),
+    find_operators.lessthan:("age",100),
+    find_operators.greaterthan:("age",900),
+    find_operators.lessthanequal:("age",100),
+    find_operators.greaterthanequal:("age",900),
+    find_operators.asp_in:("age",[1,2,3,500]),
+    find_operators.contains:("firstname","ab"),
+    find_operators.startswith:("firstname","ab"),
+    find_operators.endswith:("firstname","ab")
+
+}
+
+class Context:
+
+    def __init__(self,location,size,width,distribution,ops,db_config):
+
+        self.location = location
+        self.size = size
+        self.width = width
+        self.distribution = distribution
+        self.ops = ops
+        self.db_config = db_config
+
+        self.chooser = workloads.KeyChooser(distribution,size)
+
+        self.next_new = size # Index of the next key that isn't in the table
+        self.next_delete = 0 # Index of the next key to delete
+
+        self.db = None
+        self.accessor = None
+
+    def open(self):
+
+        self.db = database.Database(self.location,self.db_config)
+        self.accessor = database.Accessor(self.db)
+
+    def close(self):
+
+        self.db.close()
+
+        self.db = None
+        self.accessor = None
+
+    def new_keys(self,amount):
+
+        keys = [workloads.key(i) for i in range(self.next_new,self.next_new+amount)]
+        self.next_new += amount
+
+        return keys
+
+    def keys_to_delete(self,amount):
+
+        keys = [workloads.key(i) for i in range(self.next_delete,self.next_delete+amount)]
+        self.next_delete += amount
+
+        return keys
+
+def populate(location,size,width,db_config,build_options=None):
+
+    database.build(location,"Bench",workloads.WIDTHS[width],max(size,1),**(build_options or {}))
+
+    db = database.Database(location,db_config)
+    db_accessor = database.Accessor(db)
+
+    for start in range(0,size,10000):
+
+        db_accessor.set_many({workloads.key(i):workloads.record(width,i) for i in range(start,min(start+10000,size))})
+
+    db.close()
+
+def get_hit(ctx):
+
+    for key in ctx.chooser.keys(ctx.ops):
+
+        ctx.accessor.get(key)
+
+    return ctx.ops
+
+def get_miss(ctx):
+
+    for i in range(ctx.ops):
+
+        ctx.accessor.get(f"missing{i}")
+
+    return ctx.ops
+
+def has_hit(ctx):
+
+    for key in ctx.chooser.keys(ctx.ops):
+
+        ctx.accessor.has(key)
+
+    return ctx.ops
+
+def has_miss(ctx):
+
+    for i in range(ctx.ops):
+
+        ctx.accessor.has(f"missing{i}")
+
+    return ctx.ops
+
+def get_many(ctx):
+
+    for _ in range(max(ctx.ops//BATCH_SIZE,1)):
+
+        ctx.accessor.get_many(ctx.chooser.keys(BATCH_SIZE))
+
+    return max(ctx.ops//BATCH_SIZE,1)*BATCH_SIZE
+
+def find_benchmark(op):
+
+    entryvalue, queryvalue = FIND_QUERIES[op]
+
+    def find(ctx):
+
+        ctx.accessor.find(entryvalue,op,queryvalue)
+
+        return 1
+
+    find.__name__ = f"find_{op.__name__}"
+
+    return find
+
+def keys_scan(ctx):
+
+    for _ in ctx.accessor.keys():
+
+        pass
+
+    return 1
+
+def items_scan(ctx):
+
+    for _ in ctx.accessor.items():
+
+        pass
+
+    return 1
+
+def length(ctx):
+
+    for _ in range(ctx.ops):
+
+        len(ctx.accessor)
+
+    return ctx.ops
+
+def health(ctx):
+
+    for _ in range(ctx.ops):
+
+        ctx.accessor.health
+
+    return ctx.ops
+
+def set_update(ctx):
+
+    for key in ctx.chooser.keys(ctx.ops):
+
+        ctx.accessor.set(key,workloads.record(ctx.width,0))
+
+    return ctx.ops
+
+def set_new(ctx):
+
+    value = workloads.record(ctx.width,0)
+
+    for key in ctx.new_keys(ctx.ops):
+
+        ctx.accessor.set(key,value)
+
+    return ctx.ops
+
+def delete_hit(ctx):
+
+    amount = min(ctx.ops,ctx.size//4)
+
+    for key in ctx.keys_to_delete(amount):
+
+        ctx.accessor.delete(key)
+
+    return amount
+
+def delete_miss(ctx):
+
+    for i in range(ctx.ops):
+
+        try:
+            ctx.accessor.delete(f"missing{i}")
+        except ValueError: # Deleting a missing key raises
+            pass
+
+    return ctx.ops
+
+def set_many(ctx):
+
+    value = workloads.record(ctx.width,0)
+
+    for _ in range(max(ctx.ops//BATCH_SIZE,1)):
+
+        ctx.accessor.set_many({key:value for key in ctx.new_keys(BATCH_SIZE)})
+
+    return max(ctx.ops//BATCH_SIZE,1)*BATCH_SIZE
+
+def delete_many(ctx):
+
+    batches = max(min(ctx.ops,ctx.size//4)//BATCH_SIZE,1)
+
+    for _ in range(batches):
+
+        ctx.accessor.delete_many(ctx.keys_to_delete(BATCH_SIZE))
+
+    return batches*BATCH_SIZE
+
+def backup(ctx):
+
+    ctx.db.backup("benchmark")
+
+    return 1
+
+def rescale(ctx):
+
+    ctx.db.rescale(max(len(ctx.db)*2,1))
+
+    return 1
+
+def open_database(ctx):
+
+    ctx.close()
+    ctx.open()
+
+    return 1
+
+READS = [get_hit,get_miss,has_hit,has_miss,get_many]+[find_benchmark(op) for op in FIND_QUERIES]+[keys_scan,items_scan,length,health]
+
+WRITES = [set_update,set_new,delete_hit,delete_miss,set_many,delete_many]
+
+MAINTENANCE = [backup,rescale,open_database]
+
+BENCHMARKS = READS+WRITES+MAINTENANCE
+
+def time_benchmark(benchmark,ctx,repeat):
+
+    """
+    Runs ' benchmark ' ' repeat ' times, returns the amount of operations of a run and the seconds each run took.
+    """
+
+    timings = []
+
+    for _ in range(repeat):
+
+        start = time.perf_counter()
+        ops = benchmark(ctx)
+        timings.append(time.perf_counter()-start)
+
+    return ops, timings
+
+def run(directory,sizes,widths,distributions,ops=10000,repeat=3,only=None,db_config=None,progress=print,build_options=None):
+
+    """
+    Runs the benchmarks (all, or those named in ' only ') for every table size, structure width and key distribution.
+    ' build_options ' are passed on to build(), to compare file layouts.
+    Returns the results as a JSON serialisable dict.
+    """
+
+    db_config = {"logger_enabled":False,"rescale_backups":False,"backup_directory":os.path.join(directory,"backups"),**(db_config or {})}
+
+    benchmarks = [benchmark for benchmark in BENCHMARKS if only is None or benchmark.__name__ in only]
+
+    results = []
+
+    for width in widths:
+
+        for size in sizes:
+
+            populated = os.path.join(directory,f"populated_{width}_{size}.asp2")
+
+            progress(f"Populating {size} {width} records")
+            populate(populated,size,width,db_config,build_options)
+
+            for distribution in distributions:
+
+                location = os.path.join(directory,f"bench_{width}_{size}.asp2")
+                shutil.copyfile(populated,location)
+
+                ctx = Context(location,size,width,distribution,ops,db_config)
+                ctx.open()
+
+                for benchmark in benchmarks:
+
+                    n, timings = time_benchmark(benchmark,ctx,repeat)
+
+                    result = {
+
+                        "name":benchmark.__name__,
+                        "size":size,
+                        "width":width,
+                        "distribution":distribution,
+                        "ops":n,
+                        "seconds":timings,
+                        "ns_per_op":min(timings)/n*1e9,
+                        "median_ns_per_op":statistics.median(timings)/n*1e9
+
+                    }
+
+                    results.append(result)
+
+                    progress(f"{benchmark.__name__:24} {size:>9} {width:>7} {distribution:>8} {result['ns_per_op']/1000:12.2f} us/op")
+
+                ctx.close()
+
+                os.remove(location)
+
+            os.remove(populated)
+
+    return {
+
+        "meta":{
+
+            "aspi_version":VERSION,
+            "python":platform.python_version(),
+            "platform":platform.platform(),
+            "cpus":os.cpu_count(),
+            "time":time.time(),
+            "ops":ops,
+            "repeat":repeat,
+            "db_config":db_config,
+            "build_options":build_options or {}
+
+        },
+
+        "results":results
+
+    }
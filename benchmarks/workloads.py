@@ -0,0 +1,79 @@
+
+"""
+Structures, records and key distributions the benchmarks run with.
+"""
+
+import bisect
+import itertools
+import random
+
+WIDTHS = {
+
+    "narrow":(("firstname","UnicodeString",{"size":16},False),("age","IntUnsigned",{"size":2},True)),
+
+    "medium":(("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("email","ASCIIString",{"size":100},True),("age","IntUnsigned",{"size":2},True),("id","IntUnsigned",{"size":8},False)),
+
+    "wide":(("firstname","UnicodeString",{"size":64},False),("bio","UnicodeString",{"size":1024},True),("notes","UnicodeString",{"size":1024},True),("avatar","Bytes",{"size":2048},True),("age","IntUnsigned",{"size":2},True))
+
+}
+
+DISTRIBUTIONS = ["uniform","zipf"]
+
+def key(i):
+
+    return f"key{i}"
+
+def record(width,i):
+
+    """
+    The record stored under key(i), every field filled.
+    """
+
+    rnd = random.Random(i)
+
+    name = "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(3,12)))
+
+    if width == "narrow":
+
+        return {"firstname":name,"age":i%1000}
+
+    if width == "medium":
+
+        return {"firstname":name,"lastname":name[::-1],"email":f"{name}@example.com","age":i%1000,"id":i}
+
+    return {"firstname":name,"bio":name*60,"notes":"é"*500,"avatar":bytes(rnd.randrange(256) for _ in range(64))*16,"age":i%1000}
+
+class KeyChooser:
+
+    """
+    Picks indices of existing keys, uniformly or following a Zipf distribution (index 0 the most popular, ' s ' the exponent).
+    """
+
+    def __init__(self,distribution,size,seed=0,s=1.1):
+
+        if distribution not in DISTRIBUTIONS:
+
+            raise ValueError(f"Unknown key distribution ' {distribution} ', choose one of {', '.join(DISTRIBUTIONS)}")
+
+        self.distribution = distribution
+        self.size = size
+
+        self._random = random.Random(seed)
+
+        if distribution == "zipf":
+
+            self._cumulative = list(itertools.accumulate(1/(rank+1)**s for rank in range(size)))
+            self._permutation = list(range(size))
+            self._random.shuffle(self._permutation) # Popular keys spread over the whole table
+
+    def index(self):
+
+        if self.distribution == "uniform":
+
+            return self._random.randrange(self.size)
+
+        return self._permutation[bisect.bisect_left(self._cumulative,self._random.random()*self._cumulative[-1])]
+
+    def keys(self,amount):
+
+        return [key(self.index()) for _ in range(amount)]
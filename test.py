@@ -1,7 +1,20 @@
 from Aspi2 import database
-
+from Aspi2 import aio
+from Aspi2 import metrics
+from Aspi2 import hashing
+from Aspi2 import caching
+from Aspi2 import vectorized
+from Aspi2 import open_addressing
+from benchmarks import suite
+from benchmarks import compare
+
+import asyncio
 import threading
+import multiprocessing
+import os
 import random
+import shutil
+import json
 
 def test():
 
@@ -39,6 +52,91 @@ def find_test():
 
     print(db_accessor.find("firstname", "has", "Paul"))
 
+def counters_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc, 16)
+
+    db = database.Database("TestDB.asp2")
+
+    db_accessor  = database.Accessor(db)
+
+    for i in range(40):
+
+        db_accessor.set(f"user{i}",{"firstname":"John","lastname":"Smith","age":i})
+
+    counters = (len(db), db.deleted_entries, db.collided_entries)
+    counters_location, indices_location = db.counters_location, db.indices_location
+
+    db_accessor.delete("user0")
+
+    print(len(db_accessor), db.deleted_entries, db.writes) # 39 1 41
+
+    db.close()
+
+    db = database.Database("TestDB.asp2") # Counters are read from the header
+
+    print(len(db), db.deleted_entries, db.writes) # 39 1 41
+
+    db.close()
+
+    database.build("TestDB.asp2", "TestDB", test_struc, 16)
+
+    db = database.Database("TestDB.asp2")
+
+    db_accessor  = database.Accessor(db)
+
+    for i in range(40):
+
+        db_accessor.set(f"user{i}",{"firstname":"John","lastname":"Smith","age":i})
+
+    db.close()
+
+    with open("TestDB.asp2","rb") as f:
+
+        b = f.read()
+
+    version_location = len(database.MAGIC_NUM)+2+len("TestDB")
+
+    with open("TestDB.asp2","wb") as f: # Version 2 has nothing between the slot count and the slot table
+
+        f.write(b[:version_location]+(2).to_bytes(3,'little')+b[version_location+3:counters_location]+b[indices_location:])
+
+    db = database.Database("TestDB.asp2") # Counted once on open
+
+    print(db.version, (len(db), db.deleted_entries, db.collided_entries) == counters) # 2 True
+
+    db.close()
+
+def batch_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc, 1) # A single slot, so every key collides in one chain
+
+    db = database.Database("TestDB.asp2")
+
+    db_accessor  = database.Accessor(db)
+
+    db_accessor.set_many([(f"user{i}",{"firstname":"John","lastname":"Smith","age":i}) for i in range(10)]+[("user3",{"firstname":"Jane","lastname":"Doe","age":33})]) # Later pairs win
+
+    keys = [f"user{i}" for i in range(12)]+["user3"] # Missing and duplicate keys
+
+    found = db_accessor.get_many(keys)
+
+    print(len(db_accessor), found["user3"], found["user11"], list(found) == list(dict.fromkeys(keys)), all(found[key] == db_accessor.get(key) for key in keys)) # 10 {'firstname': 'Jane', 'lastname': 'Doe', 'age': 33} None True True
+
+    deleted = db_accessor.delete_many(["user1","user1","user5","user11"])
+
+    found = db_accessor.get_many(keys)
+
+    print(deleted, len(db_accessor), found["user1"], all((found[key] is not None) == db_accessor.has(key) for key in keys)) # 2 8 None True
+
+    print(db_accessor.get_many([]), db_accessor.set_many({}), db_accessor.delete_many([]), len(db_accessor)) # {} None 0 8
+
+    db.close()
+
 def threaded_test():
 
         test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
@@ -70,6 +168,151 @@ def threaded_test():
 
         print(database.Accessor(db).get("person"))
 
+def _process_worker(name):
+
+    db = database.Database("TestDB.asp2", {"process_locking":True})
+
+    db_accessor = database.Accessor(db)
+
+    for _ in range(100):
+
+        with db_accessor.transaction():
+
+            person = db_accessor.get("person")
+            db_accessor.set("person",{"firstname":"John","lastname":name,"age":person["age"]+1})
+
+    db.close()
+
+def process_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc)
+
+    db = database.Database("TestDB.asp2", {"process_locking":True})
+
+    database.Accessor(db).set("person",{"firstname":"John","lastname":"Smith","age":0})
+
+    processes = [multiprocessing.Process(target=_process_worker,args=(name,)) for name in ["Smith","Doe"]]
+
+    for process in processes:
+        process.start()
+
+    for process in processes:
+        process.join()
+
+    print(database.Accessor(db).get("person")) # age 200
+
+    db.close()
+
+def process_cache_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc)
+
+    db = database.Database("TestDB.asp2", {"process_locking":True})
+
+    db_accessor  = database.Accessor(db)
+
+    db_accessor.set("jsmith",{"firstname":"John","lastname":"Smith","age":35})
+    db_accessor.get("jsmith")
+
+    db_accessor.set("jdoe",{"firstname":"John","lastname":"Doe","age":40})
+    db_accessor.get("jdoe")
+
+    print(db.cache.has("jsmith"), db.cache.has("jdoe")) # True True, our own writes don't reload the database
+
+    db.close()
+
+def cache_test():
+
+    cache = caching.Cache(maxsize=2,maxbytes=10)
+
+    cache.set("a",b"1234")
+    cache.set("b",b"5678")
+    cache.get("a")
+    cache.set("c",b"90") # Evicts ' b ', the least recently used
+
+    print(cache.has("a"), cache.has("b"), cache.has("c"), cache.size_bytes) # True False True 6
+
+    cache.set("d",b"123456") # Over 10 bytes, evicts ' a '
+
+    print(cache.has("a"), cache.has("c"), cache.stats())
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc)
+
+    db = database.Database("TestDB.asp2")
+
+    db_accessor  = database.Accessor(db)
+    other_accessor = database.Accessor(db)
+
+    db_accessor.set("jsmith",{"firstname":"John","lastname":"Smith","age":35})
+    db_accessor.get("jsmith")
+
+    hits = db.cache.hits
+
+    print(other_accessor.get("jsmith"), db.cache.hits-hits) # Shared by all accessors of the database: 1 hit
+
+    other_accessor.delete("jsmith")
+
+    print(db_accessor.get("jsmith"))
+
+    db.close()
+
+def cache_modes_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    for cache_mode in ["decoded","raw"]:
+
+        database.build("TestDB.asp2", "TestDB", test_struc)
+
+        db = database.Database("TestDB.asp2",{"cache_mode":cache_mode})
+
+        db_accessor  = database.Accessor(db)
+
+        db_accessor.set("jsmith",{"firstname":"John","lastname":"Smith","age":35})
+
+        db_accessor.get("jsmith")["age"] = 99 # Hits return a copy
+
+        print(cache_mode, db_accessor.get("jsmith"), type(db.cache.get("jsmith")).__name__) # decoded ... dict, raw ... bytes
+
+        db_accessor.has("rocketman")
+
+        print(db.cache.get("rocketman") is caching.MISSING, db_accessor.get("rocketman"), db_accessor.has("rocketman")) # True None False
+
+        db_accessor.set("rocketman",{"firstname":"Elton","lastname":"John","age":72}) # Replaces the marker
+        db_accessor.delete("jsmith")
+
+        print(db_accessor.get("rocketman")["age"], db.cache.get("jsmith") is caching.MISSING) # 72 True
+
+        db.close()
+
+def async_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc)
+
+    db = database.Database("TestDB.asp2")
+
+    async def _main():
+
+        async with aio.AsyncAccessor(db) as db_accessor:
+
+            await db_accessor.set("jsmith",{"firstname":"John","lastname":"Smith","age":35})
+
+            print(await asyncio.gather(*[db_accessor.get("jsmith") for _ in range(3)])) # One read for all three
+
+            print([key async for key in db_accessor.keys()])
+
+    asyncio.run(_main())
+
+    db.close()
+
 def extra_test():
 
         test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
@@ -91,6 +334,638 @@ def extra_test():
         print(len(db_accessor))
         print(db_accessor.health())
 
+def parallel_scan_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc)
+
+    db = database.Database("TestDB.asp2", {"scan_workers":4})
+
+    db_accessor = database.Accessor(db)
+
+    for i in range(1000):
+
+        db_accessor.set(f"user{i}",{"firstname":"John","lastname":"Smith","age":i%100})
+
+    print(len(list(db_accessor.items())), db_accessor.find("age", "==", 42, pool="process")[:5])
+
+    db_accessor.delete_many([f"user{i}" for i in range(0,1000,3)]) # Records are fetched a run of consecutive entries at a time
+
+    print(list(db_accessor.items()) == list(db_accessor.items(workers=1)), len(list(db_accessor.values(workers=1)))) # True 666
+
+    db.close()
+
+def mmap_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc, 16)
+
+    db = database.Database("TestDB.asp2")
+
+    db_accessor = database.Accessor(db, use_mmap=True)
+
+    for i in range(100):
+
+        db_accessor.set(f"user{i}",{"firstname":"John","lastname":"Smith","age":i})
+
+    print(db_accessor.get("user42"))
+    print(db_accessor.has("user99"), db_accessor.has("user100"))
+    print(len(db_accessor), db_accessor.find("age", ">=", 95))
+
+def hashing_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    for algorithm in hashing.ALGORITHMS:
+
+        if algorithm == "xxh64" and hashing.xxhash is None: # Optional dependency
+
+            continue
+
+        database.build("TestDB.asp2", "TestDB", test_struc, 100, hash_algorithm=algorithm, power_of_two_slots=True)
+
+        db = database.Database("TestDB.asp2")
+
+        db_accessor  = database.Accessor(db)
+
+        for i in range(300):
+
+            db_accessor.set(f"user{i}",{"firstname":"John","lastname":"Smith","age":i%256})
+
+        db.close()
+
+        db = database.Database("TestDB.asp2") # The algorithm is read from the header
+
+        db_accessor  = database.Accessor(db)
+
+        slots = db.slots
+
+        db.rescale() # Keeps the algorithm and power of two slots
+
+        print(algorithm, hashing.NAMES[db.hash_algorithm], slots, db.slots, all(db_accessor.get(f"user{i}")["age"] == i%256 for i in range(300))) # sha1 sha1 128 2048 True
+
+        db.close()
+
+    try:
+        database.build("TestDB.asp2", "TestDB", test_struc, hash_algorithm="fnv1a")
+    except hashing.UnknownHashAlgorithmError as e:
+        print(e)
+
+def vectorized_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},True),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc, 64)
+
+    queries = [("age","<",10),("age",">=",250),("age","not equal",3),("age","in",[1,2,300]),("lastname","==","Smith"),("firstname","startswith","John1"),("firstname","endswith","9"),("age","<",-1)]
+
+    results = {}
+
+    for scan_engine in ["auto","python"]:
+
+        db = database.Database("TestDB.asp2",{"scan_engine":scan_engine,"scan_chunk_rows":64})
+
+        db_accessor  = database.Accessor(db)
+
+        if scan_engine == "auto":
+
+            for i in range(500):
+
+                db_accessor.set(f"user{i}",{"firstname":f"John{i}","lastname":"Smith" if i%3 else None,"age":i%256})
+
+            db_accessor.delete_many([f"user{i}" for i in range(0,500,7)])
+
+        results[scan_engine] = [db_accessor.find(*query) for query in queries]
+
+        db.close()
+
+    print(vectorized.available(), results["auto"] == results["python"], [len(keys) for keys in results["auto"]])
+
+def index_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc, indexes={"lastname":"hash","age":"sorted"})
+
+    db = database.Database("TestDB.asp2")
+
+    db_accessor  = database.Accessor(db)
+
+    db_accessor.set("jsmith",{"firstname":"John","lastname":"Smith","age":35})
+    db_accessor.set("rocketman",{"firstname":"Elton","lastname":"John","age":72})
+    db_accessor.set("macca",{"firstname":"Sir Paul","lastname":"Mccartney","age":78})
+
+    print(db_accessor.find("lastname", "==", "John"))
+    print(db_accessor.find("age", ">=", 72))
+
+    db_accessor.delete("macca")
+
+    print(db_accessor.find("age", ">=", 72))
+
+    db.close()
+
+    db = database.Database("TestDB.asp2") # Loads the indexes from TestDB.asp2.aspidx
+
+    db_accessor  = database.Accessor(db)
+
+    print(db_accessor.find("age", ">", 0), db_accessor.find("lastname", "==", "Smith")) # ['jsmith', 'rocketman'] ['jsmith']
+
+    db.rebuild_indexes()
+
+    print(db_accessor.find("age", "<", 72))
+
+    db.close()
+
+def datatypes_test():
+
+    test_struc = (("name","ASCIIString",{"size":32},False),("active","Boolean",{},False),("score","Decimal",{},True),("avatar","FixedBytes",{"size":4},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc)
+
+    db = database.Database("TestDB.asp2")
+
+    db_accessor  = database.Accessor(db)
+
+    db_accessor.set_many({"a":{"name":"Alice","active":True,"score":9.5,"avatar":b"\x89PNG"},"b":{"name":"Bob","active":False,"score":None,"avatar":None}})
+
+    print(db_accessor.get("a"), db_accessor.get("b"))
+
+    db.close()
+
+def projection_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc)
+
+    db = database.Database("TestDB.asp2")
+
+    db_accessor  = database.Accessor(db)
+
+    db_accessor.set("jsmith",{"firstname":"John","lastname":"Smith","age":35})
+    db_accessor.set("rocketman",{"firstname":"Elton","lastname":"John","age":72})
+
+    print(db_accessor.get("jsmith", fields=["age"]))
+
+    record = db_accessor.get("rocketman", view=True)
+
+    print(record.firstname, record["age"], record)
+
+    print(list(db_accessor.items(fields=["lastname"])))
+
+    db.close()
+
+def relink_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    for fingerprint_size in [0,2]:
+
+        database.build("TestDB.asp2", "TestDB", test_struc, 16, fingerprint_size=fingerprint_size)
+
+        db = database.Database("TestDB.asp2")
+
+        db_accessor  = database.Accessor(db)
+
+        for i in range(300):
+
+            db_accessor.set(f"user{i}",{"firstname":"John","lastname":"Smith","age":i%256})
+
+        db_accessor.delete_many([f"user{i}" for i in range(0,300,4)])
+
+        db.rescale(64) # Entries are copied as they are, deleted ones are dropped
+
+        counted = database.Accessor(db)._count_entries()
+
+        print(db.slots, len(db_accessor), db.deleted_entries, counted == (db.entries,db.deleted_entries,db.collided_entries), all(db_accessor.get(f"user{i}") == (None if i%4 == 0 else {"firstname":"John","lastname":"Smith","age":i%256}) for i in range(300))) # 64 225 0 True True
+
+        db.close()
+
+def progressive_rescale_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc, 256)
+
+    db = database.Database("TestDB.asp2")
+
+    db_accessor  = database.Accessor(db)
+
+    for i in range(200):
+
+        db_accessor.set(f"user{i}",{"firstname":"John","lastname":"Smith","age":i})
+
+    db.rescale(progressive=True)
+
+    db_accessor.set("jsmith",{"firstname":"John","lastname":"Smith","age":35})
+    db_accessor.delete("user0")
+
+    print(db_accessor.get("user42"), len(db_accessor), db.rescaling is not None)
+
+    db.finish_rescale()
+
+    print(db_accessor.get("jsmith"), len(db_accessor), db.slots)
+
+    db.close()
+
+def auto_rescale_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc, 64)
+
+    db = database.Database("TestDB.asp2",{"auto_rescale":True,"rescale_min_entries":64})
+
+    db_accessor  = database.Accessor(db)
+
+    backup_directory = db.config["backup_directory"].format(dbname=db.name)
+    backups = os.listdir(backup_directory) if os.path.exists(backup_directory) else []
+
+    for i in range(500):
+
+        db_accessor.set(f"user{i}",{"firstname":"John","lastname":"Smith","age":i%256})
+
+    db._rescale_thread.join() # Started once the load factor passed 1.0
+    db.finish_rescale()
+
+    print(db.slots > 64, len(db_accessor), all(db_accessor.get(f"user{i}")["age"] == i%256 for i in range(500))) # True 500 True
+    print((os.listdir(backup_directory) if os.path.exists(backup_directory) else []) == backups) # True, progressive rescales don't back up
+
+    db.close()
+
+def rescale_crash_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    for location in ["TestDB.asp2.aspwal","CrashDB.asp2.aspwal"]: # Left over by an earlier run
+
+        if os.path.exists(location):
+            os.remove(location)
+
+    database.build("TestDB.asp2", "TestDB", test_struc, 256)
+
+    db = database.Database("TestDB.asp2",{"wal_enabled":True,"durability":"fsync"})
+
+    db_accessor  = database.Accessor(db)
+
+    for i in range(200):
+
+        db_accessor.set(f"user{i}",{"firstname":"John","lastname":"Smith","age":i})
+
+    db.rescale(progressive=True)
+    db.rescale_step(128)
+
+    moved = [f"user{i}" for i in range(200) if db.rescaling.moved(f"user{i}")]
+
+    db_accessor.set(moved[0],{"firstname":"John","lastname":"Smith","age":200})
+    db_accessor.delete(moved[1])
+
+    for ext in ["",".aspwal"]: # What's on disk if the process crashes now
+
+        shutil.copy("TestDB.asp2"+ext,"CrashDB.asp2"+ext)
+
+    db.close()
+
+    crashed = database.Database("CrashDB.asp2",{"wal_enabled":True})
+
+    crashed_accessor = database.Accessor(crashed)
+
+    print(crashed_accessor.get(moved[0])["age"], crashed_accessor.get(moved[1]), len(crashed_accessor)) # 200 None 199
+
+    crashed.close()
+
+def compact_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc, 64)
+
+    db = database.Database("TestDB.asp2")
+
+    db_accessor  = database.Accessor(db)
+
+    for i in range(100):
+
+        db_accessor.set(f"user{i}",{"firstname":"John","lastname":"Smith","age":i})
+
+    for i in range(90):
+
+        db_accessor.delete(f"user{i}")
+
+    db_accessor.set("jsmith",{"firstname":"John","lastname":"Smith","age":35}) # Reuses a deleted entry
+
+    print(len(db_accessor), db.deleted_entries, os.path.getsize("TestDB.asp2"))
+
+    db.compact()
+
+    print(len(db_accessor), db.deleted_entries, os.path.getsize("TestDB.asp2"))
+    print(db_accessor.get("jsmith"))
+
+    db.close()
+
+def wal_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc)
+
+    db = database.Database("TestDB.asp2", {"wal_enabled":True,"durability":"group","group_commit_ms":5})
+
+    db_accessor  = database.Accessor(db)
+
+    for i in range(100):
+
+        db_accessor.set(f"user{i}",{"firstname":"John","lastname":"Smith","age":i})
+
+    print(db_accessor.get("user42"), os.path.getsize("TestDB.asp2.aspwal"))
+
+    db.checkpoint()
+
+    print(os.path.getsize("TestDB.asp2.aspwal"))
+
+    db.close()
+
+def logging_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc)
+
+    db = database.Database("TestDB.asp2",{"logger_file_level":"DEBUG","logger_print_level":"WARNING"})
+
+    db_accessor  = database.Accessor(db)
+
+    db_accessor.set("jsmith",{"firstname":"John","lastname":"Smith","age":35})
+    print(db_accessor.get("jsmith"))
+
+    db.logger.flush()
+
+    with open(db.logger.log_file_path) as f:
+
+        print([line.split(" | ")[-1].strip() for line in f]) # ..., 'SET jsmith', 'GET jsmith'
+
+    db.close()
+
+def metrics_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc)
+
+    db = database.Database("TestDB.asp2",{"metrics_enabled":True})
+
+    db_accessor  = database.Accessor(db)
+
+    db_accessor.set("jsmith",{"firstname":"John","lastname":"Smith","age":35})
+    db_accessor.get("jsmith")
+    db_accessor.has("rocketman")
+
+    snapshot = db.metrics()
+
+    print({operation:stats["count"] for operation,stats in snapshot["operations"].items()}, snapshot["io"])
+    print(metrics.prometheus_text([db]))
+
+    db.close()
+
+    histogram = metrics.Histogram()
+    values = [1023,1024,1500,2047,2048]
+
+    for value in values:
+
+        histogram.record(value)
+
+    print(histogram.cumulative(1023), histogram.cumulative(2047), all(histogram.cumulative(bound) == sum(value <= bound for value in values) for bound in metrics.LATENCY_BOUNDS+metrics.CHAIN_LENGTH_BOUNDS)) # 1 4 True
+
+def chain_length_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    for engine in ["chained","open_addressing"]:
+
+        database.build("TestDB.asp2", "TestDB", test_struc, 8, fingerprint_size=8, engine=engine)
+
+        db = database.Database("TestDB.asp2",{"metrics_enabled":True,"max_cache_size":0})
+
+        db_accessor  = database.Accessor(db)
+
+        for i in range(6):
+
+            db_accessor.set(f"user{i}",{"firstname":"John","lastname":"Smith","age":i})
+
+        before = db.metrics()["chain_length"]["count"]
+
+        for i in range(6):
+
+            db_accessor.get(f"user{i}") # Most of them hit the first entry (or home slot) through its fingerprint
+
+        chain_length = db.metrics()["chain_length"]
+
+        print(engine, chain_length["count"]-before, chain_length["min"]) # 6 1
+
+        db.close()
+
+def bloom_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc)
+
+    db = database.Database("TestDB.asp2",{"bloom_filter":True})
+
+    db_accessor  = database.Accessor(db)
+
+    db_accessor.set("jsmith",{"firstname":"John","lastname":"Smith","age":35})
+
+    print(db_accessor.get("jsmith"), db_accessor.get("rocketman"), db_accessor.has("rocketman")) # The misses never touch the file
+
+    db.close()
+
+    db = database.Database("TestDB.asp2",{"bloom_filter":True}) # Loads the filter from TestDB.asp2.aspbloom
+
+    print("jsmith" in db.bloom, "rocketman" in db.bloom)
+
+    db.close()
+
+def fingerprint_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc, 4, fingerprint_size=8) # Few slots, so the keys end up in long chains
+
+    db = database.Database("TestDB.asp2",{"max_cache_size":0})
+
+    db_accessor  = database.Accessor(db)
+
+    for i in range(100):
+
+        db_accessor.set(f"user{i}",{"firstname":"John","lastname":"Smith","age":i})
+
+    db_accessor.delete("user50")
+
+    print(db_accessor.get("user99"), db_accessor.get("user50"), db_accessor.has("user0"), db.fingerprint("user99").hex())
+
+    db.rescale(64)
+
+    print(len(db_accessor), db_accessor.get("user99"))
+
+    db.close()
+
+def open_addressing_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc, 8, engine="open_addressing")
+
+    db = database.Database("TestDB.asp2",{"max_cache_size":0})
+
+    db_accessor  = database.Accessor(db)
+
+    for i in range(100): # The table doubles whenever it's 90% full
+
+        db_accessor.set(f"user{i}",{"firstname":"John","lastname":"Smith","age":i})
+
+    db_accessor.delete("user50")
+
+    print(db.slots, len(db_accessor), db_accessor.get("user99"), db_accessor.get("user50"), db_accessor.has("user0"))
+    print(db_accessor.find("age",">",97), db.health)
+
+    db.close()
+
+    database.build("TestDB.asp2", "TestDB", test_struc, 8, engine="open_addressing")
+
+    db = database.Database("TestDB.asp2",{"max_cache_size":0})
+
+    db_accessor  = database.Accessor(db)
+
+    with db_accessor.transaction(): # The table can't grow inside a transaction, writes that don't fit raise
+
+        for i in range(12):
+
+            try:
+                db_accessor.set(f"user{i}",{"firstname":"John","lastname":"Smith","age":i})
+            except open_addressing.TableFullError as e:
+                print(i, e)
+
+    print(len(db_accessor), len([i for i in range(12) if db_accessor.get(f"user{i}") is not None])) # 8 8
+
+    db.close()
+
+    database.build("TestDB.asp2", "TestDB", test_struc, 1, engine="open_addressing")
+
+    db = database.Database("TestDB.asp2",{"max_cache_size":0})
+
+    db_accessor  = database.Accessor(db)
+
+    with db_accessor.transaction():
+
+        db_accessor.set("jsmith",{"firstname":"John","lastname":"Smith","age":35})
+
+        try:
+            db_accessor.delete("jdoe") # The table is full, so probing never meets an empty home slot
+        except ValueError as e:
+            print(e) # Couldn't find key that you were trying to delete
+
+    db.close()
+
+    database.build("TestDB.asp2", "TestDB", test_struc, 32, engine="open_addressing")
+
+    db = database.Database("TestDB.asp2",{"max_cache_size":0})
+
+    db_accessor  = database.Accessor(db)
+
+    db_accessor.set_many({f"k{i}":{"firstname":"John","lastname":"Smith","age":i} for i in range(28)})
+
+    db_accessor.set("k0",{"firstname":"Jane","lastname":"Smith","age":0}) # Updates don't count towards the load factor
+    db_accessor.set_many({"k1":{"firstname":"Jane","lastname":"Smith","age":1},"k2":{"firstname":"Jane","lastname":"Smith","age":2}})
+
+    slots = db.slots
+
+    db_accessor.set("k28",{"firstname":"John","lastname":"Smith","age":28})
+
+    print(slots, db.slots, len(db_accessor), db_accessor.get("k0")["firstname"], db_accessor.get("k2")["firstname"], db_accessor.get("k28") is not None) # 32 64 29 Jane Jane True
+
+    db.close()
+
+def delete_miss_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    for engine in ["chained","open_addressing"]: # Both engines answer the same sequence the same way
+
+        database.build("TestDB.asp2", "TestDB", test_struc, 16, engine=engine)
+
+        db = database.Database("TestDB.asp2")
+
+        db_accessor  = database.Accessor(db)
+
+        results = [db_accessor.delete("nobody")] # Empty slot: None
+
+        db_accessor.set("jsmith",{"firstname":"John","lastname":"Smith","age":35})
+
+        neighbour = next(f"user{i}" for i in range(1000) if db.get_slot(f"user{i}") == db.get_slot("jsmith"))
+
+        try:
+            db_accessor.delete(neighbour) # Occupied slot without the key: ValueError
+        except ValueError as e:
+            results.append(str(e))
+
+        results.append(db_accessor.delete("jsmith"))
+        results.append(db_accessor.delete("jsmith"))
+
+        print(engine, results, len(db_accessor))
+
+        db.close()
+
+def transaction_test():
+
+    test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))
+
+    database.build("TestDB.asp2", "TestDB", test_struc)
+
+    db = database.Database("TestDB.asp2", {"wal_enabled":True})
+
+    db_accessor  = database.Accessor(db)
+
+    with db_accessor.transaction():
+
+        db_accessor.set("jsmith",{"firstname":"John","lastname":"Smith","age":35})
+        db_accessor.set("rocketman",{"firstname":"Elton","lastname":"John","age":72})
+
+        print(db_accessor.get("jsmith"))
+
+    try:
+
+        with db_accessor.transaction():
+
+            db_accessor.delete("jsmith")
+            db_accessor.set("macca",{"firstname":"Sir Paul","lastname":"Mccartney","age":78})
+
+            raise RuntimeError("Abort")
+
+    except RuntimeError:
+
+        pass
+
+    print(db_accessor.get("jsmith"), db_accessor.has("macca"), len(db_accessor))
+
+    db.close()
+
+def benchmark_test():
+
+    os.makedirs("bench_test",exist_ok=True)
+
+    for build_options in [None,{"engine":"open_addressing"}]:
+
+        results = suite.run("bench_test",[200],["narrow","wide"],["uniform","zipf"],ops=20,repeat=1,progress=lambda message: None,build_options=build_options)
+
+        json.dumps(results) # Written as JSON by ' python -m benchmarks run '
+
+        slower = {"results":[{**result,"ns_per_op":result["ns_per_op"]*2} for result in results["results"]]}
+
+        print(len(results["results"]) == len(suite.BENCHMARKS)*4, {verdict for *_,verdict in compare.compare(results,results)}, {verdict for *_,verdict in compare.compare(results,slower)}) # True {'ok'} {'regression'}
+
 def large_test():
 
     test_struc = (("firstname","UnicodeString",{"size":64},False),("lastname","UnicodeString",{"size":128},False),("age","IntUnsigned",{"size":1},True))